@@ -0,0 +1,370 @@
+"""
+SadTalker Desktop — benchmarks
+Measures what the desktop wrapper itself costs (process spawn, log handling,
+scheduling, settings I/O) against a fake inference.py, and optionally times
+real renders. Results go to a JSON report that can be compared across commits.
+
+Run: python benchmark.py                          (fake inference only, no models needed)
+     python benchmark.py --real face.png voice.wav (from the SadTalker folder, next to the app)
+     python benchmark.py --cpu-scaling face.png voice.wav   (CPU-only machines, ditto)
+     python benchmark.py --compare old.json new.json
+"""
+
+import sys, os, time, json, math, statistics, subprocess, tempfile, threading, platform, argparse, shutil
+from pathlib import Path
+
+# ── Fake inference.py ─────────────────────────────────────────────────────────
+# benchmark.py doubles as a stand-in for inference.py: run_oneshot() passes the
+# same command line, and BENCH_* environment variables shape the output.
+#   BENCH_STARTUP  seconds spent "loading models" before the first line (0)
+#   BENCH_FRAMES   tqdm steps per stage (100)
+#   BENCH_RATE     tqdm updates per second, 0 = as fast as possible (0)
+#   BENCH_SPIN     CPU seconds of busy work before the stages, on one thread (0)
+FAKE_STAGES = ["landmark Det", "3DMM Extraction In Video", "mel", "audio2exp", "audio2pose",
+               "Face Renderer", "seamlessClone", "Face Enhancer"]
+
+def fake_inference(argv):
+    opt = lambda name, default="": argv[argv.index(name) + 1] if name in argv else default
+    startup = float(os.environ.get("BENCH_STARTUP", 0))
+    frames  = int(os.environ.get("BENCH_FRAMES", 100))
+    rate    = float(os.environ.get("BENCH_RATE", 0))
+    spin    = float(os.environ.get("BENCH_SPIN", 0))
+    print("using safetensor as default", flush=True)
+    time.sleep(startup)
+    end = time.process_time() + spin    # CPU time, so sharing a core shows up as wall time
+    while time.process_time() < end: pass
+    stages = [s for s in FAKE_STAGES
+              if (s != "seamlessClone" or "full" in opt("--preprocess")) and
+                 (s != "Face Enhancer" or "--enhancer" in argv)]
+    for stage in stages:
+        for i in range(frames + 1):
+            pct = i * 100 // max(frames, 1)
+            bar = "█" * (pct // 10)
+            # tqdm redraws in place with \r on stderr; run_oneshot() reads both streams as text
+            sys.stderr.write(f"\r{stage}: {pct:3d}%|{bar:<10}| {i}/{frames} [00:00<00:00, {rate or 999:.2f}it/s]")
+            if rate: time.sleep(1 / rate)
+        sys.stderr.write("\n")
+        sys.stderr.flush()
+    out = Path(opt("--result_dir", "."), time.strftime("%Y_%m_%d_%H.%M.%S") + f"_{os.getpid()}.mp4")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_bytes(b"fake")
+    print("The generated video is named:", out, flush=True)
+    return 0
+
+
+if __name__ == "__main__" and "--driven_audio" in sys.argv:
+    sys.exit(fake_inference(sys.argv[1:]))
+
+HERE = Path(__file__).resolve()
+sys.path.insert(0, str(HERE.parent))
+import sadtalker_core as core
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+def _ms(xs):
+    """Summary of a list of seconds, in milliseconds."""
+    xs = sorted(xs)
+    return {"median_ms": round(statistics.median(xs) * 1000, 3),
+            "p90_ms":    round(xs[min(len(xs) - 1, math.ceil(0.9 * len(xs)) - 1)] * 1000, 3),     # nearest rank
+            "min_ms":    round(xs[0] * 1000, 3), "n": len(xs)}
+
+def _fake_job(tmp, **over):
+    job = core.build_job(str(tmp / "face.png"), str(tmp / "voice.wav"), {**core.DEFAULT_SETTINGS, **over})
+    job["result_dir"] = str(tmp / "results")
+    return job
+
+def _env(**kw):
+    os.environ.update({f"BENCH_{k.upper()}": str(v) for k, v in kw.items()})
+
+def _commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=str(HERE.parent), stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _MemoryBox:
+    """Just enough of a CTkTextbox for LogPump, so its parsing and bookkeeping can be
+    timed without a display. The drain loop is driven by the benchmark instead of Tk."""
+    def __init__(self):
+        self.chars = 0
+    def after(self, ms, fn):        pass
+    def winfo_exists(self):         return True
+    def configure(self, **kw):      pass
+    def delete(self, a, b):         pass
+    def insert(self, at, text):     self.chars += len(text)
+    def see(self, at):              pass
+
+
+# ── Fake-inference benchmarks ─────────────────────────────────────────────────
+def bench_spawn(tmp, n):
+    """Wall time of a one-shot inference.py run that does no work, next to a bare
+    `python -c pass` for the interpreter's own start-up cost."""
+    _env(startup=0, frames=0, rate=0)
+    job   = _fake_job(tmp, enhancer="none")
+    first, total, bare = [], [], []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        bare.append(time.perf_counter() - t0)
+        seen = []
+        t0 = time.perf_counter()
+        core.run_oneshot(job, lambda line: seen or seen.append(time.perf_counter() - t0), script=HERE)
+        total.append(time.perf_counter() - t0)
+        first.append(seen[0])
+    return {"python_bare": _ms(bare), "first_line": _ms(first), "oneshot_total": _ms(total)}
+
+def bench_log(tmp, frames, interval_ms=100):
+    """Lines per second from a chatty fake run through run_oneshot(), ProgressTracker
+    and the GUI's LogPump (what GenerateTab._log feeds), plus LogPump's own cost."""
+    _env(startup=0, frames=frames, rate=0)
+    job = _fake_job(tmp, enhancer="gfpgan")
+    try:
+        from sadtalker_app import LogPump
+    except Exception as e:                       # customtkinter missing: time the core path only
+        LogPump, why = None, f"{type(e).__name__}: {e}"
+    pump    = LogPump(_MemoryBox(), max_lines=2000, interval=interval_ms) if LogPump else None
+    tracker = core.ProgressTracker(job)
+    lines   = [0]
+    spent   = [0.0]
+    done    = threading.Event()
+
+    def on_line(line):
+        lines[0] += 1
+        tracker.feed(line)
+        if pump: pump.put(line)
+
+    def drain():
+        while True:
+            stop = done.is_set()
+            t0 = time.perf_counter()
+            pump._drain()
+            spent[0] += time.perf_counter() - t0
+            if stop: return
+            time.sleep(interval_ms / 1000)
+
+    th = threading.Thread(target=drain, daemon=True) if pump else None
+    if th: th.start()
+    t0 = time.perf_counter()
+    core.run_oneshot(job, on_line, script=HERE)
+    wall = time.perf_counter() - t0
+    done.set()
+    if th: th.join()
+    out = {"lines": lines[0], "wall_s": round(wall, 3), "lines_per_s": round(lines[0] / wall)}
+    if pump:
+        out.update({"pump_ms": round(spent[0] * 1000, 3), "pump_us_per_line": round(spent[0] * 1e6 / max(lines[0], 1), 3),
+                    "pump_lines_kept": len(pump._lines)})
+    else:
+        out["pump_skipped"] = why
+    return out
+
+def bench_schedule(tmp, n, k):
+    """Per-job overhead of run_batch() and run_queued() (SQLite bookkeeping included)
+    around a render that returns at once, and how close stub renders get to k× speed-up."""
+    job  = _fake_job(tmp, enhancer="none")
+    noop = lambda job, on_line, t, slot=0: (True, None)
+    t    = core.LANG["en"]
+    out  = {}
+    for kk in sorted({1, k}):
+        t0 = time.perf_counter()
+        core.run_batch([job] * n, t, kk, render=noop)
+        out[f"run_batch_k{kk}_us_per_job"] = round((time.perf_counter() - t0) * 1e6 / n, 1)
+    jobq = core.JobQueue(tmp / "bench_jobs.db")
+    t0   = time.perf_counter()
+    core.run_queued(jobq, [jobq.add_batch([job] * n, "bench")], t, k, render=noop)
+    out[f"run_queued_k{k}_us_per_job"] = round((time.perf_counter() - t0) * 1e6 / n, 1)
+
+    each, m = 0.2, 2 * k
+    t0 = time.perf_counter()
+    core.run_batch([job] * m, t, k, render=core.stub_render(each))
+    wall = time.perf_counter() - t0
+    out.update({"stub_jobs": m, "stub_wall_s": round(wall, 3),
+                "stub_efficiency": round(each * m / k / wall, 3)})   # 1.0 = perfect k-way parallelism
+    return out
+
+def _scaling_ks(limit=None):
+    """Parallel job counts to try: powers of two with at least two CPUs per job."""
+    cpus = len(core.usable_cpus())
+    top  = min(limit or core.MAX_CONCURRENCY, max(1, cpus // 2))
+    ks   = [k for k in (1, 2, 4, 8, 16) if k <= top]
+    return ks if top in ks else ks + [top]
+
+def bench_cpu_scaling(tmp, spin, ks):
+    """Throughput of CPU-bound fake jobs with k pinned one-shot processes (cpu_split=k):
+    efficiency 1.0 = k times the single-process rate, so blocks that overlap or
+    oversubscribe show up as a drop."""
+    _env(startup=0, frames=0, rate=0, spin=spin)
+    t, out = core.LANG["en"], {"cpus": len(core.usable_cpus()),
+                               "pinned": core.set_affinity(0, core.usable_cpus())}
+    def render(job, on_line, t, slot=0):
+        cpus = core.slot_cpus(job["cpu_split"], slot)
+        return core.run_oneshot(job, on_line, script=HERE, cpus=cpus) == 0, None
+    base = None
+    for k in ks:
+        job = _fake_job(tmp, enhancer="none", cpu_split=k, threads=len(core.cpu_sets(k)[0]))
+        t0  = time.perf_counter()
+        core.run_batch([job] * (2 * k), t, k, render=render)
+        rate = 2 * k / (time.perf_counter() - t0)
+        base = base or rate
+        out[f"k{k}"] = {"jobs_per_s": round(rate, 3), "efficiency": round(rate / (k * base), 3)}
+    _env(spin=0)
+    return out
+
+def bench_settings(tmp, n):
+    """load_settings()/save_settings() round trips against a scratch settings file."""
+    real, core.SETTINGS_FILE = core.SETTINGS_FILE, tmp / "app_settings.json"
+    try:
+        s = core.load_settings()
+        saves, loads = [], []
+        for _ in range(n):
+            t0 = time.perf_counter(); core.save_settings(s); saves.append(time.perf_counter() - t0)
+            t0 = time.perf_counter(); s = core.load_settings(); loads.append(time.perf_counter() - t0)
+    finally:
+        core.SETTINGS_FILE = real
+    return {"save": _ms(saves), "load": _ms(loads)}
+
+
+# ── Real-model benchmark ──────────────────────────────────────────────────────
+def bench_real(image, audio, repeat, settings):
+    """Renders image+audio `repeat` times on one warm worker. The first run includes
+    model loading; later ones show the warm path (and the disk cache)."""
+    s   = {**core.load_settings(), **settings}
+    t   = core.LANG["en"]
+    if core.ensure_models([s], t, lambda line: print(line, file=sys.stderr)):
+        raise SystemExit("--real needs models that could not be downloaded — run it from the SadTalker folder.")
+    job = core.build_job(str(Path(image).resolve()), str(Path(audio).resolve()), s)
+    job["result_dir"] = tempfile.mkdtemp(prefix="sadtalker_bench_")
+    runs = []
+    try:
+        for _ in range(repeat):
+            done = {}
+            t0 = time.perf_counter()
+            core.run_batch([job], t, 1, on_event=lambda ev: ev["event"] == "job_done" and done.update(ev))
+            wall = time.perf_counter() - t0
+            runs.append({"ok": done.get("ok"), "wall_s": round(wall, 3),
+                         "stages_s": {k: round(v, 3) for k, v in done.get("stages", {}).items()},
+                         "peak_ram_mb": done.get("peak_rss_mb"), "peak_vram_mb": done.get("peak_gpu_mb")})
+    finally:
+        core.shutdown_workers()
+        shutil.rmtree(job["result_dir"], ignore_errors=True)
+    return {"settings": {k: job[k] for k in core.RESULT_SETTINGS}, "gpu": core.detect_gpu(), "runs": runs}
+
+
+def bench_cpu_real(image, audio, ks, settings):
+    """Real renders of image+audio with k pinned warm workers (cpu_split=k) for each k:
+    a warm-up round loads the models, then 2k timed jobs give the throughput in audio
+    seconds per wall second. Saves it to CPU_SCALING_FILE, where the auto profile
+    picks the number of CPU workers from."""
+    t    = core.LANG["en"]
+    if core.ensure_models([{**core.load_settings(), "size": "256", "enhancer": "none", **settings}], t,
+                          lambda line: print(line, file=sys.stderr)):
+        raise SystemExit("--cpu-scaling needs models that could not be downloaded — run it from the SadTalker folder.")
+    secs = core.audio_seconds(audio) or 1.0
+    out  = {"cpus": len(core.usable_cpus()), "throughput": {}, "efficiency": {}}
+    tmp  = tempfile.mkdtemp(prefix="sadtalker_bench_")
+    base = None                 # throughput per job at the smallest k
+    try:
+        for k in ks:
+            s   = {**core.load_settings(), "size": "256", "enhancer": "none", **settings,
+                   "cpu_split": k, "threads": len(core.cpu_sets(k)[0])}
+            job = core.build_job(str(Path(image).resolve()), str(Path(audio).resolve()), s)
+            job["result_dir"] = tmp
+            print(f"… cpu scaling k={k}", file=sys.stderr, flush=True)
+            core.run_batch([job] * k, t, k)                 # loads the models on every slot
+            t0 = time.perf_counter()
+            ok = core.run_batch([job] * (2 * k), t, k)
+            rate = 2 * k * secs / (time.perf_counter() - t0)
+            if not all(ok): raise SystemExit(f"--cpu-scaling: renders failed at k={k}")
+            base = base or rate / k
+            out["throughput"][str(k)] = round(rate, 4)
+            out["efficiency"][str(k)] = round(rate / (k * base), 3)
+    finally:
+        core.shutdown_workers()
+        shutil.rmtree(tmp, ignore_errors=True)
+    with open(core.CPU_SCALING_FILE, "w") as f:
+        json.dump({**out, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+    out["auto_workers"] = core.cpu_workers(out["cpus"])
+    return out
+
+
+# ── Report ────────────────────────────────────────────────────────────────────
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            out.update(_flatten(v, f"{prefix}{k}."))
+        elif isinstance(v, list):
+            for i, x in enumerate(v):
+                if isinstance(x, dict): out.update(_flatten(x, f"{prefix}{k}.{i}."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[prefix + k] = v
+    return out
+
+def compare(old_path, new_path):
+    """Prints every numeric metric present in both reports with its relative change."""
+    with open(old_path) as f: old = json.load(f)
+    with open(new_path) as f: new = json.load(f)
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    print(f"{'metric':<48} {old['meta'].get('commit') or 'old':>12} {new['meta'].get('commit') or 'new':>12}  change")
+    for key in sorted(a.keys() & b.keys()):
+        if key.endswith(".n"): continue
+        change = f"{(b[key] - a[key]) / a[key] * 100:+.1f}%" if a[key] else ""
+        print(f"{key:<48} {a[key]:>12g} {b[key]:>12g}  {change}")
+    return 0
+
+def main(argv):
+    ap = argparse.ArgumentParser(prog="benchmark.py", description="Benchmark the SadTalker Desktop wrapper.")
+    ap.add_argument("--real", nargs=2, metavar=("IMAGE", "AUDIO"), help="also time real renders of IMAGE + AUDIO")
+    ap.add_argument("--repeat",  type=int, default=2, help="real renders (the first one loads the models)")
+    ap.add_argument("--size",     help="override the saved size for --real")
+    ap.add_argument("--enhancer", help="override the saved enhancer for --real")
+    ap.add_argument("--cpu-scaling", nargs=2, metavar=("IMAGE", "AUDIO"),
+                    help="measure real CPU render throughput per number of pinned workers and save it for the auto profile")
+    ap.add_argument("--ks", type=lambda v: [int(x) for x in v.split(",")],
+                    help="worker counts for the CPU scaling benchmarks (default: 1, 2, 4, … up to half the CPUs)")
+    ap.add_argument("--spin", type=float, default=0.5, help="CPU seconds per fake job in the CPU scaling benchmark")
+    ap.add_argument("--spawns",  type=int, default=10,   help="one-shot spawns to time")
+    ap.add_argument("--frames",  type=int, default=2000, help="tqdm steps per stage in the log benchmark")
+    ap.add_argument("--jobs",    type=int, default=500,  help="jobs in the scheduling benchmark")
+    ap.add_argument("-j", "--concurrency", type=int, default=4, help="slots in the scheduling benchmark")
+    ap.add_argument("-o", "--out", help="report path (default: benchmarks/bench_<commit>_<time>.json next to results/)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports and exit")
+    a = ap.parse_args(argv)
+    if a.compare: return compare(*a.compare)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="sadtalker_bench_") as tmp:
+        tmp = Path(tmp)
+        for name, fn in [("spawn",    lambda: bench_spawn(tmp, a.spawns)),
+                         ("log",      lambda: bench_log(tmp, a.frames)),
+                         ("schedule", lambda: bench_schedule(tmp, a.jobs, a.concurrency)),
+                         ("cpu_scaling", lambda: bench_cpu_scaling(tmp, a.spin, a.ks or _scaling_ks())),
+                         ("settings", lambda: bench_settings(tmp, 200))]:
+            print(f"… {name}", file=sys.stderr, flush=True)
+            results[name] = fn()
+    if a.real:
+        print("… real", file=sys.stderr, flush=True)
+        over = {k: v for k, v in (("size", a.size), ("enhancer", a.enhancer)) if v}
+        results["real"] = bench_real(*a.real, a.repeat, over)
+    if a.cpu_scaling:
+        over = {k: v for k, v in (("size", a.size), ("enhancer", a.enhancer)) if v}
+        results["cpu_real"] = bench_cpu_real(*a.cpu_scaling, a.ks or _scaling_ks(), over)
+
+    commit = _commit()
+    report = {"meta": {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "cpus": os.cpu_count()},
+              "results": results}
+    out = Path(a.out) if a.out else \
+        core.RESULTS_DIR.parent / "benchmarks" / f"bench_{commit or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"report: {out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
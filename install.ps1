@@ -77,21 +77,23 @@ function Clone-Repo {
         OK "Repository cloned to: $SAD_DIR"
     }
 
-    $appSrc = "$InstallerDir\sadtalker_app.py"
-    $appDst = "$SAD_DIR\sadtalker_app.py"
-    if ([System.IO.File]::Exists($appSrc)) {
-        [System.IO.File]::Copy($appSrc, $appDst, $true)
-        OK "sadtalker_app.py copied to repo."
-    } else {
-        Write-Host ""
-        Write-Host "  +----------------------------------------------------+" -ForegroundColor Red
-        Write-Host "  |   sadtalker_app.py NOT FOUND next to installer!    |" -ForegroundColor Red
-        Write-Host "  |   Copy sadtalker_app.py to:                        |" -ForegroundColor Red
-        Write-Host "  |   $SAD_DIR" -ForegroundColor Yellow
-        Write-Host "  |   before launching the app.                        |" -ForegroundColor Red
-        Write-Host "  +----------------------------------------------------+" -ForegroundColor Red
-        Write-Host ""
-        Pause-Key "Press any key to continue installation anyway..."
+    foreach ($appFile in @("sadtalker_app.py", "sadtalker_core.py")) {
+        $appSrc = "$InstallerDir\$appFile"
+        $appDst = "$SAD_DIR\$appFile"
+        if ([System.IO.File]::Exists($appSrc)) {
+            [System.IO.File]::Copy($appSrc, $appDst, $true)
+            OK "$appFile copied to repo."
+        } else {
+            Write-Host ""
+            Write-Host "  +----------------------------------------------------+" -ForegroundColor Red
+            Write-Host "  |   $appFile NOT FOUND next to installer!" -ForegroundColor Red
+            Write-Host "  |   Copy sadtalker_app.py and sadtalker_core.py to:  |" -ForegroundColor Red
+            Write-Host "  |   $SAD_DIR" -ForegroundColor Yellow
+            Write-Host "  |   before launching the app.                        |" -ForegroundColor Red
+            Write-Host "  +----------------------------------------------------+" -ForegroundColor Red
+            Write-Host ""
+            Pause-Key "Press any key to continue installation anyway..."
+        }
     }
 }
 
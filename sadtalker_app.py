@@ -2,226 +2,32 @@
 SadTalker Desktop App v2
 Requires: customtkinter, pillow
 Run: python sadtalker_app.py
+     python sadtalker_app.py --headless manifest.json   (no GUI; see sadtalker_core.py)
+     python sadtalker_app.py --serve                    (local HTTP job server)
 """
 
+import sys
+if __name__ == "__main__" and {"--headless", "--worker", "--serve"} & set(sys.argv):
+    # Scripted runs never touch Tk — skip importing it altogether.
+    import sadtalker_core
+    sys.exit(sadtalker_core.main(sys.argv[1:]))
+
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import threading, subprocess, sys, os, json, urllib.request, time
+import threading, os, queue
 from pathlib import Path
 
-# ── Paths ─────────────────────────────────────────────────────────────────────
-BASE_DIR        = Path(__file__).parent
-CHECKPOINTS_DIR = BASE_DIR / "checkpoints"
-GFPGAN_DIR      = BASE_DIR / "gfpgan" / "weights"
-RESULTS_DIR     = BASE_DIR / "results"
-SETTINGS_FILE   = BASE_DIR / "app_settings.json"
-
-# ── Models ────────────────────────────────────────────────────────────────────
-MODELS = {
-    "checkpoints": [
-        ("mapping_00109-model.pth.tar",     "https://github.com/OpenTalker/SadTalker/releases/download/v0.0.2-rc/mapping_00109-model.pth.tar"),
-        ("mapping_00229-model.pth.tar",     "https://github.com/OpenTalker/SadTalker/releases/download/v0.0.2-rc/mapping_00229-model.pth.tar"),
-        ("SadTalker_V0.0.2_256.safetensors","https://github.com/OpenTalker/SadTalker/releases/download/v0.0.2-rc/SadTalker_V0.0.2_256.safetensors"),
-        ("SadTalker_V0.0.2_512.safetensors","https://github.com/OpenTalker/SadTalker/releases/download/v0.0.2-rc/SadTalker_V0.0.2_512.safetensors"),
-    ],
-    "gfpgan": [
-        ("alignment_WFLW_4HG.pth",        "https://github.com/xinntao/facexlib/releases/download/v0.1.0/alignment_WFLW_4HG.pth"),
-        ("detection_Resnet50_Final.pth",   "https://github.com/xinntao/facexlib/releases/download/v0.1.0/detection_Resnet50_Final.pth"),
-        ("GFPGANv1.4.pth",                "https://github.com/TencentARC/GFPGAN/releases/download/v1.3.4/GFPGANv1.4.pth"),
-        ("parsing_parsenet.pth",           "https://github.com/xinntao/facexlib/releases/download/v0.2.2/parsing_parsenet.pth"),
-    ]
-}
-
-# ── i18n ──────────────────────────────────────────────────────────────────────
-LANG = {
-    "en": {
-        "app_title": "SadTalker Desktop",
-        "tab_generate": "🎬  Generate",
-        "tab_settings": "⚙️  Settings",
-        "tab_setup":    "🔧  Setup",
-        "tab_about":    "ℹ️  About",
-        # Generate tab
-        "gen_title":       "🎬  Generate video",
-        "gen_image_lbl":   "📷  Photo / photos:",
-        "gen_image_btn":   "Choose images",
-        "gen_audio_lbl":   "🎵  Audio file:",
-        "gen_audio_btn":   "Choose audio",
-        "gen_none":        "Not selected",
-        "gen_btn":         "▶  Generate video",
-        "gen_open":        "📂  Open results folder",
-        "gen_running":     "⏳  Generating…",
-        "gen_ready":       "Ready.",
-        "gen_done":        "✅  Done! Generated {n} video(s).",
-        "gen_warn_img":    "Select at least one image!",
-        "gen_warn_audio":  "Select an audio file!",
-        "gen_warn_setup":  "Run Setup first (🔧 Setup tab) to install dependencies and download models!",
-        "gen_log_batch":   "── [{i}/{n}] {name} ──",
-        "gen_log_done":    "✅  All done. Results in: {path}",
-        "gen_err":         "❌  Error (code {code})",
-        "gen_ok":          "✅  Success!",
-        # Settings tab
-        "set_title":       "⚙️  Generation settings",
-        "set_save":        "💾  Save settings",
-        "set_saved":       "Settings saved!",
-        "set_size_lbl":    "📐  Output size",
-        "set_size_tip":    "Resolution of the generated face.\n256 = faster, less VRAM (recommended for GTX 1060 6 GB).\n512 = better quality, needs ~4 GB VRAM.\nIf you get CUDA out-of-memory errors, switch to 256.",
-        "set_enh_lbl":     "✨  Face enhancer",
-        "set_enh_tip":     "Post-processing to improve face quality.\ngfpgan – recommended, best results.\nrestoreformer – alternative, slightly different style.\nnone – no enhancer, fastest, lower quality.",
-        "set_pre_lbl":     "🔲  Preprocess mode",
-        "set_pre_tip":     "How the input image is prepared before generation.\ncrop – auto-detects and crops the face region (recommended for portraits).\nresize – scales the whole image to the target size.\nfull – uses the full image without any cropping.",
-        "set_still_lbl":   "🧍  Still mode",
-        "set_still_tip":   "When ON, head movement is minimized — only lip movement is generated.\nIdeal for presentations, explainer videos, or formal content.\nWhen OFF, natural head movement is added.",
-        "set_still_sw":    "Enable still mode",
-        "set_exp_lbl":     "😮  Expression scale",
-        "set_exp_tip":     "Controls the intensity of facial expressions.\n1.0 = natural (default).\n< 1.0 = subtler, more neutral expressions.\n> 1.0 = exaggerated expressions (max 2.0).\nStart with 1.0 and adjust to taste.",
-        "set_pose_lbl":    "🎭  Pose style",
-        "set_pose_tip":    "Selects the head movement animation style (0–45).\n0 = default neutral style.\nHigher values introduce different rhythmic head motions.\nExperiment to find what matches your audio best.",
-        # Setup tab
-        "setup_title":     "🔧  Auto-installer",
-        "setup_desc":      "Checks and installs all required dependencies, then downloads AI models.\nRun once on first use or after any import errors.",
-        "setup_full":      "▶  Run full setup",
-        "setup_pip":       "📦  Packages only",
-        "setup_models":    "⬇️  Models only",
-        "setup_status":    "Installation log:",
-        "setup_checking":  "Checking pip dependencies…",
-        "setup_installed": "✓ {pkg} already installed",
-        "setup_installing":"⬇️  Installing {pkg}…",
-        "setup_ok":        "✅  {pkg} installed",
-        "setup_err":       "❌  Error with {pkg}: {err}",
-        "setup_pkgs_done": "📦  Dependencies ready.",
-        "setup_models_chk":"⬇️  Checking models…",
-        "setup_mdl_exists":"✓ {f} already exists",
-        "setup_mdl_dl":    "⬇️  Downloading {f}…",
-        "setup_mdl_ok":    "✅  {f} downloaded",
-        "setup_mdl_err":   "❌  Download error {f}: {e}",
-        "setup_mdl_link":  "   Manual link: {url}",
-        "setup_mdl_done":  "⬇️  Models ready.",
-        "setup_all_done":  "\n✅  Full setup complete!",
-        # About
-        "about_text": (
-            "SadTalker Desktop  v2.0\n\n"
-            "A desktop GUI for the SadTalker talking-head synthesis model.\n\n"
-            "Original SadTalker paper:\nZhang et al., 2023 — OpenTalker/SadTalker on GitHub\n\n"
-            "GPU detected: {gpu}\nCUDA version: {cuda}\nVRAM: {vram}"
-        ),
-        # Header GPU info
-        "gpu_detecting":   "Detecting GPU…",
-        "gpu_unknown":     "GPU: unknown",
-    },
-    "pl": {
-        "app_title": "SadTalker Desktop",
-        "tab_generate": "🎬  Generuj",
-        "tab_settings": "⚙️  Ustawienia",
-        "tab_setup":    "🔧  Setup",
-        "tab_about":    "ℹ️  O aplikacji",
-        # Generate tab
-        "gen_title":       "🎬  Generowanie wideo",
-        "gen_image_lbl":   "📷  Zdjęcie / zdjęcia:",
-        "gen_image_btn":   "Wybierz zdjęcia",
-        "gen_audio_lbl":   "🎵  Plik audio:",
-        "gen_audio_btn":   "Wybierz audio",
-        "gen_none":        "Nie wybrano",
-        "gen_btn":         "▶  Generuj wideo",
-        "gen_open":        "📂  Otwórz folder results",
-        "gen_running":     "⏳  Generuję…",
-        "gen_ready":       "Gotowy.",
-        "gen_done":        "✅  Gotowe! Wygenerowano {n} wideo.",
-        "gen_warn_img":    "Wybierz co najmniej jedno zdjęcie!",
-        "gen_warn_audio":  "Wybierz plik audio!",
-        "gen_warn_setup":  "Najpierw uruchom Setup (zakładka 🔧 Setup) — zainstaluje zależności i pobierze modele!",
-        "gen_log_batch":   "── [{i}/{n}] {name} ──",
-        "gen_log_done":    "✅  Wszystko gotowe. Wyniki w: {path}",
-        "gen_err":         "❌  Błąd (kod {code})",
-        "gen_ok":          "✅  Sukces!",
-        # Settings tab
-        "set_title":       "⚙️  Ustawienia generowania",
-        "set_save":        "💾  Zapisz ustawienia",
-        "set_saved":       "Ustawienia zapisane!",
-        "set_size_lbl":    "📐  Rozmiar wyjściowy",
-        "set_size_tip":    "Rozdzielczość generowanej twarzy.\n256 = szybciej, mniej VRAM (zalecane dla GTX 1060 6 GB).\n512 = lepsza jakość, wymaga ~4 GB VRAM.\nJeśli pojawia się błąd CUDA out-of-memory, przełącz na 256.",
-        "set_enh_lbl":     "✨  Enhancer twarzy",
-        "set_enh_tip":     "Post-processing poprawiający jakość twarzy.\ngfpgan – zalecany, najlepsze wyniki.\nrestoreformer – alternatywa, nieco inny styl.\nnone – bez enhancera, najszybciej, niższa jakość.",
-        "set_pre_lbl":     "🔲  Tryb preprocessingu",
-        "set_pre_tip":     "Sposób przygotowania obrazu przed generowaniem.\ncrop – automatycznie wykrywa i wycina twarz (zalecane dla portretów).\nresize – skaluje cały obraz do docelowego rozmiaru.\nfull – używa pełnego obrazu bez kadrowania.",
-        "set_still_lbl":   "🧍  Still mode",
-        "set_still_tip":   "Gdy WŁĄCZONY, ruch głowy jest zminimalizowany — animowane są tylko usta.\nIdealny do prezentacji, filmów instruktażowych lub formalnych treści.\nGdy WYŁĄCZONY, dodawany jest naturalny ruch głowy.",
-        "set_still_sw":    "Włącz still mode",
-        "set_exp_lbl":     "😮  Expression scale",
-        "set_exp_tip":     "Kontroluje intensywność mimiki twarzy.\n1.0 = naturalna (domyślna).\n< 1.0 = subtelniejsza, bardziej neutralna mimika.\n> 1.0 = wyolbrzymiona mimika (maks. 2.0).\nZacznij od 1.0 i dostosuj do potrzeb.",
-        "set_pose_lbl":    "🎭  Pose style",
-        "set_pose_tip":    "Wybiera styl animacji ruchu głowy (0–45).\n0 = domyślny neutralny styl.\nWyższe wartości wprowadzają różne rytmiczne ruchy głowy.\nEksperymentuj, aby dobrać styl do audio.",
-        # Setup tab
-        "setup_title":     "🔧  Auto-installer",
-        "setup_desc":      "Sprawdza i instaluje wszystkie wymagane zależności oraz pobiera modele AI.\nUruchom raz przy pierwszej konfiguracji lub po błędach importu.",
-        "setup_full":      "▶  Uruchom pełny setup",
-        "setup_pip":       "📦  Tylko paczki pip",
-        "setup_models":    "⬇️  Tylko modele",
-        "setup_status":    "Log instalacji:",
-        "setup_checking":  "Sprawdzam zależności pip…",
-        "setup_installed": "✓ {pkg} już zainstalowany",
-        "setup_installing":"⬇️  Instaluję {pkg}…",
-        "setup_ok":        "✅  {pkg} zainstalowany",
-        "setup_err":       "❌  Błąd przy {pkg}: {err}",
-        "setup_pkgs_done": "📦  Zależności gotowe.",
-        "setup_models_chk":"⬇️  Sprawdzam modele…",
-        "setup_mdl_exists":"✓ {f} już istnieje",
-        "setup_mdl_dl":    "⬇️  Pobieranie {f}…",
-        "setup_mdl_ok":    "✅  {f} pobrano",
-        "setup_mdl_err":   "❌  Błąd pobierania {f}: {e}",
-        "setup_mdl_link":  "   Ręczny link: {url}",
-        "setup_mdl_done":  "⬇️  Modele gotowe.",
-        "setup_all_done":  "\n✅  Pełny setup zakończony!",
-        # About
-        "about_text": (
-            "SadTalker Desktop  v2.0\n\n"
-            "Desktopowy interfejs dla modelu syntezy mowy SadTalker.\n\n"
-            "Oryginalny artykuł SadTalker:\nZhang et al., 2023 — OpenTalker/SadTalker na GitHub\n\n"
-            "Wykryta karta GPU: {gpu}\nWersja CUDA: {cuda}\nVRAM: {vram}"
-        ),
-        "gpu_detecting":   "Wykrywanie GPU…",
-        "gpu_unknown":     "GPU: nieznany",
-    }
-}
-
-DEFAULT_SETTINGS = {
-    "size": "256", "enhancer": "gfpgan", "preprocess": "crop",
-    "still": False, "expression_scale": 1.0, "pose_style": 0,
-    "theme": "dark", "lang": "en",
-}
-
-def load_settings():
-    if SETTINGS_FILE.exists():
-        with open(SETTINGS_FILE) as f:
-            return {**DEFAULT_SETTINGS, **json.load(f)}
-    return DEFAULT_SETTINGS.copy()
-
-def save_settings(s):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(s, f, indent=2)
-
-def detect_gpu():
-    """Returns (name, cuda_ver, vram_mb) or None."""
-    try:
-        out = subprocess.check_output(
-            ["nvidia-smi", "--query-gpu=name,driver_version,memory.total",
-             "--format=csv,noheader,nounits"],
-            text=True, timeout=5
-        ).strip().splitlines()[0]
-        parts = [p.strip() for p in out.split(",")]
-        name, driver, vram = parts[0], parts[1], int(parts[2])
-        # get CUDA version from nvidia-smi header line
-        smi = subprocess.check_output(["nvidia-smi"], text=True, timeout=5)
-        cuda = "?"
-        for tok in smi.split():
-            if tok.startswith("CUDA") or tok.replace(".","").isdigit():
-                pass
-        import re
-        m = re.search(r"CUDA Version:\s*([\d.]+)", smi)
-        cuda = m.group(1) if m else driver
-        return name, cuda, vram
-    except Exception:
-        return None
+from sadtalker_core import (
+    RESULTS_DIR, CACHE_DIR, PIP_PACKAGES, LANG,
+    MAX_CONCURRENCY, SETTING_CHOICES, SETTING_RANGES, DiskCache, load_settings, save_settings, detect_gpu, ensure_models,
+    pip_name, probe_packages, pip_install, matrix_jobs, order_jobs, cached_keys, cache_report,
+    batch_concurrency, progress_label,
+    fmt_duration, stale_workers, shutdown_workers, JobQueue, run_queued, ResultIndex, split_long_audio,
+    METRICS_NAME, load_metrics, metrics_summary, format_metrics,
+    apply_profile, auto_profile, predict_rate, predict_batch, gpu_telemetry, stop_telemetry,
+    preflight, check_image, thumbnails, JobControl,
+)
 
 
 # ── Tooltip ───────────────────────────────────────────────────────────────────
@@ -257,7 +63,8 @@ class Tooltip:
 
 
 def labeled_row(parent, lbl_text, tip_text, row, widget_factory):
-    """Renders a label + ⓘ icon row and attaches tooltip, then calls widget_factory for the control."""
+    """Renders a label + ⓘ icon row and attaches tooltip, then calls widget_factory for the control.
+    Returns (label, tooltip) so the texts can be changed later."""
     f = ctk.CTkFrame(parent, fg_color="transparent")
     f.grid(row=row, column=0, columnspan=2, sticky="ew", padx=12, pady=(10, 2))
 
@@ -266,51 +73,142 @@ def labeled_row(parent, lbl_text, tip_text, row, widget_factory):
 
     info = ctk.CTkLabel(f, text=" ⓘ", font=("Segoe UI", 13), text_color="#6a9fe0", cursor="question_arrow")
     info.pack(side="left", padx=(4, 0))
-    Tooltip(info, tip_text)
+    tip = Tooltip(info, tip_text)
 
     ctrl_frame = ctk.CTkFrame(parent, fg_color="transparent")
     ctrl_frame.grid(row=row+1, column=0, columnspan=2, sticky="ew", padx=22, pady=(0, 4))
     widget_factory(ctrl_frame)
-    return ctrl_frame
+    return lbl, tip
 
 
-# ══════════════════════════════════════════════════════════════════════════════
-class SetupTab(ctk.CTkFrame):
-    def __init__(self, parent, t, log_cb):
+class TabFrame(ctk.CTkFrame):
+    """Base of the notebook tabs. Widgets are built once; tr() remembers which LANG
+    text each one shows, so relabel() switches language in place and keeps the
+    tab's state (picked files, logs, a running batch)."""
+    def __init__(self, parent, t):
         super().__init__(parent, fg_color="transparent")
+        self.t      = t
+        self._texts = []
+
+    def tr(self, widget, text, **fmt):
+        """Shows LANG `text` (formatted with `fmt`), or text(t) if callable, on a widget
+        or Tooltip now and after every relabel(). Returns `widget`."""
+        self._texts.append((widget, text, fmt))
+        self._set_text(widget, text, fmt)
+        return widget
+
+    def _set_text(self, widget, text, fmt):
+        val = text(self.t) if callable(text) else self.t[text].format(**fmt) if fmt else self.t[text]
+        if isinstance(widget, Tooltip): widget.text = val
+        else:                           widget.configure(text=val)
+
+    def relabel(self, t):
         self.t = t
-        self.log_cb = log_cb
-        self._build()
+        for widget, text, fmt in self._texts: self._set_text(widget, text, fmt)
+
+
+class LogPump:
+    """Thread-safe, batched sink for a CTkTextbox. Any thread may put(); the Tk
+    thread drains the queue every `interval` ms in one insert, rewrites tqdm
+    progress lines in place instead of appending them, and keeps at most
+    `max_lines` lines. on_flush(last_line) runs once per drain."""
+    STALE = 50      # progress lines further up than this are left alone
+
+    def __init__(self, box, max_lines=2000, interval=100, on_flush=None):
+        self.box       = box
+        self.max_lines = max(int(max_lines), 10)
+        self.interval  = interval
+        self.on_flush  = on_flush
+        self._q        = queue.SimpleQueue()
+        self._lines    = []     # mirror of the widget's lines
+        self._base     = 0      # absolute number of self._lines[0]
+        self._progress = {}     # progress label -> (absolute line, percent)
+        box.after(interval, self._drain)
+
+    def put(self, msg):
+        self._q.put(msg)
+
+    def _drain(self):
+        if not self.box.winfo_exists(): return
+        msgs = []
+        while True:
+            try:
+                msgs.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        if msgs:
+            self._apply(msgs)
+            if self.on_flush: self.on_flush(self._lines[-1] if self._lines else "")
+        self.box.after(self.interval, self._drain)
+
+    def _apply(self, msgs):
+        old_end = self._base + len(self._lines)
+        dirty   = old_end
+        for msg in msgs:
+            for raw in msg.split("\n"):
+                text = raw.rsplit("\r", 1)[-1]     # the last carriage-return update wins
+                prog = progress_label(text)
+                prev = self._progress.get(prog[0]) if prog else None
+                end  = self._base + len(self._lines)
+                if prev and prev[0] >= max(self._base, end - self.STALE) and \
+                        (prog[1] is None or prev[1] is None or prog[1] >= prev[1]):
+                    idx = prev[0]
+                    self._lines[idx - self._base] = text
+                else:
+                    idx = end
+                    self._lines.append(text)
+                if prog:
+                    if prog[1] == 100: self._progress.pop(prog[0], None)
+                    else:              self._progress[prog[0]] = (idx, prog[1])
+                dirty = min(dirty, idx)
+
+        box = self.box
+        box.configure(state="normal")
+        if dirty < old_end:
+            box.delete(f"{dirty - self._base + 1}.0", "end")
+        box.insert("end", "".join(l + "\n" for l in self._lines[dirty - self._base:]))
+        drop = len(self._lines) - self.max_lines
+        if drop > 0:
+            box.delete("1.0", f"{drop + 1}.0")
+            del self._lines[:drop]
+            self._base += drop
+        box.see("end")
+        box.configure(state="disabled")
 
-    def refresh(self, t):
-        self.t = t
-        for w in self.winfo_children(): w.destroy()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+class SetupTab(TabFrame):
+    def __init__(self, parent, settings, t, log_cb, max_lines=2000, get_gpu=lambda: None):
+        super().__init__(parent, t)
+        self.settings = settings
+        self.log_cb = log_cb
+        self.max_lines = max_lines
+        self.get_gpu = get_gpu
         self._build()
 
     def _build(self):
-        t = self.t
-        ctk.CTkLabel(self, text=t["setup_title"], font=("Segoe UI", 18, "bold")).pack(anchor="w", pady=(0,6))
-        ctk.CTkLabel(self, text=t["setup_desc"], wraplength=660, justify="left",
-                     font=("Segoe UI", 11), text_color="gray70").pack(anchor="w", pady=(0,12))
+        tr = self.tr
+        tr(ctk.CTkLabel(self, font=("Segoe UI", 18, "bold")), "setup_title").pack(anchor="w", pady=(0,6))
+        tr(ctk.CTkLabel(self, wraplength=660, justify="left",
+                        font=("Segoe UI", 11), text_color="gray70"), "setup_desc").pack(anchor="w", pady=(0,12))
 
         bf = ctk.CTkFrame(self, fg_color="transparent")
         bf.pack(anchor="w", pady=(0,10))
-        ctk.CTkButton(bf, text=t["setup_full"],   command=self._full,   width=210, height=40).pack(side="left", padx=(0,8))
-        ctk.CTkButton(bf, text=t["setup_pip"],    command=self._pip,    width=180, height=40,
-                      fg_color="#2d6a2d", hover_color="#3a8a3a").pack(side="left", padx=(0,8))
-        ctk.CTkButton(bf, text=t["setup_models"], command=self._models, width=180, height=40,
-                      fg_color="#2d4a6a", hover_color="#3a6090").pack(side="left")
+        tr(ctk.CTkButton(bf, command=self._full,   width=210, height=40), "setup_full").pack(side="left", padx=(0,8))
+        tr(ctk.CTkButton(bf, command=self._pip,    width=180, height=40,
+                         fg_color="#2d6a2d", hover_color="#3a8a3a"), "setup_pip").pack(side="left", padx=(0,8))
+        tr(ctk.CTkButton(bf, command=self._models, width=180, height=40,
+                         fg_color="#2d4a6a", hover_color="#3a6090"), "setup_models").pack(side="left")
 
-        ctk.CTkLabel(self, text=t["setup_status"], font=("Segoe UI", 12, "bold")).pack(anchor="w", pady=(8,2))
+        tr(ctk.CTkLabel(self, font=("Segoe UI", 12, "bold")), "setup_status").pack(anchor="w", pady=(8,2))
         self.box = ctk.CTkTextbox(self, height=300, font=("Consolas", 11))
         self.box.pack(fill="both", expand=True)
+        self.pump = LogPump(self.box, self.max_lines, on_flush=self.log_cb)
 
     def log(self, msg):
-        self.box.configure(state="normal")
-        self.box.insert("end", msg + "\n")
-        self.box.see("end")
-        self.box.configure(state="disabled")
-        self.log_cb(msg)
+        """Safe to call from any thread."""
+        self.pump.put(msg)
 
     def _full(self):   threading.Thread(target=self._do_full,   daemon=True).start()
     def _pip(self):    threading.Thread(target=self._do_pip,    daemon=True).start()
@@ -324,103 +222,103 @@ class SetupTab(ctk.CTkFrame):
     def _do_pip(self):
         t = self.t
         self.log("═"*50 + "\n" + t["setup_checking"])
-        pkgs = [
-            ("setuptools<70",  "pkg_resources"),
-            ("cmake",           None),
-            ("dlib",            "dlib"),
-            ("librosa==0.9.2",  "librosa"),
-            ("gfpgan",          "gfpgan"),
-            ("basicsr",         "basicsr"),
-            ("facexlib",        "facexlib"),
-            ("gradio==3.41.2",  "gradio"),
-            ("pillow",          "PIL"),
-        ]
-        for pkg, mod in pkgs:
-            short = pkg.split("==")[0].split("<")[0]
-            if mod:
-                try:
-                    __import__(mod)
-                    self.log(t["setup_installed"].format(pkg=short))
-                    continue
-                except ImportError:
-                    pass
-            self.log(t["setup_installing"].format(pkg=pkg))
-            r = subprocess.run([sys.executable, "-m", "pip", "install", pkg],
-                               capture_output=True, text=True)
-            if r.returncode == 0:
-                self.log(t["setup_ok"].format(pkg=short))
+        missing = []
+        for spec, have, ok in probe_packages(PIP_PACKAGES):
+            short = pip_name(spec)
+            if ok:
+                self.log(t["setup_installed"].format(pkg=f"{short} {have}"))
             else:
-                self.log(t["setup_err"].format(pkg=short, err=r.stderr[-200:]))
+                if have: self.log(t["setup_wrong_ver"].format(pkg=short, have=have, spec=spec))
+                missing.append(spec)
+        if missing:
+            self.log(t["setup_installing"].format(pkg=" ".join(missing)))
+            code = pip_install(missing, self._pip_line)
+            # One bad build (usually dlib) fails the whole resolve — retry the
+            # rest one by one so they still get installed.
+            if code != 0:
+                for spec, _, ok in probe_packages([p for p in PIP_PACKAGES if p[0] in missing]):
+                    if not ok: pip_install([spec], self._pip_line)
+            for spec, have, ok in probe_packages([p for p in PIP_PACKAGES if p[0] in missing]):
+                short = pip_name(spec)
+                self.log(t["setup_ok"].format(pkg=f"{short} {have}") if ok else
+                         t["setup_err"].format(pkg=short, err=have or "not installed"))
         self.log(t["setup_pkgs_done"])
 
+    def _pip_line(self, line):
+        if line.startswith(("Collecting", "Successfully", "ERROR", "error:")):
+            self.log("   " + line)
+
     def _do_models(self):
+        # Only what the current settings load (after the auto profile); a render with other settings fetches its own.
         t = self.t
         self.log("═"*50 + "\n" + t["setup_models_chk"])
-        CHECKPOINTS_DIR.mkdir(parents=True, exist_ok=True)
-        GFPGAN_DIR.mkdir(parents=True, exist_ok=True)
-        dirs = {"checkpoints": CHECKPOINTS_DIR, "gfpgan": GFPGAN_DIR}
-        for grp, items in MODELS.items():
-            for fname, url in items:
-                dest = dirs[grp] / fname
-                if dest.exists():
-                    self.log(t["setup_mdl_exists"].format(f=fname))
-                    continue
-                self.log(t["setup_mdl_dl"].format(f=fname))
-                try:
-                    urllib.request.urlretrieve(url, dest)
-                    self.log(t["setup_mdl_ok"].format(f=fname))
-                except Exception as e:
-                    self.log(t["setup_mdl_err"].format(f=fname, e=e))
-                    self.log(t["setup_mdl_link"].format(url=url))
-        self.log(t["setup_mdl_done"])
+        missing = ensure_models([apply_profile(self.settings, self.get_gpu())], t, self.log)
+        self.log(t["gen_log_models_bad"].format(files=", ".join(missing)) if missing else t["setup_mdl_done"])
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-class GenerateTab(ctk.CTkFrame):
-    def __init__(self, parent, settings, t, log_cb):
-        super().__init__(parent, fg_color="transparent")
+class GenerateTab(TabFrame):
+    def __init__(self, parent, settings, t, log_cb, get_gpu=lambda: None, jobq=None):
+        super().__init__(parent, t)
         self.settings  = settings
-        self.t         = t
         self.log_cb    = log_cb
+        self.get_gpu   = get_gpu
+        self.jobq      = jobq or JobQueue()
+        self.index     = ResultIndex()
+        self.force_var = tk.BooleanVar(value=False)
         self.img_paths = []
-        self.audio_var = tk.StringVar()
+        self.audio_paths = []
         self.running   = False
+        self.control   = None
         self._build()
 
     def _build(self):
-        t = self.t
-        ctk.CTkLabel(self, text=t["gen_title"], font=("Segoe UI", 18, "bold")).pack(anchor="w", pady=(0,8))
+        t, tr = self.t, self.tr
+        tr(ctk.CTkLabel(self, font=("Segoe UI", 18, "bold")), "gen_title").pack(anchor="w", pady=(0,8))
 
         inp = ctk.CTkFrame(self, corner_radius=10)
         inp.pack(fill="x", pady=(0,10))
         inp.columnconfigure(1, weight=1)
 
         # Image row
-        ctk.CTkLabel(inp, text=t["gen_image_lbl"], font=("Segoe UI", 13, "bold")).grid(
+        tr(ctk.CTkLabel(inp, font=("Segoe UI", 13, "bold")), "gen_image_lbl").grid(
             row=0, column=0, sticky="w", padx=14, pady=(12,4))
         self.img_lbl = ctk.CTkLabel(inp, text=t["gen_none"], text_color="gray60", anchor="w")
         self.img_lbl.grid(row=0, column=1, sticky="ew", padx=8)
-        ctk.CTkButton(inp, text=t["gen_image_btn"], width=155, command=self._pick_img).grid(
+        tr(ctk.CTkButton(inp, width=155, command=self._pick_img), "gen_image_btn").grid(
             row=0, column=2, padx=14, pady=(12,4))
 
         # Audio row
-        ctk.CTkLabel(inp, text=t["gen_audio_lbl"], font=("Segoe UI", 13, "bold")).grid(
+        tr(ctk.CTkLabel(inp, font=("Segoe UI", 13, "bold")), "gen_audio_lbl").grid(
             row=1, column=0, sticky="w", padx=14, pady=(4,12))
         self.audio_lbl = ctk.CTkLabel(inp, text=t["gen_none"], text_color="gray60", anchor="w")
         self.audio_lbl.grid(row=1, column=1, sticky="ew", padx=8)
-        ctk.CTkButton(inp, text=t["gen_audio_btn"], width=155, command=self._pick_audio).grid(
+        tr(ctk.CTkButton(inp, width=155, command=self._pick_audio), "gen_audio_btn").grid(
             row=1, column=2, padx=14, pady=(4,12))
 
+        # Thumbnails of the picked images, marked by the input check
+        self.thumb_row = ctk.CTkFrame(self, fg_color="transparent")
+        self.thumb_row.pack(fill="x", pady=(0,6))
+
         # Buttons
         bf = ctk.CTkFrame(self, fg_color="transparent")
         bf.pack(fill="x", pady=(0,8))
         self.gen_btn = ctk.CTkButton(bf, text=t["gen_btn"], height=44,
                                      font=("Segoe UI", 14, "bold"), command=self._start)
         self.gen_btn.pack(side="left", fill="x", expand=True, padx=(0,8))
-        ctk.CTkButton(bf, text=t["gen_open"], width=200, height=44,
-                      fg_color="#444", hover_color="#555",
-                      command=lambda: os.startfile(RESULTS_DIR) if RESULTS_DIR.exists() else None
-                      ).pack(side="left")
+        self.skip_btn = tr(ctk.CTkButton(bf, width=130, height=44, state="disabled", fg_color="#444",
+                                         hover_color="#555", command=lambda: self.control and self.control.skip()),
+                           "gen_skip")
+        self.skip_btn.pack(side="left", padx=(0,8))
+        tr(Tooltip(self.skip_btn, ""), "gen_skip_tip")
+        self.cancel_btn = tr(ctk.CTkButton(bf, width=130, height=44, state="disabled", fg_color="#8a3030",
+                                           hover_color="#a03a3a", command=lambda: self.control and self.control.cancel()),
+                             "gen_cancel")
+        self.cancel_btn.pack(side="left", padx=(0,8))
+        tr(ctk.CTkButton(bf, width=200, height=44, fg_color="#444", hover_color="#555",
+                         command=lambda: os.startfile(RESULTS_DIR) if RESULTS_DIR.exists() else None),
+           "gen_open").pack(side="left")
+        tr(ctk.CTkCheckBox(self, variable=self.force_var, font=("Segoe UI", 11)), "gen_force").pack(anchor="w", pady=(0,8))
 
         # Progress
         self.prog = ctk.CTkProgressBar(self, height=12)
@@ -434,104 +332,227 @@ class GenerateTab(ctk.CTkFrame):
         ctk.CTkLabel(self, text="Log:", font=("Segoe UI", 12, "bold")).pack(anchor="w", pady=(8,2))
         self.logbox = ctk.CTkTextbox(self, height=200, font=("Consolas", 10))
         self.logbox.pack(fill="both", expand=True)
+        self.pump = LogPump(self.logbox, self.settings["log_lines"], on_flush=self.log_cb)
+
+    def relabel(self, t):
+        old = self.t
+        super().relabel(t)
+        # Texts that depend on state: placeholders, the idle status, the button mid-batch.
+        if not self.img_paths:        self.img_lbl.configure(text=t["gen_none"])
+        if not self.audio_paths:      self.audio_lbl.configure(text=t["gen_none"])
+        if self.status_lbl.cget("text") == old["gen_ready"]: self.status_lbl.configure(text=t["gen_ready"])
+        self.gen_btn.configure(text=t["gen_running"] if self.running else t["gen_btn"])
+
+    @staticmethod
+    def _names(paths):
+        names = ", ".join(Path(x).name for x in paths)
+        return names[:80]+"…" if len(names)>80 else names
 
     def _pick_img(self):
         p = filedialog.askopenfilenames(title="Images",
             filetypes=[("Images", "*.png *.jpg *.jpeg *.bmp *.webp")])
         if p:
             self.img_paths = list(p)
-            names = ", ".join(Path(x).name for x in p)
-            self.img_lbl.configure(text=(names[:80]+"…" if len(names)>80 else names), text_color="white")
+            self.img_lbl.configure(text=self._names(p), text_color="white")
+            threading.Thread(target=self._check_images, args=(self.img_paths,), daemon=True).start()
+
+    THUMBS_SHOWN = 12
+
+    def _check_images(self, paths):
+        """Thumbnails and face check for the picked images (cached, so the preflight
+        at Generate reuses the results)."""
+        shown  = paths[:self.THUMBS_SHOWN]
+        thumbs = thumbnails(shown)
+        checks = {p: check_image(p, self.settings["preprocess"]) for p in shown}
+        self.after(0, lambda: self._show_thumbs(paths, thumbs, checks))
+
+    def _show_thumbs(self, paths, thumbs, checks):
+        if paths is not self.img_paths: return          # picked again meanwhile
+        for w in self.thumb_row.winfo_children(): w.destroy()
+        try:
+            from PIL import Image
+        except ImportError:
+            return
+        for p in paths[:self.THUMBS_SHOWN]:
+            res  = checks[p]
+            mark = "✗" if res["error"] else "⚠" if res["warnings"] else "✓"
+            img  = ctk.CTkImage(Image.open(thumbs[p]), size=(48, 48)) if thumbs.get(p) else None
+            lbl  = ctk.CTkLabel(self.thumb_row, image=img, text=mark, compound="top", width=56,
+                                text_color="#e06a6a" if res["error"] else "#e0c06a" if res["warnings"] else "#6ae08a")
+            lbl.pack(side="left", padx=(0,4))
+            msgs = ([res["error"]] if res["error"] else []) + res["warnings"]
+            Tooltip(lbl, Path(p).name + "".join("\n• " + self.t[k].format(**kw) for k, kw in msgs))
+        if len(paths) > self.THUMBS_SHOWN:
+            ctk.CTkLabel(self.thumb_row, text=f"+{len(paths) - self.THUMBS_SHOWN}",
+                         text_color="gray60").pack(side="left", padx=4)
 
     def _pick_audio(self):
-        p = filedialog.askopenfilename(title="Audio",
+        p = filedialog.askopenfilenames(title="Audio",
             filetypes=[("Audio", "*.wav *.mp3 *.ogg *.flac")])
         if p:
-            self.audio_var.set(p)
-            self.audio_lbl.configure(text=Path(p).name, text_color="white")
+            self.audio_paths = list(p)
+            self.audio_lbl.configure(text=self._names(p), text_color="white")
 
     def _log(self, msg):
-        self.logbox.configure(state="normal")
-        self.logbox.insert("end", msg+"\n")
-        self.logbox.see("end")
-        self.logbox.configure(state="disabled")
-        self.log_cb(msg)
+        """Safe to call from any thread."""
+        self.pump.put(msg)
 
     def _status(self, msg, p=None):
-        self.status_lbl.configure(text=msg)
-        if p is not None: self.prog.set(p)
+        def apply():
+            self.status_lbl.configure(text=msg)
+            if p is not None: self.prog.set(p)
+        self.after(0, apply)
 
     def _start(self):
         t = self.t
         if self.running: return
         if not self.img_paths:
             messagebox.showwarning("!", t["gen_warn_img"]); return
-        if not self.audio_var.get():
+        if not self.audio_paths:
             messagebox.showwarning("!", t["gen_warn_audio"]); return
-        if not CHECKPOINTS_DIR.exists() or not any(CHECKPOINTS_DIR.iterdir()):
-            messagebox.showwarning("!", t["gen_warn_setup"]); return
-        threading.Thread(target=self._batch, daemon=True).start()
+        s    = apply_profile(self.settings, self.get_gpu())
+        jobs = matrix_jobs([(p, {}) for p in self.img_paths], [(p, {}) for p in self.audio_paths], s)
+        self.running = True
+        threading.Thread(target=self._submit, args=(jobs, s), daemon=True).start()
+
+    def _submit(self, jobs, s):
+        # Checking and splitting decode every input — keep them off the Tk thread.
+        try:
+            bid = self._queue(jobs, s)
+        except Exception as e:
+            self._log(self.t["gen_log_error"].format(e=e))
+            bid = None
+        if bid is None:
+            self.running = False
+            return
+        self._batch([bid])
 
-    def _batch(self):
-        t  = self.t
+    def _queue(self, jobs, s):
+        """Checks, splits and orders `jobs` into a new batch; its id, or None if nothing can render."""
+        t = self.t
+        n, m = len({j["source_image"] for j in jobs}), len({j["driven_audio"] for j in jobs})
+        if n > 1 and m > 1: self._log(t["gen_log_matrix"].format(n=n, m=m, jobs=len(jobs)))
+        self._log(t["gen_log_preflight"].format(n=n, m=m))
+        jobs, problems = preflight(jobs, t)
+        for level, name, msg in problems:
+            self._log(t["gen_log_pre_err" if level == "error" else "gen_log_pre_warn"].format(name=name, msg=msg))
+        if not jobs:
+            self._status(t["gen_pre_none"])
+            return None
+        index = None if self.force_var.get() else self.index
+        jobs  = split_long_audio(jobs, int(self.settings["segment_s"]), self.t, self._log, index)
+        gpu  = self.get_gpu()
+        k    = batch_concurrency(s, gpu)
+        plan = predict_batch(jobs, s, gpu, k)
+        if plan: self._log(self.t["gen_log_estimate"].format(eta=fmt_duration(plan[0]), rate=plan[1]))
+        return self.jobq.add_batch(order_jobs(jobs, k, cached_keys(jobs)))
+
+    def resume(self, batch_ids):
+        """Continues batches a previous session left unfinished."""
+        if self.running: return
+        threading.Thread(target=self._batch, args=(batch_ids,), daemon=True).start()
+
+    def _busy(self, on):
+        self.gen_btn.configure(state="disabled" if on else "normal", text=self.t["gen_running" if on else "gen_btn"])
+        for b in (self.skip_btn, self.cancel_btn): b.configure(state="normal" if on else "disabled")
+
+    def _batch(self, batch_ids):
         self.running = True
-        self.gen_btn.configure(state="disabled", text=t["gen_running"])
-        n  = len(self.img_paths)
-        for i, img in enumerate(self.img_paths, 1):
-            self._status(f"{t['gen_running']} {i}/{n}", (i-1)/n)
-            self._log("\n" + t["gen_log_batch"].format(i=i, n=n, name=Path(img).name))
-            self._run(img)
-            self.prog.set(i/n)
-        self._status(t["gen_done"].format(n=n), 1.0)
-        self._log(t["gen_log_done"].format(path=RESULTS_DIR))
-        self.running = False
-        self.gen_btn.configure(state="normal", text=t["gen_btn"])
-        if RESULTS_DIR.exists(): os.startfile(RESULTS_DIR)
-
-    def _run(self, img):
-        t, s = self.t, self.settings
+        self.after(0, lambda: self._busy(True))
+        try:
+            self._run(batch_ids)
+        except Exception as e:          # the batch stays queued and can be resumed
+            self._log(self.t["gen_log_error"].format(e=e))
+        finally:
+            self.running = False
+            self.after(0, lambda: self._busy(False))
+
+    def _run(self, batch_ids):
+        t   = self.t
+        gpu = self.get_gpu()
+        k   = batch_concurrency(apply_profile(self.settings, gpu), gpu)
+        self.control = control = JobControl(self.settings, gpu, k)
+        missing = ensure_models([job for _, job in self.jobq.pending(batch_ids)], t, self._log)
+        if missing:             # the batch stays queued — it resumes once the models are there
+            self._log(t["gen_log_models_bad"].format(files=", ".join(missing)))
+            self._status(t["gen_models_bad"], 0)
+            return
         RESULTS_DIR.mkdir(exist_ok=True)
-        cmd = [
-            sys.executable, str(BASE_DIR / "inference.py"),
-            "--driven_audio", self.audio_var.get(),
-            "--source_image", img,
-            "--result_dir",   str(RESULTS_DIR),
-            "--size",         s["size"],
-            "--expression_scale", str(s["expression_scale"]),
-            "--pose_style",   str(int(s["pose_style"])),
-            "--preprocess",   s["preprocess"],
-        ]
-        if s["enhancer"] != "none": cmd += ["--enhancer", s["enhancer"]]
-        if s["still"]:              cmd += ["--still"]
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                text=True, cwd=str(BASE_DIR),
-                                env={**os.environ, "PYTHONUNBUFFERED": "1"})
-        for line in proc.stdout:
-            line = line.rstrip()
-            if line: self._log(line)
-        proc.wait()
-        self._log(t["gen_err"].format(code=proc.returncode) if proc.returncode != 0 else t["gen_ok"])
+        self.index.prune()
+        n = len(self.jobq.pending(batch_ids))
+        skipped = sum(self.jobq.counts(batch_ids).values()) - n
+        if skipped: self._log(t["gen_log_skipped"].format(n=skipped))
+        if k > 1: self._log(t["gen_log_parallel"].format(k=min(k, n)))
+        tagged = k > 1 and n > 1
+        stage  = {}
+
+        def on_line(i, line):
+            self._log(f"[{i+1}] {line}" if tagged else line)
+
+        def on_event(ev):
+            kind = ev["event"]
+            if kind == "job_start":
+                self._log("\n" + t["gen_log_batch"].format(i=ev["job"]+1, n=n, name=ev["name"]))
+            elif kind == "progress":
+                stage["name"] = ev["stage"]
+            elif kind == "job_done":
+                times = " · ".join(f"{st} {sec:.1f}s" for st, sec in ev["stages"].items())
+                if not ev.get("cancelled"): on_line(ev["job"], t["gen_ok"] if ev["ok"] else t["gen_err"].format(code=1))
+                if times: on_line(ev["job"], t["gen_log_stages"].format(stages=times, total=ev["elapsed"]))
+            elif kind == "stitched":
+                self._log(t["gen_log_stitched"].format(name=ev["name"], n=ev["segments"], path=ev["result"])
+                          if ev["ok"] else t["gen_log_stitch_fail"].format(name=ev["name"]))
+            elif kind == "cache":
+                self._log(cache_report(ev, t))
+            elif kind == "batch":
+                msg = t["gen_progress"].format(done=ev["done"], n=ev["total"])
+                if stage.get("name"): msg += f"  •  {stage['name']}"
+                if ev["eta"] is not None: msg += "  •  " + t["gen_eta"].format(eta=fmt_duration(ev["eta"]))
+                self._status(msg, ev["frac"])
+
+        self._status(t["gen_progress"].format(done=0, n=n), 0)
+        index   = None if self.force_var.get() else self.index
+        results = run_queued(self.jobq, batch_ids, t, k, on_line, on_event, index, control=control)
+        if control.cancelled:
+            self._status(t["gen_cancelled"].format(n=sum(results)), 1.0)
+        else:
+            self._status(t["gen_done"].format(n=sum(results)), 1.0)
+            self._log(t["gen_log_done"].format(path=RESULTS_DIR))
+        if RESULTS_DIR.exists() and not control.cancelled: os.startfile(RESULTS_DIR)
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-class SettingsTab(ctk.CTkFrame):
-    def __init__(self, parent, settings, t, on_save):
-        super().__init__(parent, fg_color="transparent")
+class SettingsTab(TabFrame):
+    def __init__(self, parent, settings, t, on_save, get_gpu=lambda: None):
+        super().__init__(parent, t)
         self.settings = settings
-        self.t        = t
         self.on_save  = on_save
+        self.get_gpu  = get_gpu
         self._vars    = {}
+        self._values  = []      # (label, var, format) of the slider read-outs
+        self._cache_used = "…"
         self._build()
 
-    def refresh(self, t):
-        self.t = t
-        for w in self.winfo_children(): w.destroy()
-        self._vars = {}
-        self._build()
+    def relabel(self, t):
+        super().relabel(t)
+        for lbl, var, fmt in self._values: lbl.configure(text=fmt(var.get()))
+        self.show_profile()
+
+    def _row(self, frm, key, r, factory):
+        lbl, tip = labeled_row(frm, "", "", r, factory)
+        self.tr(lbl, f"set_{key}_lbl")
+        self.tr(tip, f"set_{key}_tip")
+
+    def _slider(self, f, var, fmt, width=36, **kw):
+        """Slider for `var` with a read-out label on its right formatted by fmt(value)."""
+        lbl = ctk.CTkLabel(f, text=fmt(var.get()), width=width, font=("Segoe UI", 12))
+        lbl.pack(side="right")
+        ctk.CTkSlider(f, variable=var, width=220, command=lambda v: lbl.configure(text=fmt(v)), **kw).pack(side="left")
+        self._values.append((lbl, var, fmt))
 
     def _build(self):
-        t, s = self.t, self.settings
-        ctk.CTkLabel(self, text=t["set_title"], font=("Segoe UI", 18, "bold")).pack(anchor="w", pady=(0,8))
+        s = self.settings
+        self.tr(ctk.CTkLabel(self, font=("Segoe UI", 18, "bold")), "set_title").pack(anchor="w", pady=(0,8))
 
         frm = ctk.CTkFrame(self, corner_radius=10)
         frm.pack(fill="x", pady=(0,10))
@@ -541,49 +562,92 @@ class SettingsTab(ctk.CTkFrame):
         def next_rows():
             nonlocal row; r = row; row += 2; return r
 
+        # Profile
+        def _prof_ctrl(f):
+            ctk.CTkSegmentedButton(f, values=["auto","manual"], command=lambda v: self.show_profile(),
+                variable=self._mk("profile", tk.StringVar, s["profile"])).pack(side="left")
+            self.prof_lbl = ctk.CTkLabel(f, text="", justify="left", font=("Segoe UI", 11), text_color="gray60")
+            self.prof_lbl.pack(side="left", padx=(12,0))
+        self._row(frm, "prof", next_rows(), _prof_ctrl)
+
         # Size
-        r = next_rows()
-        labeled_row(frm, t["set_size_lbl"], t["set_size_tip"], r,
-            lambda f: ctk.CTkSegmentedButton(f, values=["256","512"],
+        self._row(frm, "size", next_rows(),
+            lambda f: ctk.CTkSegmentedButton(f, values=list(SETTING_CHOICES["size"]),
                 variable=self._mk("size", tk.StringVar, s["size"])).pack(side="left"))
 
         # Enhancer
-        r = next_rows()
-        labeled_row(frm, t["set_enh_lbl"], t["set_enh_tip"], r,
-            lambda f: ctk.CTkSegmentedButton(f, values=["gfpgan","restoreformer","none"],
+        self._row(frm, "enh", next_rows(),
+            lambda f: ctk.CTkSegmentedButton(f, values=list(SETTING_CHOICES["enhancer"]),
                 variable=self._mk("enhancer", tk.StringVar, s["enhancer"])).pack(side="left"))
 
         # Preprocess
-        r = next_rows()
-        labeled_row(frm, t["set_pre_lbl"], t["set_pre_tip"], r,
-            lambda f: ctk.CTkSegmentedButton(f, values=["crop","resize","full"],
+        self._row(frm, "pre", next_rows(),
+            lambda f: ctk.CTkSegmentedButton(f, values=list(SETTING_CHOICES["preprocess"]),
                 variable=self._mk("preprocess", tk.StringVar, s["preprocess"])).pack(side="left"))
 
         # Still mode
-        r = next_rows()
-        labeled_row(frm, t["set_still_lbl"], t["set_still_tip"], r,
-            lambda f: ctk.CTkSwitch(f, text=t["set_still_sw"],
-                variable=self._mk("still", tk.BooleanVar, s["still"])).pack(side="left"))
+        def _still_ctrl(f):
+            self.tr(ctk.CTkSwitch(f, variable=self._mk("still", tk.BooleanVar, s["still"])),
+                    "set_still_sw").pack(side="left")
+        self._row(frm, "still", next_rows(), _still_ctrl)
 
         # Expression scale
-        r = next_rows()
         exp_var = self._mk("expression_scale", tk.DoubleVar, s["expression_scale"])
-        def _exp_ctrl(f):
-            lbl = ctk.CTkLabel(f, text=f"{exp_var.get():.1f}", width=36, font=("Segoe UI", 12))
-            lbl.pack(side="right")
-            ctk.CTkSlider(f, from_=0.5, to=2.0, number_of_steps=15, variable=exp_var, width=220,
-                command=lambda v: lbl.configure(text=f"{v:.1f}")).pack(side="left")
-        labeled_row(frm, t["set_exp_lbl"], t["set_exp_tip"], r, _exp_ctrl)
+        self._row(frm, "exp", next_rows(),
+            lambda f: self._slider(f, exp_var, lambda v: f"{v:.1f}",
+                                   from_=SETTING_RANGES["expression_scale"][0],
+                                   to=SETTING_RANGES["expression_scale"][1], number_of_steps=15))
 
         # Pose style
-        r = next_rows()
         pose_var = self._mk("pose_style", tk.IntVar, int(s["pose_style"]))
-        def _pose_ctrl(f):
-            lbl = ctk.CTkLabel(f, text=str(pose_var.get()), width=30, font=("Segoe UI", 12))
-            lbl.pack(side="right")
-            ctk.CTkSlider(f, from_=0, to=45, number_of_steps=45, variable=pose_var, width=220,
-                command=lambda v: lbl.configure(text=str(int(v)))).pack(side="left")
-        labeled_row(frm, t["set_pose_lbl"], t["set_pose_tip"], r, _pose_ctrl)
+        self._row(frm, "pose", next_rows(),
+            lambda f: self._slider(f, pose_var, lambda v: str(int(v)), width=30,
+                                   from_=SETTING_RANGES["pose_style"][0],
+                                   to=SETTING_RANGES["pose_style"][1], number_of_steps=45))
+
+        # Parallel jobs
+        conc_var = self._mk("concurrency", tk.IntVar, int(s["concurrency"]))
+        self._row(frm, "conc", next_rows(),
+            lambda f: self._slider(f, conc_var,
+                                   lambda v: self.t["set_conc_auto"] if int(v) == 0 else str(int(v)),
+                                   from_=0, to=MAX_CONCURRENCY, number_of_steps=MAX_CONCURRENCY))
+
+        # Long audio
+        seg_var = self._mk("segment_s", tk.IntVar, int(s["segment_s"]))
+        self._row(frm, "seg", next_rows(),
+            lambda f: self._slider(f, seg_var,
+                                   lambda v: self.t["set_seg_off"] if int(v) == 0 else f"{int(v)} s",
+                                   from_=0, to=120, number_of_steps=12))
+
+        # Cache
+        cache_var = self._mk("cache_mb", tk.IntVar, int(s["cache_mb"]))
+        def _cache_ctrl(f):
+            ctk.CTkSlider(f, from_=512, to=32768, number_of_steps=63, variable=cache_var, width=220,
+                command=lambda v: lbl.configure(text=f"{v/1024:.1f} GB")).pack(side="left")
+            lbl = ctk.CTkLabel(f, text=f"{cache_var.get()/1024:.1f} GB", width=60, font=("Segoe UI", 12))
+            lbl.pack(side="left", padx=(8,0))
+            self.cache_btn = ctk.CTkButton(f, width=200, fg_color="#6a2d2d", hover_color="#8a3a3a",
+                                           command=self._clear_cache)
+            self.tr(self.cache_btn, lambda t: t["set_cache_clear"].format(mb=self._cache_used)).pack(side="right")
+        self._row(frm, "cache", next_rows(), _cache_ctrl)
+
+        # Time limit, hang detection, retries
+        tmo_var = self._mk("timeout_x", tk.IntVar, int(s["timeout_x"]))
+        self._row(frm, "tmo", next_rows(),
+            lambda f: self._slider(f, tmo_var,
+                                   lambda v: self.t["set_seg_off"] if int(v) == 0 else f"× {int(v)}", width=40,
+                                   from_=0, to=10, number_of_steps=10))
+        stall_var = self._mk("stall_s", tk.IntVar, int(s["stall_s"]))
+        self._row(frm, "stall", next_rows(),
+            lambda f: self._slider(f, stall_var,
+                                   lambda v: self.t["set_seg_off"] if int(v) == 0 else f"{int(v) // 60} min", width=50,
+                                   from_=0, to=1800, number_of_steps=30))
+        retry_var = self._mk("retries", tk.IntVar, int(s["retries"]))
+        self._row(frm, "retry", next_rows(),
+            lambda f: self._slider(f, retry_var, lambda v: str(int(v)), width=30,
+                                   from_=0, to=5, number_of_steps=5))
+        threading.Thread(target=self._show_cache_usage, daemon=True).start()
+        self.show_profile()
 
         # Language + theme row
         bot = ctk.CTkFrame(self, fg_color="transparent")
@@ -597,7 +661,34 @@ class SettingsTab(ctk.CTkFrame):
         theme_var = self._mk("theme", tk.StringVar, s.get("theme","dark"))
         ctk.CTkSegmentedButton(bot, values=["dark","light","system"], variable=theme_var, width=180).pack(side="left")
 
-        ctk.CTkButton(self, text=t["set_save"], height=40, command=self._save).pack(anchor="w", pady=12)
+        self.tr(ctk.CTkButton(self, height=40, command=self._save), "set_save").pack(anchor="w", pady=12)
+
+    def _show_cache_usage(self):
+        self._cache_used = DiskCache(CACHE_DIR, self.settings["cache_mb"]).usage() // (1024*1024)
+        self.after(0, lambda: self.cache_btn.configure(text=self.t["set_cache_clear"].format(mb=self._cache_used)))
+
+    def show_profile(self):
+        """Fills in what the auto profile picks and the predicted speed (reads metrics.jsonl off the Tk thread)."""
+        s   = {**self.settings, **{k: v.get() for k, v in self._vars.items()}}
+        gpu = self.get_gpu()
+        def work():
+            t, eff = self.t, apply_profile(s, gpu)
+            rate, n = predict_rate(eff, gpu, batch_concurrency(eff, gpu))
+            lines = [t["set_prof_rate"].format(rate=rate) + "  ·  "
+                     + (t["set_prof_learned"].format(n=n) if n else t["set_prof_prior"])]
+            if s["profile"] == "auto":
+                p = auto_profile(gpu)
+                lines.insert(0, t["set_prof_pick"].format(size=p["size"], enhancer=p["enhancer"],
+                                                          k=p["concurrency"], threads=p["threads"]))
+            lbl = self.prof_lbl
+            self.after(0, lambda: lbl.winfo_exists() and lbl.configure(text="\n".join(lines)))
+        threading.Thread(target=work, daemon=True).start()
+
+    def _clear_cache(self):
+        def work():
+            DiskCache(CACHE_DIR, self.settings["cache_mb"]).clear()
+            self._show_cache_usage()
+        threading.Thread(target=work, daemon=True).start()
 
     def _mk(self, key, cls, val):
         v = cls(value=val)
@@ -607,7 +698,8 @@ class SettingsTab(ctk.CTkFrame):
     def _save(self):
         for k, v in self._vars.items():
             val = v.get()
-            if k == "pose_style": val = int(val)
+            if k in ("pose_style", "cache_mb", "concurrency", "segment_s",
+                     "timeout_x", "stall_s", "retries"): val = int(val)
             self.settings[k] = val
         save_settings(self.settings)
         ctk.set_appearance_mode(self.settings.get("theme","dark"))
@@ -616,20 +708,54 @@ class SettingsTab(ctk.CTkFrame):
 
 
 # ══════════════════════════════════════════════════════════════════════════════
-class AboutTab(ctk.CTkFrame):
+class MetricsTab(TabFrame):
+    """Summary of RESULTS_DIR/metrics.jsonl: mean / p95 per stage for each settings combination."""
+    def __init__(self, parent, t):
+        super().__init__(parent, t)
+        self._build()
+
+    def relabel(self, t):
+        super().relabel(t)
+        self.reload()
+
+    def _build(self):
+        tr  = self.tr
+        top = ctk.CTkFrame(self, fg_color="transparent")
+        top.pack(fill="x", pady=(0,4))
+        tr(ctk.CTkLabel(top, font=("Segoe UI", 18, "bold")), "met_title").pack(side="left")
+        tr(ctk.CTkButton(top, width=120, command=self.reload), "met_refresh").pack(side="right")
+        tr(ctk.CTkLabel(self, text_color="gray60", font=("Segoe UI", 11), anchor="w", wraplength=720,
+                        justify="left"), "met_hint", path=RESULTS_DIR / METRICS_NAME).pack(anchor="w", pady=(0,8))
+        self.box = ctk.CTkTextbox(self, font=("Consolas", 11))
+        self.box.pack(fill="both", expand=True)
+        self.reload()
+
+    def reload(self):
+        def work():
+            text = format_metrics(metrics_summary(load_metrics(RESULTS_DIR / METRICS_NAME)), self.t)
+            self.after(0, lambda: self._show(text))
+        threading.Thread(target=work, daemon=True).start()
+
+    def _show(self, text):
+        if not self.box.winfo_exists(): return
+        self.box.configure(state="normal")
+        self.box.delete("1.0", "end")
+        self.box.insert("end", text)
+        self.box.configure(state="disabled")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+class AboutTab(TabFrame):
     def __init__(self, parent, t, gpu_info):
-        super().__init__(parent, fg_color="transparent")
-        self.t = t
+        super().__init__(parent, t)
         self.gpu_info = gpu_info
         self._build()
 
-    def refresh(self, t, gpu_info):
-        self.t = t; self.gpu_info = gpu_info
-        for w in self.winfo_children(): w.destroy()
-        self._build()
+    def set_gpu(self, gpu_info):
+        self.gpu_info = gpu_info
+        self.relabel(self.t)
 
-    def _build(self):
-        t = self.t
+    def _about_text(self, t):
         gi = self.gpu_info
         if gi:
             gpu_str  = gi[0]
@@ -637,16 +763,16 @@ class AboutTab(ctk.CTkFrame):
             vram_str = f"{gi[2]} MB ({gi[2]//1024:.1f} GB)"
         else:
             gpu_str = cuda_str = vram_str = "N/A"
+        return t["about_text"].format(gpu=gpu_str, cuda=cuda_str, vram=vram_str)
 
-        ctk.CTkLabel(self, text=t["tab_about"].replace("ℹ️  ",""),
-                     font=("Segoe UI", 18, "bold")).pack(anchor="w", pady=(0,12))
+    def _build(self):
+        self.tr(ctk.CTkLabel(self, font=("Segoe UI", 18, "bold")),
+                lambda t: t["tab_about"].replace("ℹ️  ","")).pack(anchor="w", pady=(0,12))
 
         box = ctk.CTkFrame(self, corner_radius=12)
         box.pack(fill="x")
-        ctk.CTkLabel(box,
-            text=t["about_text"].format(gpu=gpu_str, cuda=cuda_str, vram=vram_str),
-            font=("Segoe UI", 12), justify="left", anchor="w",
-            wraplength=640).pack(padx=20, pady=16, anchor="w")
+        self.tr(ctk.CTkLabel(box, font=("Segoe UI", 12), justify="left", anchor="w", wraplength=640),
+                self._about_text).pack(padx=20, pady=16, anchor="w")
 
         ctk.CTkButton(self, text="🔗  GitHub — OpenTalker/SadTalker", width=260, height=36,
                       fg_color="#2d4a6a", hover_color="#3a6090",
@@ -657,6 +783,8 @@ class AboutTab(ctk.CTkFrame):
 # ══════════════════════════════════════════════════════════════════════════════
 #  MAIN APP
 # ══════════════════════════════════════════════════════════════════════════════
+TABS = ("tab_generate", "tab_settings", "tab_setup", "tab_metrics", "tab_about")    # LANG keys, in order
+
 class App(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -668,8 +796,12 @@ class App(ctk.CTk):
         self.minsize(740, 600)
 
         self.gpu_info = None
+        self.gpu_done = False
+        self.jobq     = JobQueue()
         self._build_header()
         self._build_tabs()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(500, self._offer_resume)
         threading.Thread(target=self._detect_gpu_async, daemon=True).start()
 
     @property
@@ -687,61 +819,99 @@ class App(ctk.CTk):
 
     def _detect_gpu_async(self):
         info = detect_gpu()
-        self.gpu_info = info
+        self.gpu_info, self.gpu_done = info, True
         if info:
             txt = f"{info[0]}  •  CUDA {info[1]}  •  {info[2]} MB VRAM"
         else:
             txt = self.t["gpu_unknown"]
         self.after(0, lambda: self.gpu_lbl.configure(text=txt))
+        self.after(0, self._on_gpu)
+        gpu_telemetry(self.settings["gpu_poll_s"]).subscribe(self._show_gpu_load)
+
+    def _show_gpu_load(self, smp):
+        name, cuda = self.gpu_info[0], self.gpu_info[1]
+        txt = (f"{name}  •  CUDA {cuda}  •  {smp['mem_used']}/{smp['mem_total']} MB  •  "
+               f"{smp['util']}%  •  {smp['temp']}°C")
+        self.after(0, lambda: self.gpu_lbl.configure(text=txt))
 
     def _build_tabs(self):
         t = self.t
-        self.tabview = ctk.CTkTabview(self)
+        self.tabview = ctk.CTkTabview(self, command=self._on_tab)
         self.tabview.pack(fill="both", expand=True, padx=12, pady=10)
-        for name in [t["tab_generate"], t["tab_settings"], t["tab_setup"], t["tab_about"]]:
-            self.tabview.add(name)
-
-        self.gen_tab   = GenerateTab(self.tabview.tab(t["tab_generate"]), self.settings, t, self._statusbar_log)
-        self.gen_tab.pack(fill="both", expand=True)
-
-        self.set_tab   = SettingsTab(self.tabview.tab(t["tab_settings"]), self.settings, t, self._on_settings_save)
-        self.set_tab.pack(fill="both", expand=True)
-
-        self.setup_tab = SetupTab(self.tabview.tab(t["tab_setup"]), t, self._statusbar_log)
-        self.setup_tab.pack(fill="both", expand=True)
-
-        self.about_tab = AboutTab(self.tabview.tab(t["tab_about"]), t, self.gpu_info)
-        self.about_tab.pack(fill="both", expand=True)
+        for key in TABS: self.tabview.add(t[key])
+        # Only the Generate tab is built up front; the rest on first view.
+        self.tabs    = {}
+        self.gen_tab = self._tab("tab_generate")
 
         # Statusbar
         self.status_lbl = ctk.CTkLabel(self, text="", anchor="w",
                                         font=("Segoe UI", 10), text_color="gray55")
         self.status_lbl.pack(fill="x", padx=14, pady=(0,5))
 
+    def _tab(self, key):
+        """The tab for LANG key `key`, built the first time it is needed."""
+        if key not in self.tabs:
+            parent = self.tabview.tab(self.t[key])
+            make = {
+                "tab_generate": lambda: GenerateTab(parent, self.settings, self.t, self._statusbar_log,
+                                                    lambda: self.gpu_info, self.jobq),
+                "tab_settings": lambda: SettingsTab(parent, self.settings, self.t, self._on_settings_save,
+                                                    lambda: self.gpu_info),
+                "tab_setup":    lambda: SetupTab(parent, self.settings, self.t, self._statusbar_log, self.settings["log_lines"],
+                                                 lambda: self.gpu_info),
+                "tab_metrics":  lambda: MetricsTab(parent, self.t),
+                "tab_about":    lambda: AboutTab(parent, self.t, self.gpu_info),
+            }[key]
+            self.tabs[key] = make()
+            self.tabs[key].pack(fill="both", expand=True)
+        return self.tabs[key]
+
+    def _on_tab(self):
+        key = next(k for k in TABS if self.t[k] == self.tabview.get())
+        if key in self.tabs:
+            if key == "tab_metrics": self.tabs[key].reload()
+        else:
+            self._tab(key)
+
+    def _on_gpu(self):
+        if "tab_settings" in self.tabs: self.tabs["tab_settings"].show_profile()
+        if "tab_about"    in self.tabs: self.tabs["tab_about"].set_gpu(self.gpu_info)
+
     def _statusbar_log(self, msg):
         short = msg[-95:] if len(msg) > 95 else msg
         self.after(0, lambda: self.status_lbl.configure(text=short))
 
+    def _offer_resume(self):
+        left = self.jobq.unfinished()
+        if not left: return
+        ids = [bid for bid, _ in left]
+        if messagebox.askyesno("⏯️", self.t["gen_resume_q"].format(n=sum(c for _, c in left))):
+            self.tabview.set(self.t["tab_generate"])
+            self.gen_tab.resume(ids)
+        else:
+            self.jobq.cancel(ids)
+
+    def _on_close(self):
+        if self.gen_tab.control: self.gen_tab.control.shutdown()      # the batch resumes next start
+        shutdown_workers()
+        stop_telemetry()
+        self.destroy()
+
     def _on_settings_save(self):
         t = self.t
+        # Models for the old size/enhancer are no longer needed — free them now
+        # rather than on the next batch.
+        if not self.gen_tab.running and stale_workers(apply_profile(self.settings, self.gpu_info)):
+            threading.Thread(target=shutdown_workers, daemon=True).start()
         # Rename tabs to new language
         old_names = list(self.tabview._tab_dict.keys())
-        new_names = [t["tab_generate"], t["tab_settings"], t["tab_setup"], t["tab_about"]]
+        new_names = [t[key] for key in TABS]
         for old, new in zip(old_names, new_names):
             if old != new:
                 self.tabview.rename(old, new)
-        # Refresh content of each tab in-place
-        self.gen_tab.t = t
-        for w in self.tabview.tab(t["tab_generate"]).winfo_children():
-            w.destroy()
-        self.gen_tab = GenerateTab(self.tabview.tab(t["tab_generate"]), self.settings, t, self._statusbar_log)
-        self.gen_tab.pack(fill="both", expand=True)
-
-        self.set_tab.refresh(t)
-
-        self.setup_tab.refresh(t)
-
-        self.about_tab.refresh(t, self.gpu_info)
+        # Swap texts on the tabs built so far; their state stays
+        for tab in self.tabs.values(): tab.relabel(t)
+        if self.gpu_done and not self.gpu_info: self.gpu_lbl.configure(text=t["gpu_unknown"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,3465 @@
+"""
+SadTalker Desktop — core
+Everything that does not need a display: settings, model downloads, dependency
+checks, the warm inference worker, batch scheduling, the headless runner and
+the local HTTP job server.
+Import it directly, or run: python sadtalker_app.py --headless manifest.json
+                            python sadtalker_app.py --serve [--port 7861]
+"""
+
+import threading, subprocess, sys, os, re, json, urllib.request, urllib.error, time, itertools, hashlib, shutil, tempfile, queue, sqlite3, hmac, uuid
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from pathlib import Path
+
+# ── Paths ─────────────────────────────────────────────────────────────────────
+BASE_DIR        = Path(__file__).parent
+CHECKPOINTS_DIR = BASE_DIR / "checkpoints"
+GFPGAN_DIR      = BASE_DIR / "gfpgan" / "weights"
+RESULTS_DIR     = BASE_DIR / "results"
+SETTINGS_FILE   = BASE_DIR / "app_settings.json"
+CACHE_DIR       = BASE_DIR / "cache"
+JOBS_DB         = BASE_DIR / "jobs.db"
+UPLOADS_DIR     = BASE_DIR / "uploads"
+GPU_CACHE_FILE  = BASE_DIR / "gpu_info.json"
+CPU_SCALING_FILE = BASE_DIR / "cpu_scaling.json"     # written by benchmark.py --cpu-scaling
+MODELS_INDEX    = BASE_DIR / "models_verified.json"
+
+# ── Models ────────────────────────────────────────────────────────────────────
+_SADTALKER = "https://github.com/OpenTalker/SadTalker/releases/download/v0.0.2-rc/"
+_FACEXLIB  = "https://github.com/xinntao/facexlib/releases/download/"
+_GFPGAN    = "https://github.com/TencentARC/GFPGAN/releases/download/v1.3.4/"
+MODEL_DIRS = {"checkpoints": CHECKPOINTS_DIR, "gfpgan": GFPGAN_DIR}
+
+def _model(name, where, base, needs, size=None, sha256=None):
+    return {"name": name, "dir": where, "url": base + name, "needs": needs, "size": size, "sha256": sha256}
+
+# Every weight file the app can load and the settings that load it. A size/sha256
+# of None is not pinned: downloads are then checked against the server's
+# Content-Length and a file is trusted as first verified (see verify_model()).
+MODEL_MANIFEST = [
+    _model("mapping_00109-model.pth.tar",      "checkpoints", _SADTALKER, lambda s: "full" in s["preprocess"]),
+    _model("mapping_00229-model.pth.tar",      "checkpoints", _SADTALKER, lambda s: "full" not in s["preprocess"]),
+    _model("SadTalker_V0.0.2_256.safetensors", "checkpoints", _SADTALKER, lambda s: str(s["size"]) == "256"),
+    _model("SadTalker_V0.0.2_512.safetensors", "checkpoints", _SADTALKER, lambda s: str(s["size"]) == "512"),
+    # facexlib's detector and landmarks crop the face for every render
+    _model("alignment_WFLW_4HG.pth",           "gfpgan", _FACEXLIB + "v0.1.0/", lambda s: True),
+    _model("detection_Resnet50_Final.pth",     "gfpgan", _FACEXLIB + "v0.1.0/", lambda s: True),
+    _model("parsing_parsenet.pth",             "gfpgan", _FACEXLIB + "v0.2.2/", lambda s: s["enhancer"] != "none"),
+    _model("GFPGANv1.4.pth",                   "gfpgan", _GFPGAN, lambda s: s["enhancer"] == "gfpgan"),
+    _model("RestoreFormer.pth",                "gfpgan", _GFPGAN, lambda s: s["enhancer"] == "restoreformer"),
+]
+
+def model_path(m):
+    return MODEL_DIRS[m["dir"]] / m["name"]
+
+def required_models(settings):
+    """Manifest entries that any of `settings` (settings dicts or jobs) loads, in manifest order."""
+    settings = list(settings)
+    return [m for m in MODEL_MANIFEST if any(m["needs"](s) for s in settings)]
+
+DOWNLOAD_WORKERS = 4
+
+# ── Model downloads ───────────────────────────────────────────────────────────
+class DownloadError(Exception):
+    pass
+
+
+class Downloader:
+    """Parallel, resumable downloads. Each file streams into `<dest>.part`, resumed
+    with an HTTP Range request, and is renamed into place only once its size (and
+    sha256, when the item has one) checks out.
+
+    Items are dicts {"url", "dest", "size"?, "sha256"?}. on_event(kind, item, **info)
+    reports "exists", "start", "progress", "done" and "error"."""
+    CHUNK = 1 << 20
+
+    def __init__(self, workers=4, on_event=None, timeout=30, progress_every=2.0):
+        self.workers        = workers
+        self.on_event       = on_event or (lambda kind, item, **info: None)
+        self.timeout        = timeout
+        self.progress_every = progress_every
+
+    def fetch_all(self, items):
+        """Downloads `items` concurrently. Returns {dest: exception or None}."""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.workers) as ex:
+            futs = {str(it["dest"]): ex.submit(self._fetch_safe, it) for it in items}
+        return {d: f.result() for d, f in futs.items()}
+
+    def _fetch_safe(self, item):
+        try:
+            self.fetch(item)
+        except Exception as e:
+            self.on_event("error", item, error=e)
+            return e
+        return None
+
+    def remote_size(self, url):
+        try:
+            req = urllib.request.Request(url, method="HEAD")
+            with urllib.request.urlopen(req, timeout=self.timeout) as r:
+                n = r.headers.get("Content-Length")
+                return int(n) if n is not None else None
+        except Exception:
+            return None             # offline — trust what is on disk
+
+    @staticmethod
+    def _range_total(headers):
+        cr = headers.get("Content-Range") or ""
+        tail = cr.rsplit("/", 1)[-1] if "/" in cr else ""
+        return int(tail) if tail.isdigit() else None
+
+    def fetch(self, item):
+        dest = Path(item["dest"])
+        part = dest.with_name(dest.name + ".part")
+        want = item.get("size")
+        if dest.exists():
+            size = want or self.remote_size(item["url"])
+            have = dest.stat().st_size
+            if size is None or have == size:
+                self.on_event("exists", item)
+                return
+            if have < size: os.replace(dest, part)      # half-finished legacy download — resume it
+            else:           dest.unlink()
+
+        h, have = hashlib.sha256(), 0
+        if part.exists():
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(self.CHUNK), b""):
+                    h.update(chunk); have += len(chunk)
+
+        total = want
+        req = urllib.request.Request(item["url"], headers={"Range": f"bytes={have}-"} if have else {})
+        try:
+            resp = urllib.request.urlopen(req, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code != 416 or not have: raise
+            resp  = None            # the .part already holds every byte
+            total = total or self._range_total(e.headers) or have
+        if resp is not None:
+            with resp:
+                if have and resp.status != 206:         # server ignored Range — start over
+                    h, have = hashlib.sha256(), 0
+                length = resp.headers.get("Content-Length")
+                total  = total or self._range_total(resp.headers) or (have + int(length) if length else None)
+                self.on_event("start", item, done=have, total=total)
+                t0 = last = time.monotonic()
+                got = 0
+                with open(part, "ab" if have else "wb") as f:
+                    while True:
+                        chunk = resp.read(self.CHUNK)
+                        if not chunk: break
+                        f.write(chunk); h.update(chunk); got += len(chunk)
+                        now = time.monotonic()
+                        if now - last >= self.progress_every:
+                            last = now
+                            self.on_event("progress", item, done=have + got, total=total,
+                                          rate=got / max(now - t0, 1e-6))
+                have += got
+                rate = got / max(time.monotonic() - t0, 1e-6)
+        else:
+            rate = 0.0
+
+        if total is not None and have < total:
+            raise DownloadError(f"incomplete: {have} of {total} bytes (will resume)")
+        if total is not None and have > total:
+            part.unlink()
+            raise DownloadError(f"size mismatch: {have} bytes, expected {total}")
+        digest = h.hexdigest()
+        if item.get("sha256") and digest != item["sha256"].lower():
+            part.unlink()
+            raise DownloadError(f"sha256 mismatch: {digest}")
+        os.replace(part, dest)
+        self.on_event("done", item, done=have, total=have, rate=rate, sha256=digest)
+
+
+# ── Dependencies ──────────────────────────────────────────────────────────────
+# (pip requirement, module that must be importable or None)
+PIP_PACKAGES = [
+    ("setuptools<70",  "pkg_resources"),
+    ("cmake",           None),
+    ("dlib",            "dlib"),
+    ("librosa==0.9.2",  "librosa"),
+    ("gfpgan",          "gfpgan"),
+    ("basicsr",         "basicsr"),
+    ("facexlib",        "facexlib"),
+    ("gradio==3.41.2",  "gradio"),
+    ("pillow",          "PIL"),
+]
+
+def pip_name(spec):
+    return re.split(r"[=<>!~]", spec, 1)[0]
+
+def _norm_dist(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def _ver_tuple(v):
+    return tuple(int(x) for x in re.findall(r"\d+", v.split("+")[0])[:4])
+
+def version_ok(have, spec):
+    """Checks an installed version against the single ==/</<=/>= pin pip_name() strips."""
+    m = re.search(r"(==|<=|>=|<|>)\s*([\w.]+)", spec)
+    if not m: return True
+    op, want = m.group(1), _ver_tuple(m.group(2))
+    h = _ver_tuple(have)
+    return {"==": h == want, "<": h < want, "<=": h <= want, ">": h > want, ">=": h >= want}[op]
+
+def probe_packages(pkgs):
+    """[(spec, installed version or None, ok)] from package metadata — nothing is imported,
+    so this takes milliseconds instead of pulling in torch."""
+    import importlib.metadata, importlib.util
+    importlib.invalidate_caches()
+    installed = {}
+    for d in importlib.metadata.distributions():
+        name = d.metadata["Name"]
+        if name: installed.setdefault(_norm_dist(name), d.version)
+    out = []
+    for spec, mod in pkgs:
+        have = installed.get(_norm_dist(pip_name(spec)))
+        ok = have is not None and version_ok(have, spec)
+        if ok and mod:
+            try:
+                ok = importlib.util.find_spec(mod) is not None
+            except (ImportError, ValueError):
+                ok = False
+        out.append((spec, have, ok))
+    return out
+
+def pip_install(specs, on_line):
+    """Installs `specs` in a single pip call, streaming its output. Returns the exit code."""
+    proc = subprocess.Popen([sys.executable, "-m", "pip", "install", *specs],
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    for line in proc.stdout:
+        line = line.rstrip()
+        if line: on_line(line)
+    return proc.wait()
+
+
+# ── i18n ──────────────────────────────────────────────────────────────────────
+LANG = {
+    "en": {
+        "app_title": "SadTalker Desktop",
+        "tab_generate": "🎬  Generate",
+        "tab_settings": "⚙️  Settings",
+        "tab_setup":    "🔧  Setup",
+        "tab_metrics":  "📊  Metrics",
+        "tab_about":    "ℹ️  About",
+        # Generate tab
+        "gen_title":       "🎬  Generate video",
+        "gen_image_lbl":   "📷  Photo / photos:",
+        "gen_image_btn":   "Choose images",
+        "gen_audio_lbl":   "🎵  Audio files:",
+        "gen_audio_btn":   "Choose audio",
+        "gen_none":        "Not selected",
+        "gen_btn":         "▶  Generate video",
+        "gen_open":        "📂  Open results folder",
+        "gen_running":     "⏳  Generating…",
+        "gen_ready":       "Ready.",
+        "gen_done":        "✅  Done! Generated {n} video(s).",
+        "gen_cancel":      "⏹  Cancel batch",
+        "gen_skip":        "⏭  Skip job",
+        "gen_skip_tip":    "Stops the job(s) rendering now and goes on with the next one",
+        "gen_cancelled":   "⏹  Batch cancelled — {n} video(s) finished",
+        "gen_warn_img":    "Select at least one image!",
+        "gen_warn_audio":  "Select at least one audio file!",
+        "gen_log_batch":   "── [{i}/{n}] {name} ──",
+        "gen_log_done":    "✅  All done. Results in: {path}",
+        "gen_err":         "❌  Error (code {code})",
+        "gen_ok":          "✅  Success!",
+        "gen_worker_start":"⚙️  Starting inference worker (size {size})…",
+        "gen_enh_start":   "✨  Starting face-enhancer worker ({enhancer})…",
+        "gen_enh_fail":    "⚠️  Face-enhancer worker unavailable — re-rendering this job with one-shot inference.py",
+        "gen_worker_fail": "⚠️  Inference worker unavailable — falling back to one-shot inference.py",
+        "gen_log_parallel":"⚡  Running {k} jobs in parallel",
+        "gen_log_transcode":"🎵  Converting {name} to 16 kHz WAV once for all its jobs…",
+        "gen_log_preflight":"🔎  Checking {n} image(s) and {m} audio file(s)…",
+        "gen_log_models":  "⬇️  Fetching {n} model file(s) these settings need: {files}",
+        "gen_log_models_bad":"❌  Models unavailable: {files} — check the connection or download them in 🔧 Setup",
+        "gen_log_pre_err": "❌  {name}: {msg} — skipped",
+        "gen_log_pre_warn":"⚠️  {name}: {msg}",
+        "gen_pre_none":    "No input passed the check — nothing to render.",
+        "gen_models_bad":  "Models unavailable — see the log.",
+        "gen_log_error":   "❌  Batch stopped by an error: {e}",
+        "pre_missing":     "file not found",
+        "pre_bad_image":   "not a readable image",
+        "pre_no_face":     "no face found by the quick check — the render may still find one",
+        "pre_tiny_image":  "image is only {w}×{h} px — too small to animate",
+        "pre_small_face":  "face is only {px} px — the video will be blurry",
+        "pre_many_faces":  "{n} faces found — the largest one is animated",
+        "pre_edge":        "face is close to the edge — the crop may be cut off; try preprocess full",
+        "pre_resize_small":"face is small for preprocess resize — crop usually looks better",
+        "pre_bad_audio":   "no readable audio stream (unsupported or corrupt file)",
+        "pre_short_audio": "audio is too short",
+        "gen_log_estimate":"⏱️  Estimated time: about {eta} ({rate:.1f} s per second of audio)",
+        "gen_progress":    "⏳  Generating… {done}/{n}",
+        "gen_eta":         "ETA {eta}",
+        "gen_log_stages":  "⏱️  {stages}  (total {total:.1f}s)",
+        "gen_log_skipped": "⏭️  Skipping {n} job(s) already finished in an earlier run",
+        "gen_log_cached":  "♻️  Identical render found — reusing {name}",
+        "gen_force":       "Force re-render",
+        "gen_log_split":   "✂️  {name}: long audio — rendering {n} segments",
+        "gen_log_nosplit": "⚠️  ffmpeg not found — rendering long audio in one piece",
+        "gen_log_stitched": "🧵 {name}: joined {n} segments → {path}",
+        "gen_log_stitch_fail": "❌ {name}: could not join the segments (they are kept for a retry)",
+        "gen_log_matrix":  "🧮  {n} image(s) × {m} audio file(s) = {jobs} jobs, ordered to reuse cached work",
+        "gen_log_cache":   "♻️  Cache hits — face crops: {src}  •  audio features: {aud}",
+        "gen_log_timeout": "⏱️  Still not finished after {time} — stopping the job",
+        "gen_log_stalled": "⚠️  No output for {sec} s — the job looks stuck, stopping it",
+        "gen_log_cancelled":"⏹  Job cancelled",
+        "gen_log_retry":   "🔁  Retrying in {sec} s (attempt {n} of {m})…",
+        "gen_log_job_error":"❌  Job failed: {e}",
+        "gen_cache_part":  "{hit}/{n} (expected {exp}/{m})",
+        "met_title":       "📊  Render metrics",
+        "met_hint":        "Per-stage times of finished renders from {path}, grouped by settings (k = parallel jobs).",
+        "met_refresh":     "🔄  Refresh",
+        "met_empty":       "No renders recorded yet.",
+        "met_jobs":        "({n} renders)",
+        "met_stage":       "stage",
+        "met_mean":        "mean",
+        "met_total":       "total",
+        "met_ram":         "peak RAM {gb:.1f} GB",
+        "met_vram":        "peak VRAM {gb:.1f} GB",
+        "serve_listening": "🌐 Job server on http://{host}:{port} — {k} parallel job(s). Ctrl+C to stop",
+        "gen_resume_q":    "{n} job(s) from an unfinished batch are still queued.\nResume them now?",
+        # Settings tab
+        "set_title":       "⚙️  Generation settings",
+        "set_save":        "💾  Save settings",
+        "set_saved":       "Settings saved!",
+        "set_size_lbl":    "📐  Output size",
+        "set_size_tip":    "Resolution of the generated face.\n256 = faster, less VRAM (recommended for GTX 1060 6 GB).\n512 = better quality, needs ~4 GB VRAM.\nIf you get CUDA out-of-memory errors, switch to 256.",
+        "set_enh_lbl":     "✨  Face enhancer",
+        "set_enh_tip":     "Post-processing to improve face quality.\ngfpgan – recommended, best results.\nrestoreformer – alternative, slightly different style.\nnone – no enhancer, fastest, lower quality.",
+        "set_pre_lbl":     "🔲  Preprocess mode",
+        "set_pre_tip":     "How the input image is prepared before generation.\ncrop – auto-detects and crops the face region (recommended for portraits).\nresize – scales the whole image to the target size.\nfull – uses the full image without any cropping.",
+        "set_still_lbl":   "🧍  Still mode",
+        "set_still_tip":   "When ON, head movement is minimized — only lip movement is generated.\nIdeal for presentations, explainer videos, or formal content.\nWhen OFF, natural head movement is added.",
+        "set_still_sw":    "Enable still mode",
+        "set_exp_lbl":     "😮  Expression scale",
+        "set_exp_tip":     "Controls the intensity of facial expressions.\n1.0 = natural (default).\n< 1.0 = subtler, more neutral expressions.\n> 1.0 = exaggerated expressions (max 2.0).\nStart with 1.0 and adjust to taste.",
+        "set_pose_lbl":    "🎭  Pose style",
+        "set_pose_tip":    "Selects the head movement animation style (0–45).\n0 = default neutral style.\nHigher values introduce different rhythmic head motions.\nExperiment to find what matches your audio best.",
+        "set_cache_lbl":   "🗄️  Cache size limit",
+        "set_cache_tip":   "Face crops, 3DMM coefficients and audio features are cached on disk,\nso re-rendering the same portrait or audio skips those steps.\nOldest entries are removed once the limit is reached.",
+        "set_cache_clear": "🗑️  Clear cache ({mb} MB)",
+        "set_conc_lbl":    "⚡  Parallel jobs",
+        "set_conc_tip":    "How many images are rendered at the same time.\nauto = as many as fit in your GPU's VRAM for the chosen size and enhancer\n(or by CPU core count without CUDA).\nEach parallel job loads its own copy of the models — lower this if you get out-of-memory errors.",
+        "set_conc_auto":   "auto",
+        "set_seg_lbl":     "✂️  Long audio",
+        "set_seg_tip":     "Audio much longer than this is cut at pauses into segments of about this length.\nSegments render in parallel, a failed render only repeats its own segment,\nand the clips are joined (video not re-encoded) under the original audio.\nHead pose may jump slightly at the joins. off = always render in one piece.",
+        "set_seg_off":     "off",
+        "set_tmo_lbl":     "⏱️  Job time limit",
+        "set_tmo_tip":     "A job running longer than this many times its predicted render time\n(plus 5 minutes for loading models) is stopped and retried.\nThe prediction follows your machine's measured speed. off = no limit.",
+        "set_stall_lbl":   "💤  Hang detection",
+        "set_stall_tip":   "A job that prints nothing for this long is treated as hung, stopped and retried.\noff = never.",
+        "set_retry_lbl":   "🔁  Retries",
+        "set_retry_tip":   "How many times a failed, timed-out or hung job is tried again\n(waiting 5 s, then 10 s, and so on).",
+        "set_prof_lbl":    "🧭  Profile",
+        "set_prof_tip":    "auto = size, enhancer, parallel jobs and CPU threads are picked from your\nGPU's VRAM, CPU cores and free RAM (CPU-only machines get a light 256 px profile).\nmanual = the values below are used as set.\nThe time estimate starts from built-in figures and learns from your own finished renders.",
+        "set_prof_pick":   "auto → {size} · {enhancer} · {k} parallel · {threads} CPU threads per job",
+        "set_prof_rate":   "≈ {rate:.1f} s per second of audio",
+        "set_prof_learned":"learned from {n} render(s)",
+        "set_prof_prior":  "built-in estimate",
+        # Setup tab
+        "setup_title":     "🔧  Auto-installer",
+        "setup_desc":      "Checks and installs all required dependencies, then downloads the AI models your settings use.\nRun once on first use or after any import errors.",
+        "setup_full":      "▶  Run full setup",
+        "setup_pip":       "📦  Packages only",
+        "setup_models":    "⬇️  Models only",
+        "setup_status":    "Installation log:",
+        "setup_checking":  "Checking pip dependencies…",
+        "setup_installed": "✓ {pkg} already installed",
+        "setup_installing":"⬇️  Installing {pkg}…",
+        "setup_ok":        "✅  {pkg} installed",
+        "setup_wrong_ver": "⚠️  {pkg} {have} does not match {spec}",
+        "setup_err":       "❌  Error with {pkg}: {err}",
+        "setup_pkgs_done": "📦  Dependencies ready.",
+        "setup_models_chk":"⬇️  Checking models…",
+        "setup_mdl_exists":"✓ {f} already exists",
+        "setup_mdl_dl":    "⬇️  Downloading {f}…",
+        "setup_mdl_resume":"⏯️  Resuming {f} from {mb:.0f} MB…",
+        "setup_mdl_prog":  "   {f}: {pct:3d}%| {mb:.0f}/{total:.0f} MB, {rate:.1f} MB/s",
+        "setup_mdl_ok":    "✅  {f} downloaded ({rate:.1f} MB/s)",
+        "setup_mdl_err":   "❌  Download error {f}: {e}",
+        "setup_mdl_link":  "   Manual link: {url}",
+        "setup_mdl_done":  "⬇️  Models ready.",
+        "setup_all_done":  "\n✅  Full setup complete!",
+        # About
+        "about_text": (
+            "SadTalker Desktop  v2.0\n\n"
+            "A desktop GUI for the SadTalker talking-head synthesis model.\n\n"
+            "Original SadTalker paper:\nZhang et al., 2023 — OpenTalker/SadTalker on GitHub\n\n"
+            "GPU detected: {gpu}\nCUDA version: {cuda}\nVRAM: {vram}"
+        ),
+        # Header GPU info
+        "gpu_detecting":   "Detecting GPU…",
+        "gpu_unknown":     "GPU: unknown",
+    },
+    "pl": {
+        "app_title": "SadTalker Desktop",
+        "tab_generate": "🎬  Generuj",
+        "tab_settings": "⚙️  Ustawienia",
+        "tab_setup":    "🔧  Setup",
+        "tab_metrics":  "📊  Metryki",
+        "tab_about":    "ℹ️  O aplikacji",
+        # Generate tab
+        "gen_title":       "🎬  Generowanie wideo",
+        "gen_image_lbl":   "📷  Zdjęcie / zdjęcia:",
+        "gen_image_btn":   "Wybierz zdjęcia",
+        "gen_audio_lbl":   "🎵  Pliki audio:",
+        "gen_audio_btn":   "Wybierz audio",
+        "gen_none":        "Nie wybrano",
+        "gen_btn":         "▶  Generuj wideo",
+        "gen_open":        "📂  Otwórz folder results",
+        "gen_running":     "⏳  Generuję…",
+        "gen_ready":       "Gotowy.",
+        "gen_done":        "✅  Gotowe! Wygenerowano {n} wideo.",
+        "gen_cancel":      "⏹  Anuluj partię",
+        "gen_skip":        "⏭  Pomiń zadanie",
+        "gen_skip_tip":    "Zatrzymuje renderowane teraz zadanie(a) i przechodzi do następnego",
+        "gen_cancelled":   "⏹  Partia anulowana — gotowe wideo: {n}",
+        "gen_warn_img":    "Wybierz co najmniej jedno zdjęcie!",
+        "gen_warn_audio":  "Wybierz co najmniej jeden plik audio!",
+        "gen_log_batch":   "── [{i}/{n}] {name} ──",
+        "gen_log_done":    "✅  Wszystko gotowe. Wyniki w: {path}",
+        "gen_err":         "❌  Błąd (kod {code})",
+        "gen_ok":          "✅  Sukces!",
+        "gen_worker_start":"⚙️  Uruchamiam worker inferencji (rozmiar {size})…",
+        "gen_enh_start":   "✨  Uruchamiam worker poprawy twarzy ({enhancer})…",
+        "gen_enh_fail":    "⚠️  Worker poprawy twarzy niedostępny — generuję to zadanie ponownie przez jednorazowe inference.py",
+        "gen_worker_fail": "⚠️  Worker inferencji niedostępny — przełączam na jednorazowe inference.py",
+        "gen_log_parallel":"⚡  Uruchamiam {k} zadań równolegle",
+        "gen_log_transcode":"🎵  Konwertuję {name} do WAV 16 kHz — raz dla wszystkich zadań…",
+        "gen_log_preflight":"🔎  Sprawdzam zdjęcia ({n}) i pliki audio ({m})…",
+        "gen_log_models":  "⬇️  Pobieram pliki modeli potrzebne dla tych ustawień ({n}): {files}",
+        "gen_log_models_bad":"❌  Brak modeli: {files} — sprawdź połączenie lub pobierz je w zakładce 🔧 Setup",
+        "gen_log_pre_err": "❌  {name}: {msg} — pomijam",
+        "gen_log_pre_warn":"⚠️  {name}: {msg}",
+        "gen_pre_none":    "Żadne wejście nie przeszło sprawdzenia — nie ma czego generować.",
+        "gen_models_bad":  "Brak modeli — szczegóły w logu.",
+        "gen_log_error":   "❌  Partia przerwana przez błąd: {e}",
+        "pre_missing":     "nie znaleziono pliku",
+        "pre_bad_image":   "nie można odczytać obrazu",
+        "pre_no_face":     "szybkie sprawdzenie nie znalazło twarzy — render może ją jeszcze wykryć",
+        "pre_tiny_image":  "obraz ma tylko {w}×{h} px — za mały do animacji",
+        "pre_small_face":  "twarz ma tylko {px} px — wideo będzie rozmyte",
+        "pre_many_faces":  "znaleziono {n} twarzy — animowana będzie największa",
+        "pre_edge":        "twarz jest blisko krawędzi — kadr może zostać ucięty; spróbuj preprocess full",
+        "pre_resize_small":"twarz jest mała dla preprocess resize — crop zwykle wygląda lepiej",
+        "pre_bad_audio":   "brak czytelnej ścieżki audio (nieobsługiwany lub uszkodzony plik)",
+        "pre_short_audio": "audio jest za krótkie",
+        "gen_log_estimate":"⏱️  Szacowany czas: około {eta} ({rate:.1f} s na sekundę audio)",
+        "gen_progress":    "⏳  Generuję… {done}/{n}",
+        "gen_eta":         "pozostało {eta}",
+        "gen_log_stages":  "⏱️  {stages}  (razem {total:.1f}s)",
+        "gen_log_skipped": "⏭️  Pomijam {n} zadań ukończonych we wcześniejszym uruchomieniu",
+        "gen_log_cached":  "♻️  Znaleziono identyczny render — używam {name}",
+        "gen_force":       "Wymuś ponowne generowanie",
+        "gen_log_split":   "✂️  {name}: długie audio — generuję {n} segmentów",
+        "gen_log_nosplit": "⚠️  Nie znaleziono ffmpeg — długie audio generuję w całości",
+        "gen_log_stitched": "🧵 {name}: połączono {n} segmentów → {path}",
+        "gen_log_stitch_fail": "❌ {name}: nie udało się połączyć segmentów (zostają do ponowienia)",
+        "gen_log_matrix":  "🧮  {n} zdjęć × {m} plików audio = {jobs} zadań, ułożonych pod ponowne użycie cache",
+        "gen_log_cache":   "♻️  Trafienia w cache — wycięte twarze: {src}  •  cechy audio: {aud}",
+        "gen_log_timeout": "⏱️  Wciąż nieukończone po {time} — zatrzymuję zadanie",
+        "gen_log_stalled": "⚠️  Brak wyjścia od {sec} s — zadanie chyba utknęło, zatrzymuję je",
+        "gen_log_cancelled":"⏹  Zadanie anulowane",
+        "gen_log_retry":   "🔁  Ponawiam za {sec} s (próba {n} z {m})…",
+        "gen_log_job_error":"❌  Zadanie nieudane: {e}",
+        "gen_cache_part":  "{hit}/{n} (oczekiwano {exp}/{m})",
+        "met_title":       "📊  Metryki generowania",
+        "met_hint":        "Czasy etapów ukończonych renderów z {path}, pogrupowane według ustawień (k = zadania równoległe).",
+        "met_refresh":     "🔄  Odśwież",
+        "met_empty":       "Brak zapisanych renderów.",
+        "met_jobs":        "({n} renderów)",
+        "met_stage":       "etap",
+        "met_mean":        "średnio",
+        "met_total":       "razem",
+        "met_ram":         "szczyt RAM {gb:.1f} GB",
+        "met_vram":        "szczyt VRAM {gb:.1f} GB",
+        "serve_listening": "🌐 Serwer zadań na http://{host}:{port} — {k} równoległych zadań. Ctrl+C, aby zatrzymać",
+        "gen_resume_q":    "W kolejce pozostało {n} zadań z niedokończonej partii.\nWznowić je teraz?",
+        # Settings tab
+        "set_title":       "⚙️  Ustawienia generowania",
+        "set_save":        "💾  Zapisz ustawienia",
+        "set_saved":       "Ustawienia zapisane!",
+        "set_size_lbl":    "📐  Rozmiar wyjściowy",
+        "set_size_tip":    "Rozdzielczość generowanej twarzy.\n256 = szybciej, mniej VRAM (zalecane dla GTX 1060 6 GB).\n512 = lepsza jakość, wymaga ~4 GB VRAM.\nJeśli pojawia się błąd CUDA out-of-memory, przełącz na 256.",
+        "set_enh_lbl":     "✨  Enhancer twarzy",
+        "set_enh_tip":     "Post-processing poprawiający jakość twarzy.\ngfpgan – zalecany, najlepsze wyniki.\nrestoreformer – alternatywa, nieco inny styl.\nnone – bez enhancera, najszybciej, niższa jakość.",
+        "set_pre_lbl":     "🔲  Tryb preprocessingu",
+        "set_pre_tip":     "Sposób przygotowania obrazu przed generowaniem.\ncrop – automatycznie wykrywa i wycina twarz (zalecane dla portretów).\nresize – skaluje cały obraz do docelowego rozmiaru.\nfull – używa pełnego obrazu bez kadrowania.",
+        "set_still_lbl":   "🧍  Still mode",
+        "set_still_tip":   "Gdy WŁĄCZONY, ruch głowy jest zminimalizowany — animowane są tylko usta.\nIdealny do prezentacji, filmów instruktażowych lub formalnych treści.\nGdy WYŁĄCZONY, dodawany jest naturalny ruch głowy.",
+        "set_still_sw":    "Włącz still mode",
+        "set_exp_lbl":     "😮  Expression scale",
+        "set_exp_tip":     "Kontroluje intensywność mimiki twarzy.\n1.0 = naturalna (domyślna).\n< 1.0 = subtelniejsza, bardziej neutralna mimika.\n> 1.0 = wyolbrzymiona mimika (maks. 2.0).\nZacznij od 1.0 i dostosuj do potrzeb.",
+        "set_pose_lbl":    "🎭  Pose style",
+        "set_pose_tip":    "Wybiera styl animacji ruchu głowy (0–45).\n0 = domyślny neutralny styl.\nWyższe wartości wprowadzają różne rytmiczne ruchy głowy.\nEksperymentuj, aby dobrać styl do audio.",
+        "set_cache_lbl":   "🗄️  Limit rozmiaru cache",
+        "set_cache_tip":   "Wykadrowane twarze, współczynniki 3DMM i cechy audio są zapisywane na dysku,\nwięc ponowne generowanie z tym samym portretem lub audio pomija te kroki.\nNajstarsze wpisy są usuwane po osiągnięciu limitu.",
+        "set_cache_clear": "🗑️  Wyczyść cache ({mb} MB)",
+        "set_conc_lbl":    "⚡  Zadania równoległe",
+        "set_conc_tip":    "Ile zdjęć jest generowanych jednocześnie.\nauto = tyle, ile zmieści się w VRAM karty dla wybranego rozmiaru i enhancera\n(lub według liczby rdzeni CPU bez CUDA).\nKażde równoległe zadanie ładuje własną kopię modeli — zmniejsz, jeśli brakuje pamięci.",
+        "set_conc_auto":   "auto",
+        "set_seg_lbl":     "✂️  Długie audio",
+        "set_seg_tip":     "Audio znacznie dłuższe niż ta wartość jest cięte na pauzach na segmenty o mniej więcej tej długości.\nSegmenty generują się równolegle, nieudany render powtarza tylko swój segment,\na klipy są łączone (bez ponownego kodowania wideo) pod oryginalnym audio.\nNa łączeniach głowa może lekko przeskoczyć. wył. = zawsze w całości.",
+        "set_seg_off":     "wył.",
+        "set_tmo_lbl":     "⏱️  Limit czasu zadania",
+        "set_tmo_tip":     "Zadanie trwające dłużej niż tyle razy przewidywany czas generowania\n(plus 5 minut na ładowanie modeli) jest przerywane i ponawiane.\nPrzewidywanie uczy się zmierzonej szybkości komputera. wył. = bez limitu.",
+        "set_stall_lbl":   "💤  Wykrywanie zawieszenia",
+        "set_stall_tip":   "Zadanie, które przez tyle czasu nic nie wypisze, uznaje się za zawieszone — jest przerywane i ponawiane.\nwył. = nigdy.",
+        "set_retry_lbl":   "🔁  Ponowienia",
+        "set_retry_tip":   "Ile razy ponowić zadanie nieudane, przekroczone czasowo lub zawieszone\n(po 5 s, potem 10 s itd.).",
+        "set_prof_lbl":    "🧭  Profil",
+        "set_prof_tip":    "auto = rozmiar, enhancer, zadania równoległe i wątki CPU dobierane są według\nVRAM karty, liczby rdzeni CPU i wolnej pamięci RAM (bez CUDA: lekki profil 256 px).\nmanual = używane są wartości ustawione poniżej.\nSzacowany czas startuje od wbudowanych wartości i uczy się z Twoich ukończonych renderów.",
+        "set_prof_pick":   "auto → {size} · {enhancer} · {k} równolegle · {threads} wątków CPU na zadanie",
+        "set_prof_rate":   "≈ {rate:.1f} s na sekundę audio",
+        "set_prof_learned":"na podstawie {n} renderów",
+        "set_prof_prior":  "wartość wbudowana",
+        # Setup tab
+        "setup_title":     "🔧  Auto-installer",
+        "setup_desc":      "Sprawdza i instaluje wszystkie wymagane zależności oraz pobiera modele AI dla bieżących ustawień.\nUruchom raz przy pierwszej konfiguracji lub po błędach importu.",
+        "setup_full":      "▶  Uruchom pełny setup",
+        "setup_pip":       "📦  Tylko paczki pip",
+        "setup_models":    "⬇️  Tylko modele",
+        "setup_status":    "Log instalacji:",
+        "setup_checking":  "Sprawdzam zależności pip…",
+        "setup_installed": "✓ {pkg} już zainstalowany",
+        "setup_installing":"⬇️  Instaluję {pkg}…",
+        "setup_ok":        "✅  {pkg} zainstalowany",
+        "setup_wrong_ver": "⚠️  {pkg} {have} nie spełnia {spec}",
+        "setup_err":       "❌  Błąd przy {pkg}: {err}",
+        "setup_pkgs_done": "📦  Zależności gotowe.",
+        "setup_models_chk":"⬇️  Sprawdzam modele…",
+        "setup_mdl_exists":"✓ {f} już istnieje",
+        "setup_mdl_dl":    "⬇️  Pobieranie {f}…",
+        "setup_mdl_resume":"⏯️  Wznawiam {f} od {mb:.0f} MB…",
+        "setup_mdl_prog":  "   {f}: {pct:3d}%| {mb:.0f}/{total:.0f} MB, {rate:.1f} MB/s",
+        "setup_mdl_ok":    "✅  {f} pobrano ({rate:.1f} MB/s)",
+        "setup_mdl_err":   "❌  Błąd pobierania {f}: {e}",
+        "setup_mdl_link":  "   Ręczny link: {url}",
+        "setup_mdl_done":  "⬇️  Modele gotowe.",
+        "setup_all_done":  "\n✅  Pełny setup zakończony!",
+        # About
+        "about_text": (
+            "SadTalker Desktop  v2.0\n\n"
+            "Desktopowy interfejs dla modelu syntezy mowy SadTalker.\n\n"
+            "Oryginalny artykuł SadTalker:\nZhang et al., 2023 — OpenTalker/SadTalker na GitHub\n\n"
+            "Wykryta karta GPU: {gpu}\nWersja CUDA: {cuda}\nVRAM: {vram}"
+        ),
+        "gpu_detecting":   "Wykrywanie GPU…",
+        "gpu_unknown":     "GPU: nieznany",
+    }
+}
+
+DEFAULT_SETTINGS = {
+    "size": "256", "enhancer": "gfpgan", "preprocess": "crop",
+    "still": False, "expression_scale": 1.0, "pose_style": 0,
+    "theme": "dark", "lang": "en",
+    "cache_mb": 4096, "concurrency": 0, "segment_s": 0,
+    "log_lines": 2000, "profile": "manual", "threads": 0, "gpu_poll_s": 2.0,
+    "timeout_x": 4, "stall_s": 300, "retries": 1, "cpu_split": 0,
+}
+
+# What the Settings tab offers for the settings that shape a render; HTTP jobs are held to the same.
+SETTING_CHOICES = {"size": ("256", "512"), "enhancer": ("gfpgan", "restoreformer", "none"),
+                   "preprocess": ("crop", "resize", "full")}
+SETTING_RANGES  = {"expression_scale": (0.5, 2.0), "pose_style": (0, 45)}
+
+def check_settings(opts):
+    """The render settings (RESULT_SETTINGS) in `opts`, checked against SETTING_CHOICES
+    and SETTING_RANGES; other keys are dropped. Raises ValueError naming the first bad one."""
+    out = {}
+    for k, v in opts.items():
+        if k not in RESULT_SETTINGS: continue
+        if k in SETTING_CHOICES:
+            v = str(v)
+            if v not in SETTING_CHOICES[k]: raise ValueError(f"{k} must be one of: {', '.join(SETTING_CHOICES[k])}")
+        elif k == "still":
+            if not isinstance(v, bool): raise ValueError("still must be true or false")
+        else:
+            lo, hi = SETTING_RANGES[k]
+            if isinstance(v, bool) or not isinstance(v, (int, float)) or not lo <= v <= hi or \
+                    (k == "pose_style" and v != int(v)):
+                raise ValueError(f"{k} must be a number from {lo} to {hi}")
+        out[k] = v
+    return out
+
+def load_settings():
+    if SETTINGS_FILE.exists():
+        with open(SETTINGS_FILE) as f:
+            return {**DEFAULT_SETTINGS, **json.load(f)}
+    return DEFAULT_SETTINGS.copy()
+
+def save_settings(s):
+    with open(SETTINGS_FILE, "w") as f:
+        json.dump(s, f, indent=2)
+
+# ── GPU ───────────────────────────────────────────────────────────────────────
+# The card's identity is cached in gpu_info.json and only queried again when the
+# driver changes; live load comes from one long-running sampler per process.
+_gpu_info = {}
+
+def _driver_stamp():
+    """Changes whenever the NVIDIA driver does, without spawning anything:
+    /proc/driver/nvidia/version on Linux, else the size and mtime of nvidia-smi.
+    None when there is no driver."""
+    try:
+        with open("/proc/driver/nvidia/version") as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    exe = shutil.which("nvidia-smi")
+    if exe is None: return None
+    st = os.stat(exe)
+    return f"{exe}:{st.st_size}:{st.st_mtime_ns}"
+
+def _query_gpu():
+    """(name, cuda_ver, vram_mb) of GPU 0 from a single `nvidia-smi -q`, or None."""
+    try:
+        q = subprocess.check_output(["nvidia-smi", "-q"], text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    name   = re.search(r"Product Name\s*:\s*(.+)", q)
+    driver = re.search(r"Driver Version\s*:\s*(\S+)", q)
+    cuda   = re.search(r"CUDA Version\s*:\s*(\S+)", q)
+    vram   = re.search(r"FB Memory Usage\s*\n\s*Total\s*:\s*(\d+)", q)
+    if not (name and vram): return None
+    ver = cuda or driver
+    return name.group(1).strip(), ver.group(1) if ver else "?", int(vram.group(1))
+
+def detect_gpu(refresh=False):
+    """Returns (name, cuda_ver, vram_mb) or None. Cached on disk until the driver changes."""
+    stamp = _driver_stamp()
+    if stamp is None: return None
+    if not refresh and _gpu_info.get("stamp") == stamp: return _gpu_info["info"]
+    try:
+        with open(GPU_CACHE_FILE) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    if refresh or cached.get("stamp") != stamp:
+        info   = _query_gpu()
+        cached = {"stamp": stamp, "info": info}
+        try:
+            with open(GPU_CACHE_FILE, "w") as f:
+                json.dump(cached, f)
+        except OSError:
+            pass
+    info = tuple(cached["info"]) if cached["info"] else None
+    _gpu_info.update(stamp=stamp, info=info)
+    return info
+
+
+class NullTelemetry:
+    """Stand-in sampler for machines without an NVIDIA GPU: never has a sample."""
+    available = False
+    interval  = 0
+
+    def start(self): return self
+    def stop(self): pass
+    def latest(self): return None
+    def subscribe(self, fn): return lambda: None
+
+
+class GpuTelemetry(NullTelemetry):
+    """Samples GPU 0 every `interval` seconds on a background thread, through NVML
+    when pynvml is installed, else one `nvidia-smi --loop-ms` process that keeps
+    printing instead of a spawn per sample. latest() is the newest
+    {"util": %, "mem_used": MB, "mem_total": MB, "temp": °C, "time": monotonic}
+    or None; subscribe(fn) calls fn(sample) on the sampler thread and returns an
+    unsubscribe function. processes() is the GPU memory of each compute process."""
+    available = True
+    APPS_POLL_S = 15.0          # nvidia-smi --query-compute-apps spawns, when NVML is missing
+
+    def __init__(self, interval=2.0):
+        self.interval = max(0.1, float(interval))
+        self._latest  = None
+        self._nvml    = False
+        self._procs   = {}      # pid -> MB, from NVML on every sample
+        self._apps    = None    # (monotonic, {pid: MB}) of the last nvidia-smi query
+        self._smi_ok  = True
+        self._subs    = []
+        self._lock    = threading.Lock()
+        self._stop    = threading.Event()
+        self._proc    = None
+        self._thread  = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        proc = self._proc
+        if proc is not None and proc.poll() is None: proc.kill()
+
+    def latest(self):
+        return self._latest
+
+    def processes(self):
+        """{pid: MB} of GPU 0's compute processes: from the NVML sampler's latest
+        sample, else one nvidia-smi query per APPS_POLL_S. {} when unknown."""
+        if self._nvml or self._latest is None: return self._procs     # None: not sampling yet
+        now = time.monotonic()
+        if self._smi_ok and (self._apps is None or now - self._apps[0] >= self.APPS_POLL_S):
+            try:
+                out = subprocess.check_output(["nvidia-smi", "--query-compute-apps=pid,used_memory",
+                                               "--format=csv,noheader,nounits"], text=True, timeout=5)
+            except (OSError, subprocess.SubprocessError):
+                out, self._smi_ok = "", False
+            apps = {}
+            for line in out.splitlines():
+                pid, _, mb = line.partition(",")
+                if pid.strip().isdigit() and mb.strip().isdigit(): apps[int(pid)] = float(mb)
+            self._apps = (now, apps)
+        return self._apps[1] if self._apps else {}
+
+    def subscribe(self, fn):
+        with self._lock: self._subs.append(fn)
+        def unsubscribe():
+            with self._lock:
+                if fn in self._subs: self._subs.remove(fn)
+        return unsubscribe
+
+    def _publish(self, util, used, total, temp):
+        sample = {"util": util, "mem_used": used, "mem_total": total, "temp": temp, "time": time.monotonic()}
+        self._latest = sample
+        with self._lock: subs = list(self._subs)
+        for fn in subs:
+            try:
+                fn(sample)
+            except Exception:
+                pass
+
+    def _run(self):
+        try:
+            import pynvml
+        except ImportError:
+            pynvml = None
+        if pynvml is not None and self._run_nvml(pynvml): return
+        self._run_smi()
+
+    def _run_nvml(self, nv):
+        try:
+            nv.nvmlInit()
+            h = nv.nvmlDeviceGetHandleByIndex(0)
+        except Exception:
+            return False
+        self._nvml = True
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._procs = {p.pid: p.usedGpuMemory / 2**20 for p in nv.nvmlDeviceGetComputeRunningProcesses(h)
+                                   if p.usedGpuMemory}
+                except nv.NVMLError:
+                    self._procs = {}        # not reported under WDDM
+                mem = nv.nvmlDeviceGetMemoryInfo(h)
+                self._publish(nv.nvmlDeviceGetUtilizationRates(h).gpu, mem.used // 2**20, mem.total // 2**20,
+                              nv.nvmlDeviceGetTemperature(h, nv.NVML_TEMPERATURE_GPU))
+                self._stop.wait(self.interval)
+        except Exception:
+            pass
+        finally:
+            nv.nvmlShutdown()
+        return True
+
+    def _run_smi(self):
+        try:
+            self._proc = subprocess.Popen(
+                ["nvidia-smi", "--query-gpu=index,utilization.gpu,memory.used,memory.total,temperature.gpu",
+                 "--format=csv,noheader,nounits", f"--loop-ms={int(self.interval * 1000)}"],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        except OSError:
+            return
+        for line in self._proc.stdout:
+            if self._stop.is_set(): break
+            parts = [p.strip() for p in line.split(",")]
+            if len(parts) != 5 or parts[0] != "0": continue
+            try:
+                self._publish(*(int(float(p)) for p in parts[1:]))
+            except ValueError:
+                pass            # "[N/A]" on cards that hide a field
+        self.stop()
+
+
+class FakeTelemetry(GpuTelemetry):
+    """Replays `samples` ((util, mem_used, mem_total, temp) tuples) in a loop, for
+    tests and stub servers — no GPU or nvidia-smi needed."""
+    def __init__(self, samples=((35, 2300, 6144, 55), (90, 4100, 6144, 71)), interval=0.5):
+        super().__init__(interval)
+        self.samples = list(samples)
+
+    def processes(self):
+        return {}
+
+    def _run(self):
+        for sample in itertools.cycle(self.samples):
+            if self._stop.is_set(): return
+            self._publish(*sample)
+            self._stop.wait(self.interval)
+
+
+_telemetry      = None
+_telemetry_lock = threading.Lock()
+
+def gpu_telemetry(interval=None):
+    """The process-wide sampler, started on first use: GpuTelemetry when detect_gpu()
+    finds a card, NullTelemetry otherwise. `interval` defaults to settings' gpu_poll_s."""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            if detect_gpu() is None:
+                _telemetry = NullTelemetry()
+            else:
+                _telemetry = GpuTelemetry(interval or load_settings()["gpu_poll_s"]).start()
+        return _telemetry
+
+def use_telemetry(sampler):
+    """Replaces the process-wide sampler (e.g. with FakeTelemetry) and starts it."""
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is not None: _telemetry.stop()
+        _telemetry = sampler.start()
+    return _telemetry
+
+def stop_telemetry():
+    """Stops the process-wide sampler (and its nvidia-smi) if one was started."""
+    with _telemetry_lock:
+        if _telemetry is not None: _telemetry.stop()
+
+
+# ── Disk cache ────────────────────────────────────────────────────────────────
+_digests = {}
+
+def file_digest(path):
+    """sha256 of a file's bytes, memoised on (path, size, mtime)."""
+    st = os.stat(path)
+    k  = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if k not in _digests:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _digests[k] = h.hexdigest()
+    return _digests[k]
+
+
+class DiskCache:
+    """Directory-per-entry cache under `root`, evicted least-recently-used first
+    once the total size passes `limit_mb`. Entries are built in a temp dir and
+    renamed into place, so concurrent processes never see half-written ones."""
+    def __init__(self, root, limit_mb):
+        self.root  = Path(root)
+        self.limit = int(limit_mb) * 1024 * 1024
+
+    @staticmethod
+    def key(kind, *parts):
+        return kind + "-" + hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+    def get(self, key):
+        p = self.root / key
+        try:
+            os.utime(p)             # mtime doubles as the LRU clock
+        except OSError:
+            return None
+        return p
+
+    def put(self, key, fill):
+        """Creates entry `key` by calling fill(tmp_dir) and returns its final path."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+        try:
+            fill(tmp)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        try:
+            os.rename(tmp, self.root / key)
+        except OSError:             # someone else stored it first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+        return self.root / key
+
+    def entries(self):
+        """[(mtime, bytes, path)] of complete entries, oldest first."""
+        out = []
+        if self.root.is_dir():
+            for p in self.root.iterdir():
+                if p.name.startswith("."): continue
+                try:
+                    size = sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
+                    out.append((p.stat().st_mtime, size, p))
+                except OSError:
+                    pass
+        return sorted(out)
+
+    def usage(self):
+        return sum(e[1] for e in self.entries())
+
+    def evict(self):
+        ents  = self.entries()
+        total = sum(e[1] for e in ents)
+        for _, size, p in ents:
+            if total <= self.limit: break
+            shutil.rmtree(p, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# ── Inference jobs ────────────────────────────────────────────────────────────
+def build_job(img, audio, s):
+    """Collects everything one render needs into a plain, JSON-serialisable dict."""
+    return {
+        "source_image": img, "driven_audio": audio, "result_dir": str(RESULTS_DIR),
+        "size": str(s["size"]), "enhancer": s["enhancer"], "preprocess": s["preprocess"],
+        "still": bool(s["still"]), "expression_scale": float(s["expression_scale"]),
+        "pose_style": int(s["pose_style"]), "threads": int(s.get("threads", 0)),
+        "cpu_split": int(s.get("cpu_split", 0)),
+    }
+
+def inference_cmd(job, script=None):
+    """Command line for a one-shot `inference.py` (or stand-in `script`) run of `job`."""
+    cmd = [
+        sys.executable, str(script or BASE_DIR / "inference.py"),
+        "--driven_audio", job["driven_audio"],
+        "--source_image", job["source_image"],
+        "--result_dir",   job["result_dir"],
+        "--size",         job["size"],
+        "--expression_scale", str(job["expression_scale"]),
+        "--pose_style",   str(job["pose_style"]),
+        "--preprocess",   job["preprocess"],
+    ]
+    if job["enhancer"] != "none": cmd += ["--enhancer", job["enhancer"]]
+    if job["still"]:              cmd += ["--still"]
+    return cmd
+
+def worker_key(s):
+    """Settings (or job fields) that decide which weights a render worker loads, its
+    CPU thread count and core partitioning; a change means a restart. The face
+    enhancer runs on its own worker (see EnhanceStage)."""
+    return (str(s["size"]), "full" in s["preprocess"], int(s.get("threads", 0)), int(s.get("cpu_split", 0)))
+
+def thread_env(n):
+    """Environment that caps a render process at `n` CPU threads (0 = library defaults)."""
+    if not n: return {}
+    return {v: str(n) for v in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")}
+
+
+# ── CPU partitioning ──────────────────────────────────────────────────────────
+# On CPU-only machines several render processes run side by side. With cpu_split
+# = k the usable CPUs are cut into k disjoint blocks and the process on scheduler
+# slot n is pinned to block n % k, with as many torch / OpenMP threads as the block
+# has CPUs, so workers neither share cores nor oversubscribe them.
+def usable_cpus():
+    """Logical CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"): return sorted(os.sched_getaffinity(0))
+    try:
+        import psutil
+        return sorted(psutil.Process().cpu_affinity())
+    except Exception:
+        return list(range(os.cpu_count() or 1))
+
+def cpu_sets(k):
+    """usable_cpus() cut into `k` disjoint blocks of equal size (leftover CPUs stay idle)."""
+    cpus = usable_cpus()
+    k    = max(1, min(int(k), len(cpus)))
+    per  = len(cpus) // k
+    return [cpus[n * per:(n + 1) * per] for n in range(k)]
+
+def slot_cpus(split, slot):
+    """The CPUs of scheduler `slot` under cpu_split `split`, or None when not pinned."""
+    if int(split) < 2 or not isinstance(slot, int): return None
+    sets = cpu_sets(split)
+    return sets[slot % len(sets)]
+
+def set_affinity(pid, cpus):
+    """Pins process `pid` (0 = this one) to `cpus`. Returns False where that is not possible."""
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(pid, cpus)
+            return True
+        if sys.platform == "win32":
+            import ctypes
+            k32 = ctypes.windll.kernel32
+            h   = k32.OpenProcess(0x0600, False, pid) if pid else k32.GetCurrentProcess()  # SET | QUERY_INFORMATION
+            if not h: return False
+            try:
+                return bool(k32.SetProcessAffinityMask(h, ctypes.c_size_t(sum(1 << c for c in cpus))))
+            finally:
+                if pid: k32.CloseHandle(h)
+    except OSError:
+        pass
+    return False
+
+
+# ── Warm inference worker ─────────────────────────────────────────────────────
+# The GUI talks to `sadtalker_app.py --worker` over JSON lines: one job per line
+# on stdin, free-form log output on stdout, and protocol messages on stdout
+# prefixed with WORKER_TAG ({"event": "ready" | "done" | "fatal", ...}).
+WORKER_TAG = "@@sadtalker-worker "
+
+def _emit(event, **kw):
+    sys.stdout.write("\n" + WORKER_TAG + json.dumps({"event": event, **kw}) + "\n")
+    sys.stdout.flush()
+
+def _load_models(size, preprocess):
+    """Builds the same models inference.py does, once."""
+    import torch
+    from src.utils.preprocess import CropAndExtract
+    from src.test_audio2coeff import Audio2Coeff
+    from src.facerender.animate import AnimateFromCoeff
+    from src.utils.init_path import init_path
+
+    _warm_enhancer()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    paths = init_path(str(CHECKPOINTS_DIR), str(BASE_DIR / "src" / "config"), size, False, preprocess)
+    return {
+        "device":     device,
+        "preprocess": CropAndExtract(paths, device),
+        "audio2coeff": Audio2Coeff(paths, device),
+        "animate":    AnimateFromCoeff(paths, device),
+        "cache":      DiskCache(CACHE_DIR, load_settings()["cache_mb"]),
+    }
+
+def _warm_enhancer():
+    """face_enhancer builds a fresh GFPGANer (and reloads its weights) on every
+    call — memoise it so the enhancer stays warm between jobs."""
+    import src.utils.face_enhancer as face_enhancer
+    restorers, make = {}, face_enhancer.GFPGANer
+    def warm_restorer(**kw):
+        k = tuple(sorted((a, repr(v)) for a, v in kw.items()))
+        if k not in restorers: restorers[k] = make(**kw)
+        return restorers[k]
+    face_enhancer.GFPGANer = warm_restorer
+
+def _source_coeffs(models, job, first_frame_dir):
+    """CropAndExtract.generate() cached per (image bytes, preprocess, size): face
+    detection, alignment, cropping and 3DMM extraction run once per portrait."""
+    import pickle
+    cache, size = models["cache"], int(job["size"])
+    key = cache.key("source", file_digest(job["source_image"]), job["preprocess"], size)
+    hit = cache.get(key)
+    if hit is not None:
+        try:
+            with open(os.path.join(hit, "meta.pkl"), "rb") as f:
+                meta = pickle.load(f)
+            for name in meta["files"]:
+                shutil.copy2(os.path.join(hit, name), first_frame_dir)
+            print("3DMM Extraction: reusing cached crop and coefficients", flush=True)
+            return (os.path.join(first_frame_dir, meta["coeff"]),
+                    os.path.join(first_frame_dir, meta["crop"]), meta["crop_info"])
+        except OSError:
+            pass                    # entry cleared under us — recompute
+    print("3DMM Extraction for source image", flush=True)
+    coeff_path, crop_path, crop_info = models["preprocess"].generate(
+        job["source_image"], first_frame_dir, job["preprocess"], source_image_flag=True, pic_size=size)
+    if coeff_path is not None:
+        def fill(d):
+            files = os.listdir(first_frame_dir)
+            for name in files:
+                shutil.copy2(os.path.join(first_frame_dir, name), d)
+            with open(os.path.join(d, "meta.pkl"), "wb") as f:
+                pickle.dump({"files": files, "coeff": os.path.basename(coeff_path),
+                             "crop": os.path.basename(crop_path), "crop_info": crop_info}, f)
+        cache.put(key, fill)
+    return coeff_path, crop_path, crop_info
+
+def _audio_batch(models, first_coeff_path, job):
+    """get_data() with the audio half (mels + blink ratio) cached per audio file.
+    Only the per-image reference coefficients are rebuilt on a hit."""
+    import numpy as np, scipy.io as scio, torch
+    from src.generate_batch import get_data
+    cache, device, audio = models["cache"], models["device"], job["driven_audio"]
+    key = cache.key("audio", file_digest(audio), job["still"])
+    hit = cache.get(key)
+    if hit is not None:
+        try:
+            feats = torch.load(os.path.join(hit, "feats.pt"), map_location=device)
+            print("Audio features: reusing cached mels", flush=True)
+            ref = scio.loadmat(first_coeff_path)["coeff_3dmm"][:1, :70]
+            ref = torch.FloatTensor(np.repeat(ref, feats["num_frames"], axis=0)).unsqueeze(0).to(device)
+            return {**feats, "ref": ref,
+                    "pic_name":   os.path.splitext(os.path.basename(first_coeff_path))[0],
+                    "audio_name": os.path.splitext(os.path.basename(audio))[0]}
+        except OSError:
+            pass
+    print("Audio features: extracting mels", flush=True)
+    src   = job.get("audio16k")         # the 16 kHz copy AudioNormalizer made, if it still exists
+    batch = get_data(first_coeff_path, src if src and os.path.exists(src) else audio, device, None,
+                     still=job["still"])
+    batch["audio_name"] = os.path.splitext(os.path.basename(audio))[0]
+    feats = {k: batch[k].cpu() if hasattr(batch[k], "cpu") else batch[k]
+             for k in ("indiv_mels", "ratio_gt", "num_frames")}
+    cache.put(key, lambda d: torch.save(feats, os.path.join(d, "feats.pt")))
+    return batch
+
+def _audio_coeffs(models, batch, first_coeff_path, job, save_dir):
+    """Audio2Coeff.generate() cached per (audio, pose style, still, source coefficients):
+    the predicted expressions and pose start from the portrait's own 3DMM coefficients."""
+    cache = models["cache"]
+    key = cache.key("coeff", file_digest(job["driven_audio"]), job["pose_style"], job["still"],
+                    file_digest(first_coeff_path))
+    name = "%s##%s.mat" % (batch["pic_name"], batch["audio_name"])
+    hit  = cache.get(key)
+    if hit is not None:
+        try:
+            path = shutil.copy2(os.path.join(hit, "coeff.mat"), os.path.join(save_dir, name))
+            print("Audio2Coeff: reusing cached coefficients", flush=True)
+            return path
+        except OSError:
+            pass
+    coeff_path = models["audio2coeff"].generate(batch, save_dir, job["pose_style"], None)
+    cache.put(key, lambda d: shutil.copy2(coeff_path, os.path.join(d, "coeff.mat")))
+    return coeff_path
+
+def _render(models, job):
+    """Mirror of inference.py's main() on already-loaded models. Returns the .mp4 path."""
+    from src.generate_facerender_batch import get_facerender_data
+    size = int(job["size"])
+    # os.mkdir claims the name atomically: parallel slots started in the same second
+    # (e.g. the segments of one long track) each get their own folder and .mp4.
+    stamp = os.path.join(job["result_dir"], time.strftime("%Y_%m_%d_%H.%M.%S"))
+    os.makedirs(job["result_dir"], exist_ok=True)
+    for n in itertools.count():
+        save_dir = stamp + (f"_{n}" if n else "")
+        if os.path.exists(save_dir + ".mp4"): continue
+        try:
+            os.mkdir(save_dir)
+            break
+        except FileExistsError:
+            continue
+    first_frame_dir = os.path.join(save_dir, "first_frame_dir")
+    os.makedirs(first_frame_dir, exist_ok=True)
+
+    first_coeff_path, crop_pic_path, crop_info = _source_coeffs(models, job, first_frame_dir)
+    if first_coeff_path is None:
+        raise RuntimeError("Can't get the coeffs of the input")
+
+    batch = _audio_batch(models, first_coeff_path, job)
+    coeff_path = _audio_coeffs(models, batch, first_coeff_path, job, save_dir)
+
+    data = get_facerender_data(coeff_path, crop_pic_path, first_coeff_path, job["driven_audio"], 2,
+                               None, None, None, expression_scale=job["expression_scale"],
+                               still_mode=job["still"], preprocess=job["preprocess"], size=size)
+    enhancer = None if job["enhancer"] == "none" else job["enhancer"]
+    result = models["animate"].generate(data, save_dir, job["source_image"], crop_info,
+                                        enhancer=enhancer, background_enhancer=None,
+                                        preprocess=job["preprocess"], img_size=size)
+    shutil.move(result, save_dir + ".mp4")
+    print("The generated video is named:", save_dir + ".mp4", flush=True)
+    shutil.rmtree(save_dir, ignore_errors=True)
+    return save_dir + ".mp4"
+
+def _enhance(job):
+    """The enhancer tail of AnimateFromCoeff.generate() as a step of its own:
+    face-enhances job["video"] in place, keeping its audio track."""
+    import imageio
+    from src.utils.face_enhancer import enhancer_generator_with_len, enhancer_list
+    video = job["video"]
+    base  = os.path.splitext(video)[0]
+    tmp, out = base + "_enhancing.mp4", base + "_enhanced.mp4"
+    try:
+        imageio.mimsave(tmp, enhancer_generator_with_len(video, method=job["enhancer"], bg_upsampler=None),
+                        fps=float(25))
+    except Exception:       # same fallback as SadTalker: enhance the whole list at once
+        imageio.mimsave(tmp, enhancer_list(video, method=job["enhancer"], bg_upsampler=None), fps=float(25))
+    subprocess.run([ffmpeg_exe() or "ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", tmp, "-i", video,
+                    "-map", "0:v:0", "-map", "1:a:0?", "-c", "copy", out], check=True)
+    os.remove(tmp)
+    os.replace(out, video)
+    print("The generated video is named:", video, flush=True)
+    return video
+
+def worker_main(argv):
+    """Entry point of `sadtalker_app.py --worker`: load once, then serve jobs until stdin closes.
+    With --enhance METHOD it is a face-enhancer worker that takes {"video", "enhancer"} jobs."""
+    import argparse, traceback
+    ap = argparse.ArgumentParser(prog="sadtalker_app.py --worker")
+    ap.add_argument("--size",       type=int, default=256)
+    ap.add_argument("--preprocess", default="crop")
+    ap.add_argument("--enhance",    metavar="METHOD")
+    ap.add_argument("--threads",    type=int, default=0)
+    ap.add_argument("--cpus",       type=lambda v: [int(c) for c in v.split(",")], default=None)
+    a = ap.parse_args(argv)
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, str(BASE_DIR))
+    if a.cpus:
+        set_affinity(0, a.cpus)                 # before torch starts its thread pools
+        a.threads = min(a.threads, len(a.cpus)) if a.threads else len(a.cpus)     # never more than the block
+    os.environ.update(thread_env(a.threads))    # before torch / numpy read them
+    try:
+        if a.enhance:
+            import torch
+            _warm_enhancer()
+            models = {"device": "cuda" if torch.cuda.is_available() else "cpu"}
+        else:
+            models = _load_models(a.size, a.preprocess)
+        if a.threads:
+            import torch
+            torch.set_num_threads(a.threads)
+    except Exception as e:
+        traceback.print_exc()
+        _emit("fatal", error=f"{type(e).__name__}: {e}")
+        return 1
+    _emit("ready", device=models["device"])
+    step = (lambda job: _enhance(job)) if a.enhance else (lambda job: _render(models, job))
+    for line in sys.stdin:
+        if not line.strip(): continue
+        msg = json.loads(line)
+        if msg.get("cmd") == "quit": break
+        try:
+            _emit("done", id=msg["id"], ok=True, result=step(msg["job"]))
+        except Exception as e:
+            traceback.print_exc()
+            _emit("done", id=msg["id"], ok=False, error=f"{type(e).__name__}: {e}")
+    return 0
+
+
+class InferenceWorker:
+    """Client side of one warm worker process, driven synchronously from a batch thread.
+    `args` follow `--worker` on its command line."""
+    def __init__(self, key, args):
+        self.key  = key
+        self.args = list(args)
+        self.proc = None
+        self._ids = itertools.count(1)
+
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self, on_line):
+        """Spawns the worker and blocks until its models are loaded. Returns False on failure."""
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--worker", *self.args]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, text=True, bufsize=1, **_NEW_GROUP,
+                                         cwd=str(BASE_DIR), env={**os.environ, "PYTHONUNBUFFERED": "1"})
+        except OSError as e:
+            on_line(str(e)); return False
+        _job_pids[threading.get_ident()] = self.proc.pid     # the watchdog also covers model loading
+        if self._read_until("ready", on_line) is None:
+            self.stop(); return False
+        return True
+
+    def submit(self, job, on_line):
+        """Runs one job. Returns the worker's "done" message, or None if the worker died."""
+        jid = next(self._ids)
+        try:
+            self.proc.stdin.write(json.dumps({"id": jid, "job": job}) + "\n")
+            self.proc.stdin.flush()
+        except (OSError, ValueError):
+            self.stop(); return None
+        msg = self._read_until("done", on_line)
+        if msg is None: self.stop()
+        return msg
+
+    def _read_until(self, event, on_line):
+        for line in self.proc.stdout:
+            line = line.rstrip()
+            pos  = line.find(WORKER_TAG)
+            if pos < 0:
+                if line: on_line(line)
+                continue
+            if line[:pos].strip(): on_line(line[:pos].rstrip())
+            try:
+                msg = json.loads(line[pos + len(WORKER_TAG):])
+            except ValueError:
+                msg = None
+            if not isinstance(msg, dict):       # truncated or interleaved: treat the worker as failed
+                on_line(line); return None
+            if msg.get("event") == event: return msg
+            if msg.get("event") == "fatal":
+                on_line(msg.get("error", "")); return None
+        return None
+
+    def stop(self):
+        if self.proc is None: return
+        proc, self.proc = self.proc, None
+        try:
+            proc.stdin.write(json.dumps({"cmd": "quit"}) + "\n")
+            proc.stdin.close()
+        except (OSError, ValueError):
+            pass
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            kill_tree(proc.pid)
+
+
+_workers       = {}         # scheduler slot (or ENHANCE_SLOT) -> InferenceWorker
+_worker_lock   = threading.Lock()
+_worker_failed = set()      # keys whose worker could not start this session
+ENHANCE_SLOT   = "enhance"
+
+def get_worker(job, on_line, t, slot=0):
+    """Returns a warm render worker for `slot` that fits `job`, restarting it if the size,
+    preprocess family, thread count or CPU partitioning changed, or None."""
+    key  = worker_key(job)
+    cpus = slot_cpus(key[3], slot)
+    args = ["--size", key[0], "--preprocess", "full" if key[1] else "crop", "--threads", str(key[2])]
+    if cpus: args += ["--cpus", ",".join(map(str, cpus))]
+    return _pooled(slot, key, args, on_line, t["gen_worker_start"].format(size=key[0]))
+
+def get_enhancer(method, on_line, t):
+    """Returns the warm face-enhancer worker for `method`, or None."""
+    return _pooled(ENHANCE_SLOT, (ENHANCE_SLOT, method), ["--enhance", method],
+                   on_line, t["gen_enh_start"].format(enhancer=method))
+
+def _pooled(slot, key, args, on_line, start_msg):
+    with _worker_lock:
+        w = _workers.pop(slot, None)
+        if w is not None and w.key == key and w.alive:
+            _workers[slot] = w
+            return w
+        failed = key in _worker_failed
+    if w is not None: w.stop()
+    if failed: return None
+    # Model loading takes a while — do it outside the lock so other slots can start too.
+    on_line(start_msg)
+    w = InferenceWorker(key, args)
+    ok = w.start(on_line)
+    with _worker_lock:
+        if ok:                _workers[slot] = w
+        elif not job_killed(): _worker_failed.add(key)
+    return w if ok else None
+
+def stale_workers(s):
+    """True if any running worker was loaded for a different size, preprocess family or enhancer."""
+    keys = {worker_key(s), (ENHANCE_SLOT, s["enhancer"])}
+    return any(w.key not in keys for w in list(_workers.values()))
+
+def shutdown_workers():
+    with _worker_lock:
+        for w in _workers.values(): w.stop()
+        _workers.clear()
+
+def run_oneshot(job, on_line, script=None, cpus=None):
+    """Spawns a fresh inference.py for `job`, streaming its output. Returns the exit code.
+    With `cpus` the process is pinned to them and runs at most that many threads."""
+    threads = job.get("threads", 0) or len(cpus or ())
+    if cpus: threads = min(threads, len(cpus))
+    proc = subprocess.Popen(inference_cmd(job, script), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, cwd=str(BASE_DIR), **_NEW_GROUP,
+                            env={**os.environ, **thread_env(threads), "PYTHONUNBUFFERED": "1"})
+    if cpus: set_affinity(proc.pid, cpus)     # torch has not started its threads yet
+    _job_pids[threading.get_ident()] = proc.pid
+    for line in proc.stdout:
+        line = line.rstrip()
+        if line: on_line(line)
+    proc.wait()
+    return proc.returncode
+
+_RESULT_RE = re.compile(r"The generated video is named:?\s*(.+\.mp4)")
+
+def run_job(job, on_line, t, slot=0):
+    """Renders `job` on the warm worker for `slot`, falling back to a one-shot spawn.
+    Returns (ok, path of the video or None)."""
+    worker = get_worker(job, on_line, t, slot)
+    if worker: _job_pids[threading.get_ident()] = worker.proc.pid
+    msg = worker.submit(job, on_line) if worker else None
+    if msg is None and job_killed(): return False, None
+    if msg is None:
+        on_line(t["gen_worker_fail"])
+        return _oneshot_result(job, on_line, slot_cpus(job.get("cpu_split", 0), slot))
+    if not msg["ok"]: on_line(msg.get("error", ""))
+    return msg["ok"], msg.get("result")
+
+# ── Enhancer stage ────────────────────────────────────────────────────────────
+ENHANCE_QUEUE = 2           # rendered videos waiting for the enhancer before render slots block
+_enhance_lock = threading.Lock()    # one enhancer worker, shared by every running batch
+
+def enhance_video(job, video, on_line, t):
+    """Face-enhances `video`, rendered for `job` without enhancer, on the enhancer worker.
+    Without one, renders the whole job again in a one-shot inference.py. Returns (ok, path)."""
+    with _enhance_lock:
+        worker = get_enhancer(job["enhancer"], on_line, t)
+        if worker: _job_pids[threading.get_ident()] = worker.proc.pid
+        msg = worker.submit({"video": video, "enhancer": job["enhancer"]}, on_line) if worker else None
+    if msg is None and job_killed(): return False, None
+    if msg is None:
+        on_line(t["gen_enh_fail"])
+        Path(video).unlink(missing_ok=True)
+        return _oneshot_result(job, on_line)
+    if not msg["ok"]: on_line(msg.get("error", ""))
+    return msg["ok"], msg.get("result")
+
+
+class EnhanceStage:
+    """Second pipeline stage of a batch: enhances rendered videos on the enhancer worker
+    while the render slots go on with their next job. The hand-off queue holds at most
+    ENHANCE_QUEUE videos; put() blocks beyond that instead of piling up work.
+    on_done(item, ok, result, (peak_rss_mb, peak_gpu_mb), killed) runs on the stage's
+    thread; `control` (a JobControl) watches each enhancement like a render."""
+    def __init__(self, t, on_done, control=None):
+        self.t       = t
+        self.on_done = on_done
+        self.control = control or JobControl()
+        self._q      = queue.Queue(maxsize=ENHANCE_QUEUE)
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        """Hands over {"job", "video", "on_line", ...}."""
+        self._q.put(item)
+
+    def close(self):
+        """Waits for everything handed over so far, then stops the thread."""
+        self._q.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        ident = threading.get_ident()
+        while True:
+            item = self._q.get()
+            if item is None: return
+            if self.control.cancelled:
+                self.on_done(item, False, None, (None, None), "cancelled")
+                continue
+            _sampler.watch(ident)
+            self.control.begin(item["i"], item["job"])
+            try:
+                ok, result = enhance_video(item["job"], item["video"], item["on_line"], self.t)
+            except Exception as e:
+                item["on_line"](f"{type(e).__name__}: {e}")
+                ok, result = False, None
+            killed = self.control.end(item["i"])
+            self.on_done(item, ok, result, _sampler.release(ident), killed)
+
+
+def _oneshot_result(job, on_line, cpus=None):
+    """run_oneshot() returning (ok, path of the video or None) like run_job()."""
+    found = []
+    def line(l):
+        m = _RESULT_RE.search(l)
+        if m: found.append(os.path.join(job["result_dir"], m.group(1).strip()))
+        on_line(l)
+    ok = run_oneshot(job, line, cpus=cpus) == 0
+    return ok, (found[-1] if ok and found else None)
+
+def stub_render(seconds=1.0):
+    """A run_job() stand-in that needs no models or GPU: prints tqdm-style lines for
+    each of the job's stages over about `seconds` and writes a placeholder .mp4.
+    For exercising the scheduler, queue and server offline."""
+    def render(job, on_line, t, slot=0):
+        prefixes = dict((name, p[0]) for name, p, _ in STAGES)
+        for stage, w in job_stages(job):
+            label = prefixes[stage].title()
+            for i in range(1, 6):
+                time.sleep(seconds * w / 5)
+                if job_killed(): return False, None
+                on_line(f"{label}: {i * 20}%|{'█' * i * 2:<10}| {i}/5 [00:00<00:00, {5 / max(seconds * w, 1e-3):.2f}it/s]")
+        out = Path(job["result_dir"], f"stub_{time.time_ns()}.mp4")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_bytes(b"stub " + json.dumps(job, sort_keys=True).encode())
+        on_line(f"The generated video is named: {out}")
+        return True, str(out)
+    return render
+
+
+# ── Progress lines ────────────────────────────────────────────────────────────
+# tqdm's default layout: "<desc>: 45%|█████     | 10/22 [00:03<00:04, 2.9it/s]",
+# or "<desc>: 10it [00:03, 2.9it/s]" when the total is unknown.
+_TQDM_RE  = re.compile(r"^(?P<label>.*?)\s*(?:(?P<pct>\d{1,3})%\||(?P<it>\d+)it \[)")
+_COUNT_RE = re.compile(r"\|\s*(?P<i>\d+)/(?P<n>\d+)\s*\[")
+_RATE_RE  = re.compile(r"(?P<v>[\d.]+)\s*(?P<u>it/s|s/it)\]")
+
+def parse_tqdm(line):
+    """{"label", "pct", "i", "n", "rate"} for a tqdm-style line (missing parts are None), else None."""
+    m = _TQDM_RE.match(line)
+    if not m: return None
+    c, r = _COUNT_RE.search(line), _RATE_RE.search(line)
+    rate = None
+    if r:
+        v = float(r.group("v"))
+        rate = v if r.group("u") == "it/s" else (1 / v if v else None)
+    return {
+        "label": m.group("label"),
+        "pct":   int(m.group("pct")) if m.group("pct") else None,
+        "i":     int(c.group("i")) if c else (int(m.group("it")) if m.group("it") else None),
+        "n":     int(c.group("n")) if c else None,
+        "rate":  rate,
+    }
+
+def progress_label(line):
+    """(label, percent or None) for a tqdm-style progress line, else None."""
+    p = parse_tqdm(line)
+    return (p["label"], p["pct"]) if p else None
+
+# SadTalker's pipeline stages: (name, lowercase prefixes of its tqdm descriptions
+# or status lines, rough share of a job's wall time on a GTX 1060).
+STAGES = [
+    ("preprocess",  ("landmark det", "3dmm extraction"),        0.10),
+    ("audio2coeff", ("mel", "audio2exp", "audio2pose", "audio features", "audio2coeff"), 0.05),
+    ("render",      ("face renderer",),                         0.55),
+    ("paste",       ("seamlessclone",),                         0.10),
+    ("enhance",     ("face enhancer",),                         0.30),
+]
+
+def job_stages(job):
+    """[(stage, weight)] this job will go through, weights summing to 1."""
+    names = {"preprocess", "audio2coeff", "render"}
+    if "full" in job["preprocess"]: names.add("paste")
+    if job["enhancer"] != "none":   names.add("enhance")
+    picked = [(n, w) for n, _, w in STAGES if n in names]
+    total  = sum(w for _, w in picked)
+    return [(n, w / total) for n, w in picked]
+
+# SadTalker writes and muxes a video right after each of these finishes; the time
+# until the next stage starts is booked as "mux" (timing only, it has no weight).
+MUX_AFTER = ("render", "paste", "enhance")
+
+def line_stage(line):
+    low = line.strip().lower()
+    for name, prefixes, _ in STAGES:
+        if low.startswith(prefixes): return name
+    return None
+
+def fmt_duration(sec):
+    sec = int(round(sec))
+    h, m, s = sec // 3600, sec // 60 % 60, sec % 60
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+
+class ProgressTracker:
+    """Turns one job's output lines into structured "progress" events:
+    {"event", "job", "stage", "i", "n", "rate", "frac", "elapsed", "eta"}, where
+    `frac` is the job's overall completion from the stage weights, and keeps
+    per-stage wall times (including "mux", see MUX_AFTER)."""
+    def __init__(self, job, index=0, on_event=None):
+        self.index    = index
+        self.on_event = on_event or (lambda ev: None)
+        self.weights  = job_stages(job)
+        self.timings  = {}
+        self.stage    = None
+        self.frac     = 0.0
+        self.t0       = self._stage_t0 = time.monotonic()
+
+    def _enter(self, stage, now):
+        if stage == self.stage: return
+        if self.stage: self.timings[self.stage] = self.timings.get(self.stage, 0.0) + now - self._stage_t0
+        self.stage, self._stage_t0 = stage, now
+
+    def feed(self, line):
+        """Feeds one output line; returns the event it produced, or None."""
+        stage = line_stage(line)
+        if stage is None: return None
+        now = time.monotonic()
+        self._enter(stage, now)
+        tq = parse_tqdm(line) or {}
+        i, n, rate = tq.get("i"), tq.get("n"), tq.get("rate")
+        done = 0.0
+        for name, w in self.weights:
+            if name == stage:
+                if i is not None and n: done += w * min(i / n, 1.0)
+                break
+            done += w
+        self.frac = max(self.frac, min(done, 1.0))
+        if stage in MUX_AFTER and i is not None and n and i >= n: self._enter("mux", now)
+        elapsed = now - self.t0
+        ev = {"event": "progress", "job": self.index, "stage": stage, "i": i, "n": n, "rate": rate,
+              "frac": self.frac, "elapsed": elapsed,
+              "eta": elapsed * (1 - self.frac) / self.frac if self.frac > 0.02 else None}
+        self.on_event(ev)
+        return ev
+
+    def enter(self, stage):
+        """Books the time from now on to `stage`, e.g. "queued" while waiting for the enhancer."""
+        self._enter(stage, time.monotonic())
+
+    def finish(self):
+        """Closes the running stage and returns {stage: seconds}."""
+        self._enter(None, time.monotonic())
+        return dict(self.timings)
+
+
+# ── Result index ──────────────────────────────────────────────────────────────
+RESULT_SETTINGS = ("size", "enhancer", "preprocess", "still", "expression_scale", "pose_style")
+
+def job_models(job):
+    """Weight files a job's render depends on."""
+    return [model_path(m) for m in required_models([job])]
+
+def result_key(job):
+    """Content address of a render: input bytes, output-relevant settings and the
+    identity (name, size, mtime) of the weights it loads."""
+    models = []
+    for f in job_models(job):
+        try:
+            st = f.stat()
+            models.append((f.name, st.st_size, st.st_mtime_ns))
+        except OSError:
+            models.append((f.name, None, None))
+    parts = [file_digest(job["source_image"]), file_digest(job["driven_audio"]),
+             {k: job[k] for k in RESULT_SETTINGS}, models]
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+class ResultIndex:
+    """result_key() → finished video, stored next to the job queue. Entries whose
+    video was deleted or changed size are dropped on lookup (and by prune())."""
+    def __init__(self, path=JOBS_DB):
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results ("
+                         "key TEXT PRIMARY KEY, path TEXT NOT NULL, bytes INTEGER, created REAL)")
+
+    def _run(self, sql, args=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, args).fetchall()
+
+    @staticmethod
+    def _valid(path, size):
+        try:
+            return os.path.getsize(path) == size
+        except OSError:
+            return False
+
+    def get(self, key):
+        rows = self._run("SELECT path, bytes FROM results WHERE key = ?", (key,))
+        if not rows: return None
+        path, size = rows[0]
+        if self._valid(path, size): return path
+        self._run("DELETE FROM results WHERE key = ?", (key,))
+        return None
+
+    def put(self, key, path):
+        self._run("INSERT OR REPLACE INTO results(key, path, bytes, created) VALUES (?, ?, ?, ?)",
+                  (key, str(path), os.path.getsize(path), time.time()))
+
+    def prune(self):
+        """Forgets every entry whose video is gone. Returns how many were dropped."""
+        dead = [(k,) for k, p, n in self._run("SELECT key, path, bytes FROM results") if not self._valid(p, n)]
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM results WHERE key = ?", dead)
+        return len(dead)
+
+
+def reuse_result(path, result_dir):
+    """Makes a cached video available in `result_dir`: as is when it already lives
+    there, otherwise as a hard link (or a copy across drives)."""
+    src = Path(path)
+    dst_dir = Path(result_dir)
+    if src.parent.resolve() == dst_dir.resolve(): return str(src)
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    dst = dst_dir / src.name
+    for n in itertools.count(1):
+        if not dst.exists(): break
+        dst = dst_dir / f"{src.stem}_{n}{src.suffix}"
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return str(dst)
+
+
+# ── Job metrics ───────────────────────────────────────────────────────────────
+# Every rendered job appends one JSON line to metrics.jsonl in its result folder:
+# settings, per-stage seconds, and the peak RSS / GPU memory of the process that
+# rendered it (warm worker or one-shot inference.py), sampled once a second.
+METRICS_NAME   = "metrics.jsonl"
+METRIC_KEYS    = ("size", "enhancer", "preprocess", "still")   # what the summary groups by
+SAMPLE_SECONDS = 1.0
+
+_job_pids = {}      # batch thread id -> pid of the process rendering its job
+
+def _rss_mb(pid):
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 2**20
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceSampler:
+    """Tracks peak RSS and GPU memory of the processes behind running jobs. A batch
+    thread calls watch() before rendering and release() after; the pid is looked up
+    in _job_pids on every sample, so worker restarts and one-shot fallbacks are
+    followed. GPU memory is per process where the shared gpu_telemetry() sampler
+    reports it (Linux / TCC), else the whole card's usage."""
+    def __init__(self, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self._peaks   = {}      # thread id -> [rss_mb, gpu_mb]
+        self._lock    = threading.Lock()
+        self._thread  = None
+
+    def watch(self, ident):
+        with self._lock:
+            self._peaks[ident] = [None, None]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def release(self, ident):
+        """Stops tracking `ident`; returns (peak_rss_mb, peak_gpu_mb), None where unknown."""
+        self._sample({ident: _job_pids.get(ident)})
+        with self._lock:
+            rss, gpu = self._peaks.pop(ident, (None, None))
+        _job_pids.pop(ident, None)
+        return (round(rss) if rss else None), (round(gpu) if gpu else None)
+
+    def _gpu(self):
+        """{pid: MB} of compute processes, with key None for the card's total use
+        (from the shared gpu_telemetry() sampler)."""
+        sampler = gpu_telemetry()
+        if not sampler.available: return {}
+        sample = sampler.latest()
+        return {None: sample["mem_used"] if sample else None, **sampler.processes()}
+
+    def _sample(self, pids):
+        gpu = self._gpu() if any(pids.values()) else {}
+        with self._lock:
+            for ident, pid in pids.items():
+                peak = self._peaks.get(ident)
+                if peak is None or pid is None: continue
+                rss = _rss_mb(pid)
+                g   = gpu.get(pid, gpu.get(None))
+                if rss: peak[0] = max(peak[0] or 0, rss)
+                if g:   peak[1] = max(peak[1] or 0, g)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if not self._peaks:
+                    self._thread = None
+                    return
+                idents = list(self._peaks)
+            self._sample({i: _job_pids.get(i) for i in idents})
+            time.sleep(self.interval)
+
+_sampler = ResourceSampler()
+
+_metrics_lock = threading.Lock()
+
+def metrics_path(job):
+    """metrics.jsonl next to the job's video (a split job's segments report to the original folder)."""
+    return Path(job.get("segment", {}).get("result_dir", job["result_dir"]), METRICS_NAME)
+
+def record_metrics(job, rec):
+    path = metrics_path(job)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _metrics_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\n")
+    except OSError:
+        pass                # metrics are best-effort; never fail a render over them
+
+def load_metrics(path):
+    recs = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    recs.append(json.loads(line))
+                except ValueError:
+                    pass        # a line cut short by a crash
+    except OSError:
+        pass
+    return recs
+
+def _p95(xs):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(0.95 * (len(xs) - 1))))]
+
+def metrics_summary(recs):
+    """Groups successful, actually rendered jobs by METRIC_KEYS and parallelism.
+    Returns [{"settings", "k", "n", "stages": {stage: (mean, p95)}, "total": (mean, p95),
+    "rss_mb": p95, "gpu_mb": p95}], most frequent combination first."""
+    groups = {}
+    for r in recs:
+        if not r.get("ok") or r.get("cached"): continue
+        key = (tuple(str(r["settings"].get(k)) for k in METRIC_KEYS), r.get("k", 1))
+        groups.setdefault(key, []).append(r)
+    order = [name for name, _, _ in STAGES] + ["mux", "queued"]
+    rows  = []
+    for (combo, k), rs in sorted(groups.items(), key=lambda kv: -len(kv[1])):
+        stages = {}
+        for st in order:
+            xs = [r["stages"][st] for r in rs if st in r.get("stages", {})]
+            if xs: stages[st] = (sum(xs) / len(xs), _p95(xs))
+        totals = [r["elapsed"] for r in rs]
+        rss    = [r["peak_rss_mb"] for r in rs if r.get("peak_rss_mb")]
+        gpu    = [r["peak_gpu_mb"] for r in rs if r.get("peak_gpu_mb")]
+        rows.append({"settings": dict(zip(METRIC_KEYS, combo)), "k": k, "n": len(rs), "stages": stages,
+                     "total": (sum(totals) / len(totals), _p95(totals)),
+                     "rss_mb": _p95(rss) if rss else None, "gpu_mb": _p95(gpu) if gpu else None})
+    return rows
+
+def format_metrics(rows, t):
+    """Plain-text table of metrics_summary() rows for a monospace box."""
+    if not rows: return t["met_empty"]
+    out = []
+    for row in rows:
+        s = row["settings"]
+        still = " · still" if s["still"] == "True" else ""
+        out.append(f"{s['size']} · {s['enhancer']} · {s['preprocess']}{still} · k={row['k']}   "
+                   + t["met_jobs"].format(n=row["n"]))
+        out.append(f"  {t['met_stage']:<14}{t['met_mean']:>9}{'p95':>9}")
+        for st, (mean, p95) in row["stages"].items():
+            out.append(f"  {st:<14}{mean:>8.1f}s{p95:>8.1f}s")
+        out.append(f"  {t['met_total']:<14}{row['total'][0]:>8.1f}s{row['total'][1]:>8.1f}s")
+        mem = []
+        if row["rss_mb"]: mem.append(t["met_ram"].format(gb=row["rss_mb"] / 1024))
+        if row["gpu_mb"]: mem.append(t["met_vram"].format(gb=row["gpu_mb"] / 1024))
+        if mem: out.append("  " + "  ·  ".join(mem))
+        out.append("")
+    return "\n".join(out)
+
+
+# ── Long audio ────────────────────────────────────────────────────────────────
+# SadTalker renders 25 fps from 16 kHz audio, i.e. 640 samples per frame. Cutting
+# on frame boundaries keeps every segment clip exactly as long as its audio, so
+# the clips butt-join without drift and need no overlap to trim away.
+SEGMENT_SR  = 16000
+SEGMENT_FPS = 25
+
+def ffmpeg_exe():
+    """ffmpeg on PATH, else the binary bundled with imageio-ffmpeg, else None."""
+    exe = shutil.which("ffmpeg")
+    if exe: return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+def _decode_pcm(path):
+    """`path` as 16 kHz mono int16 samples (numpy), or None without ffmpeg."""
+    import numpy as np
+    exe = ffmpeg_exe()
+    if exe is None: return None
+    raw = subprocess.run([exe, "-v", "error", "-i", str(path), "-f", "s16le", "-ac", "1",
+                          "-ar", str(SEGMENT_SR), "-"], capture_output=True, check=True).stdout
+    return np.frombuffer(raw, dtype=np.int16)
+
+def silence_cuts(pcm, segment_s):
+    """Frame indices to cut `pcm` at: about every `segment_s` seconds, each moved to
+    the quietest 200 ms within a quarter segment either side."""
+    import numpy as np
+    hop = SEGMENT_SR // SEGMENT_FPS
+    n   = len(pcm) // hop
+    if n == 0: return []
+    energy = np.sqrt((pcm[:n * hop].astype(np.float32).reshape(n, hop) ** 2).mean(axis=1))
+    energy = np.convolve(energy, np.ones(5) / 5, mode="same")
+    seg    = int(segment_s * SEGMENT_FPS)
+    cuts, pos = [], 0
+    while n - pos > seg * 1.5:
+        lo, hi = pos + seg * 3 // 4, pos + seg * 5 // 4
+        pos = lo + int(np.argmin(energy[lo:hi]))
+        cuts.append(pos)
+    return cuts
+
+def _write_wav(path, pcm):
+    import wave
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SEGMENT_SR)
+        w.writeframes(pcm.tobytes())
+
+def split_long_audio(jobs, segment_s, t, on_line=None, index=None):
+    """Replaces every job whose audio runs well past `segment_s` seconds with one job
+    per segment, cut at silences. Segment jobs carry a "segment" dict (group, i, n and
+    the original job's image, audio, result_dir and result_key) for stitch_ready().
+    The segment .wav files live in <result_dir>/_segments/<group>/ and are reused
+    when the same job is split again at the same `segment_s` (both go into the group),
+    so finished segments hit the ResultIndex."""
+    on_line = on_line or (lambda line: None)
+    out, decoded = [], {}
+    for job in jobs:
+        key = result_key(job)
+        if not segment_s or (index and index.get(key)):
+            out.append(job); continue
+        group   = hashlib.sha256(f"{key}:{float(segment_s):g}".encode()).hexdigest()[:16]
+        seg_dir = Path(job["result_dir"], "_segments", group)
+        listing = seg_dir / "segments.json"
+        if listing.exists():
+            wavs = json.loads(listing.read_text())
+        else:
+            audio = job["driven_audio"]
+            if audio not in decoded:
+                try:
+                    decoded[audio] = _decode_pcm(audio)
+                except (OSError, subprocess.CalledProcessError) as e:
+                    on_line(str(e)); decoded[audio] = None
+                if decoded[audio] is None: on_line(t["gen_log_nosplit"])
+            pcm = decoded[audio]
+            if pcm is None:
+                out.append(job); continue
+            cuts = silence_cuts(pcm, segment_s)
+            if not cuts:
+                out.append(job); continue
+            hop   = SEGMENT_SR // SEGMENT_FPS
+            edges = [0] + [c * hop for c in cuts] + [len(pcm)]
+            seg_dir.mkdir(parents=True, exist_ok=True)
+            wavs = []
+            for i, (a, b) in enumerate(zip(edges, edges[1:])):
+                wavs.append(f"seg_{i:03d}.wav")
+                _write_wav(seg_dir / wavs[-1], pcm[a:b])
+            listing.write_text(json.dumps(wavs))
+        on_line(t["gen_log_split"].format(name=Path(job["driven_audio"]).name, n=len(wavs)))
+        meta = {"group": group, "n": len(wavs), "key": key, "image": job["source_image"],
+                "audio": job["driven_audio"], "result_dir": job["result_dir"]}
+        out += [{**job, "driven_audio": str(seg_dir / w), "result_dir": str(seg_dir),
+                 "segment": {**meta, "i": i}} for i, w in enumerate(wavs)]
+    return out
+
+def stitch_clips(clips, audio, out):
+    """Concatenates segment clips without re-encoding the video and puts the original
+    `audio` under them (as AAC, the way SadTalker muxes it). Returns True on success."""
+    exe = ffmpeg_exe()
+    if exe is None: return False
+    out  = Path(out)
+    lst  = out.with_name(out.stem + ".concat.txt")
+    part = out.with_name(out.name + ".part")
+    lst.write_text("".join("file '{}'\n".format(Path(c).resolve().as_posix().replace("'", "'\\''"))
+                           for c in clips), encoding="utf-8")
+    cmd = [exe, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(lst), "-i", str(audio),
+           "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac", "-b:a", "192k",
+           "-shortest", "-movflags", "+faststart", "-f", "mp4", str(part)]
+    try:
+        ok = subprocess.run(cmd, capture_output=True).returncode == 0
+        if ok: os.replace(part, out)
+        return ok
+    finally:
+        lst.unlink(missing_ok=True)
+        part.unlink(missing_ok=True)
+
+def stitch_ready(jobq, batch_ids, index=None, on_event=None):
+    """Stitches every split job in `batch_ids` whose segments have all rendered, points
+    the segment rows at the joined video and deletes the segment clips (the .wav
+    segments stay for retries). Returns {group: ok}.
+    on_event gets {"event": "stitched", "group", "ok", "result", "name", "segments"}."""
+    on_event = on_event or (lambda ev: None)
+    groups = {}
+    for bid in batch_ids:
+        for row in jobq.jobs(bid):
+            seg = row["job"].get("segment")
+            if seg: groups.setdefault(seg["group"], []).append(row)
+    status = {}
+    for group, rows in groups.items():
+        seg = rows[0]["job"]["segment"]
+        out = Path(seg["result_dir"], f"{Path(seg['image']).stem}_{Path(seg['audio']).stem}_{group[:8]}.mp4")
+        if all(r["result"] == str(out) for r in rows) and out.exists():
+            status[group] = True; continue          # stitched in an earlier run
+        clips = [r["result"] for r in sorted(rows, key=lambda r: r["job"]["segment"]["i"])]
+        ready = len(rows) == seg["n"] and all(r["state"] == "done" for r in rows) and \
+                all(c and os.path.exists(c) for c in clips)
+        ok = ready and stitch_clips(clips, seg["audio"], out)
+        if ok:
+            jobq.set_result([r["id"] for r in rows], str(out))
+            if index: index.put(seg["key"], out)
+            for c in clips: Path(c).unlink(missing_ok=True)
+        status[group] = ok
+        if ready: on_event({"event": "stitched", "group": group, "ok": ok, "result": str(out) if ok else None,
+                            "name": Path(seg["image"]).name, "segments": seg["n"]})
+    return status
+
+
+# ── Input preflight ───────────────────────────────────────────────────────────
+# Before anything is queued, every distinct image is decoded and searched for a
+# face (OpenCV's Haar cascade — far cheaper than SadTalker's own detector) and
+# every distinct audio file is probed, in a thread pool. Jobs with an error
+# (unreadable or tiny image, unusable audio) are dropped; warnings are only
+# reported — Haar misses profiles, stylised art and small faces that SadTalker's
+# detector finds, so "no face" is one. Results are memoised per file version.
+MIN_FACE_PX     = 64        # smaller faces still render, but blurry
+MIN_IMAGE_PX    = 64        # smaller images cannot hold a face worth animating
+MIN_AUDIO_S     = 0.2
+THUMB_PX        = 96
+PREFLIGHT_WORKERS = 8
+
+_audio_probes = {}
+_image_checks = {}
+_cascades     = threading.local()
+
+def _file_key(path):
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+def probe_audio(path):
+    """{"seconds", "codec", "rate", "channels"} of an audio file (wav read directly,
+    anything else through ffmpeg; fields ffmpeg does not report are None), None if
+    it holds no readable audio, or {} when that cannot be told (no ffmpeg)."""
+    import wave
+    try:
+        k = _file_key(path)
+    except OSError:
+        return None
+    if k in _audio_probes: return _audio_probes[k]
+    try:
+        with wave.open(str(path)) as w:
+            info = {"seconds": w.getnframes() / w.getframerate(), "codec": "pcm", "rate": w.getframerate(),
+                    "channels": w.getnchannels()}
+    except (wave.Error, EOFError, OSError):
+        info = _probe_ffmpeg(path)
+    _audio_probes[k] = info
+    return info
+
+def _probe_ffmpeg(path):
+    exe = ffmpeg_exe()
+    if exe is None: return {}
+    try:
+        err = subprocess.run([exe, "-hide_banner", "-i", str(path)], capture_output=True,
+                             text=True, timeout=30).stderr
+    except (OSError, subprocess.SubprocessError):
+        return {}
+    stream = re.search(r"Stream #\S+.*?Audio:\s*(\w+)[^,]*(?:,\s*(\d+) Hz)?(?:,\s*([\w.]+))?", err)
+    if stream is None: return None
+    dur = re.search(r"Duration:\s*(\d+):(\d+):([\d.]+)", err)
+    return {"seconds":  int(dur[1]) * 3600 + int(dur[2]) * 60 + float(dur[3]) if dur else None,
+            "codec":    stream[1], "rate": int(stream[2]) if stream[2] else None,
+            "channels": {"mono": 1, "stereo": 2}.get(stream[3], stream[3])}
+
+def audio_seconds(path):
+    """Length of an audio file in seconds, or None."""
+    return (probe_audio(path) or {}).get("seconds")
+
+def _face_cascades(cv2):
+    """Frontal and profile Haar cascades, one set per thread (CascadeClassifier is not
+    thread-safe); empty when unavailable (OpenCV 5 moved them out of the main package)."""
+    if not hasattr(_cascades, "c"):
+        _cascades.c = []
+        for name in ("haarcascade_frontalface_default.xml", "haarcascade_profileface.xml"):
+            try:
+                c = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, name))
+            except AttributeError:
+                break
+            if not c.empty(): _cascades.c.append(c)
+    return _cascades.c
+
+def check_image(path, preprocess):
+    """Decodes `path` and looks for the face SadTalker will animate. Returns
+    {"error": (LANG key, fields) or None, "warnings": [(LANG key, fields)],
+    "face": (x, y, w, h) of the largest face or None}. Without OpenCV nothing is
+    checked and the render decides."""
+    try:
+        k = _file_key(path) + (preprocess,)
+    except OSError:
+        return {"error": ("pre_missing", {}), "warnings": [], "face": None}
+    if k in _image_checks: return _image_checks[k]
+    try:
+        import cv2, numpy as np
+    except ImportError:
+        return {"error": None, "warnings": [], "face": None}
+    res  = {"error": None, "warnings": [], "face": None}
+    data = np.fromfile(str(path), np.uint8)         # cv2.imread cannot open non-ASCII paths on Windows
+    img  = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE) if data.size else None
+    cascades = _face_cascades(cv2)
+    if img is None:
+        res["error"] = ("pre_bad_image", {})
+    elif min(img.shape) < MIN_IMAGE_PX:
+        res["error"] = ("pre_tiny_image", {"w": img.shape[1], "h": img.shape[0]})
+    elif cascades:
+        h, w  = img.shape
+        scale = min(1.0, 1024 / max(h, w))          # detection does not need more
+        small = cv2.resize(img, (int(w * scale), int(h * scale))) if scale < 1 else img
+        faces = []
+        for cascade in cascades:                    # profile only if no frontal face
+            faces = [tuple(int(v / scale) for v in f) for f in cascade.detectMultiScale(small, 1.1, 5, minSize=(20, 20))]
+            if faces: break
+        if not faces:
+            res["warnings"].append(("pre_no_face", {}))
+        else:
+            x, y, fw, fh = res["face"] = max(faces, key=lambda f: f[2] * f[3])
+            warn = res["warnings"].append
+            if min(fw, fh) < MIN_FACE_PX: warn(("pre_small_face", {"px": min(fw, fh)}))
+            if len(faces) > 1:            warn(("pre_many_faces", {"n": len(faces)}))
+            # crop / extcrop cut out about twice the face box; resize squeezes the whole frame
+            if "crop" in preprocess and min(x, y, w - x - fw, h - y - fh) < min(fw, fh) // 4:
+                warn(("pre_edge", {}))
+            if preprocess == "resize" and fw < w / 4: warn(("pre_resize_small", {}))
+    _image_checks[k] = res
+    return res
+
+def check_audio(path):
+    """(LANG key, fields) of why `path` cannot drive a render, or None."""
+    info = probe_audio(path)
+    if info is None: return ("pre_bad_audio", {})
+    if info.get("seconds") is not None and info["seconds"] < MIN_AUDIO_S: return ("pre_short_audio", {})
+    return None
+
+def thumbnail(path, cache=None):
+    """Path of a cached THUMB_PX PNG of image `path`, or None if it cannot be made."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    cache = cache or DiskCache(CACHE_DIR, load_settings()["cache_mb"])
+    try:
+        key = DiskCache.key("thumb", file_digest(path), THUMB_PX)
+        hit = cache.get(key)
+        if hit: return hit / "thumb.png"
+        def fill(d):
+            with Image.open(path) as im:
+                im.thumbnail((THUMB_PX, THUMB_PX))
+                im.convert("RGB").save(os.path.join(d, "thumb.png"))
+        return cache.put(key, fill) / "thumb.png"
+    except Exception:           # unreadable image — the preflight reports it
+        return None
+
+def _pool():
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(min(PREFLIGHT_WORKERS, (os.cpu_count() or 1) + 1))
+
+def thumbnails(paths):
+    """{path: thumbnail(path)} for `paths`, made in a thread pool."""
+    with _pool() as ex:
+        return dict(zip(paths, ex.map(thumbnail, paths)))
+
+def preflight(jobs, t):
+    """Checks the inputs of `jobs` in a thread pool. Returns (jobs that can render,
+    [(level "error" | "warn", file name, message)])."""
+    images = sorted({(j["source_image"], j["preprocess"]) for j in jobs})
+    audios = sorted({j["driven_audio"] for j in jobs})
+    with _pool() as ex:
+        img_res = dict(zip(images, ex.map(lambda ip: check_image(*ip), images)))
+        aud_res = dict(zip(audios, ex.map(check_audio, audios)))
+    problems, seen = [], set()
+    def report(level, path, msg):
+        if (level, path, msg[0]) in seen: return
+        seen.add((level, path, msg[0]))
+        problems.append((level, Path(path).name, t[msg[0]].format(**msg[1])))
+    ok = []
+    for j in jobs:
+        img, aud = img_res[(j["source_image"], j["preprocess"])], aud_res[j["driven_audio"]]
+        for w in img["warnings"]: report("warn", j["source_image"], w)
+        if img["error"]: report("error", j["source_image"], img["error"])
+        if aud:          report("error", j["driven_audio"], aud)
+        if not (img["error"] or aud): ok.append(j)
+    return ok, problems
+
+
+# ── Audio normalisation ───────────────────────────────────────────────────────
+# SadTalker reads its audio at 16 kHz mono; an mp3 / ogg / flac would otherwise be
+# decoded and resampled by every job that uses it. Each distinct file is
+# transcoded once into the disk cache and render workers read that copy
+# (job["audio16k"]); the original still goes into the finished video's soundtrack.
+def _is_wav16k(path):
+    info = probe_audio(path)
+    return bool(info) and info.get("codec") == "pcm" and info.get("rate") == SEGMENT_SR and info.get("channels") == 1
+
+def normalize_audio(path, cache, on_transcode=None):
+    """`path` as 16 kHz mono 16-bit WAV: the file itself if it already is one, else a
+    copy transcoded by ffmpeg (streamed file to file) and cached under its content
+    hash. None without ffmpeg or when the file does not decode. on_transcode() runs
+    before an actual transcode (not on a cache hit)."""
+    if _is_wav16k(path): return Path(path)
+    exe = ffmpeg_exe()
+    if exe is None or probe_audio(path) is None: return None
+    try:
+        key = DiskCache.key("wav16k", file_digest(path))
+        hit = cache.get(key)
+        if hit and (hit / "audio.wav").exists(): return hit / "audio.wav"
+        if on_transcode: on_transcode()
+        cmd = lambda d: [exe, "-v", "error", "-i", str(path), "-vn", "-ac", "1", "-ar", str(SEGMENT_SR),
+                         "-c:a", "pcm_s16le", os.path.join(d, "audio.wav")]
+        return cache.put(key, lambda d: subprocess.run(cmd(d), capture_output=True, check=True)) / "audio.wav"
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class AudioNormalizer:
+    """Adds job["audio16k"] to jobs as batch threads pick them up, transcoding each
+    distinct audio file once even when several threads need it at the same time.
+    Jobs whose audio cannot be converted keep reading the original."""
+    def __init__(self, t, on_line=None, cache=None):
+        self.t       = t
+        self.on_line = on_line or (lambda i, line: None)
+        self.cache   = cache or DiskCache(CACHE_DIR, load_settings()["cache_mb"])
+        self._wavs   = {}
+        self._locks  = {}
+        self._lock   = threading.Lock()
+
+    def __call__(self, i, job):
+        audio = job["driven_audio"]
+        with self._lock:
+            lock = self._locks.setdefault(audio, threading.Lock())
+        with lock:
+            if audio not in self._wavs:
+                self._wavs[audio] = normalize_audio(audio, self.cache, lambda: self.on_line(
+                    i, self.t["gen_log_transcode"].format(name=Path(audio).name)))
+        wav = self._wavs[audio]
+        return {**job, "audio16k": str(wav)} if wav and str(wav) != audio else job
+
+
+# ── Job control ───────────────────────────────────────────────────────────────
+# Render processes get a process group of their own, so a cancelled or hung job
+# can be killed together with anything it spawned (ffmpeg, the enhancer).
+JOB_TIMEOUT_MIN_S = 300     # on top of timeout_x × the predicted render time: worker start and model load
+RETRY_BACKOFF_S   = 5       # doubled after every failed attempt
+WATCHDOG_S        = 1.0
+
+_job_kills  = {}            # batch thread id -> why its render process was killed
+_NEW_GROUP  = ({"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if sys.platform == "win32"
+               else {"start_new_session": True})
+
+def kill_tree(pid):
+    """Kills process `pid` and all of its children."""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+        else:
+            import signal
+            os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+def job_killed():
+    """Why the render process of the calling batch thread was killed, or None."""
+    return _job_kills.get(threading.get_ident())
+
+
+class JobControl:
+    """Cancellation, timeouts and the stall watchdog for the jobs of one batch. A
+    batch thread calls begin() before each attempt at a job and end() after;
+    touch() on every output line. cancel(), skip() and the watchdog kill the
+    process tree rendering a job (found through _job_pids), so its thread moves
+    straight on. Settings: timeout_x (multiple of the render time predict_rate()
+    expects on `gpu_info` with `k` jobs side by side, 0 = no limit), stall_s
+    (seconds without output, 0 = never) and retries. Without `gpu_info` the
+    slower CPU rates apply."""
+    def __init__(self, s=None, gpu_info=None, k=1):
+        s = s or load_settings()
+        self.gpu_info  = gpu_info
+        self.k         = k
+        self._rates    = {}     # (size, enhancer on) -> predicted seconds per second of audio
+        self.timeout_x = float(s.get("timeout_x", 0))
+        self.stall_s   = float(s.get("stall_s", 0))
+        self.retries   = max(0, int(s.get("retries", 0)))
+        self.closing   = False
+        self._running  = {}     # job index -> {"ident", "deadline", "last", "reason"}
+        self._stop     = threading.Event()
+        self._lock     = threading.Lock()
+        self._thread   = None
+
+    @property
+    def cancelled(self):
+        return self._stop.is_set()
+
+    def limit(self, job):
+        """Seconds one attempt at `job` may take, or None for no limit."""
+        sec = audio_seconds(job["driven_audio"]) if self.timeout_x else None
+        if not sec: return None
+        key = (str(job["size"]), job["enhancer"] != "none")
+        if key not in self._rates: self._rates[key] = predict_rate(job, self.gpu_info, self.k)[0]
+        return JOB_TIMEOUT_MIN_S + self.timeout_x * self._rates[key] * sec
+
+    def begin(self, i, job):
+        limit, now = self.limit(job), time.monotonic()
+        with self._lock:
+            r = self._running[i] = {"ident": threading.get_ident(), "deadline": limit and now + limit,
+                                    "last": now, "reason": None}
+            if self.cancelled: self._kill(r, "cancelled")     # cancel() came before this attempt started
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def touch(self, i):
+        r = self._running.get(i)
+        if r: r["last"] = time.monotonic()
+
+    def end(self, i):
+        """Stops watching job `i`; returns why it was killed ("cancelled", "timeout",
+        "stalled") or None."""
+        with self._lock:
+            r = self._running.pop(i, None)
+        if r: _job_kills.pop(r["ident"], None)
+        return r and r["reason"]
+
+    def skip(self, i=None):
+        """Kills job `i`, or every job running now; the batch goes on with the rest."""
+        with self._lock:
+            hit = [r for n, r in self._running.items() if i is None or n == i]
+        for r in hit: self._kill(r, "cancelled")
+
+    def cancel(self):
+        """Kills the running jobs and starts no more."""
+        self._stop.set()
+        self.skip()
+
+    def shutdown(self):
+        """cancel() for the app closing: the jobs are killed but stay unfinished in
+        the queue, so the next session offers to resume them."""
+        self.closing = True
+        self.cancel()
+
+    def wait(self, seconds):
+        """Sleeps `seconds`; False if the batch was cancelled meanwhile."""
+        return not self._stop.wait(seconds)
+
+    def _kill(self, r, reason):
+        if r["reason"]: return
+        r["reason"] = _job_kills[r["ident"]] = reason
+        pid = _job_pids.get(r["ident"])
+        if pid: kill_tree(pid)
+
+    def _loop(self):
+        while True:
+            time.sleep(WATCHDOG_S)
+            now = time.monotonic()
+            with self._lock:
+                if not self._running:
+                    self._thread = None
+                    return
+                over = [(r, "timeout" if r["deadline"] and now > r["deadline"] else "stalled")
+                        for r in self._running.values()
+                        if (r["deadline"] and now > r["deadline"]) or (self.stall_s and now - r["last"] > self.stall_s)]
+            for r, reason in over: self._kill(r, reason)
+
+
+# ── Batch scheduling ──────────────────────────────────────────────────────────
+VRAM_PER_JOB_MB  = {"256": 2500, "512": 4200}   # one warm worker, measured on GTX 1060
+ENHANCER_VRAM_MB = 1200
+MAX_CONCURRENCY  = 8
+
+def auto_concurrency(s, gpu_info):
+    """How many jobs fit side by side: by free VRAM on CUDA machines, by cores otherwise."""
+    if gpu_info:
+        need = VRAM_PER_JOB_MB.get(str(s["size"]), 4200)
+        free = gpu_info[2] - 512                 # keep some headroom for the desktop
+        if s["enhancer"] != "none": free -= ENHANCER_VRAM_MB     # one shared enhancer worker
+        k = free // need
+    else:
+        k = (os.cpu_count() or 1) // 8           # torch already spreads one job over ~8 threads
+    return int(max(1, min(k, MAX_CONCURRENCY)))
+
+def batch_concurrency(s, gpu_info):
+    """The user's override from Settings, or auto_concurrency() when it is 0."""
+    k = int(s.get("concurrency", 0))
+    return k if k > 0 else auto_concurrency(s, gpu_info)
+
+
+def matrix_jobs(images, audios, s):
+    """Every image × every audio as jobs, image-major. `images` and `audios` are
+    [(path, settings overrides)]; a job's settings are `s`, then its image's
+    overrides, then its audio's."""
+    return [build_job(img, aud, {**s, **img_s, **aud_s}) for img, img_s in images for aud, aud_s in audios]
+
+def _cache_keys(job):
+    """The worker cache entries a render of `job` reads or fills: the face crop and
+    3DMM coefficients (_source_coeffs()) and the audio features (_audio_batch())."""
+    return (("source", job["source_image"], job["preprocess"], int(job["size"])),
+            ("audio",  job["driven_audio"], job["still"]))
+
+def cached_keys(jobs, cache=None):
+    """The _cache_keys() of `jobs` that are already in the disk cache."""
+    cache = cache or DiskCache(CACHE_DIR, load_settings()["cache_mb"])
+    out = set()
+    for key in {key for j in jobs for key in _cache_keys(j)}:
+        kind, path, *rest = key
+        try:
+            if (cache.root / cache.key(kind, file_digest(path), *rest)).is_dir(): out.add(key)
+        except OSError:
+            pass
+    return out
+
+class _CacheModel:
+    """Which cache entries a job finds when jobs start in order on `k` slots. The
+    first k start together, so an entry one of them fills is computed again by any
+    other of them that needs it; later jobs start as earlier ones finish and find
+    everything filled before them (entries are filled in a job's first seconds)."""
+    def __init__(self, k, cached=()):
+        self.ready = set(cached)
+        self.busy  = set()          # entries the first wave is filling
+        self.wave  = max(1, int(k))
+
+    def cost(self, keys):
+        """(entries computed twice, -entries reused) if a job needing `keys` starts next."""
+        return sum(key in self.busy for key in keys), -sum(key in self.ready for key in keys)
+
+    def add(self, keys):
+        """Starts a job needing `keys`; returns the ones it reuses."""
+        hits = [key for key in keys if key in self.ready]
+        self.busy |= {key for key in keys if key not in self.ready}
+        self.wave -= 1
+        if self.wave <= 0: self.ready, self.busy = self.ready | self.busy, set()
+        return hits
+
+def order_jobs(jobs, k=1, cached=()):
+    """`jobs` reordered so shared work is reused: jobs needing the same warm model
+    (worker_key()) run together, and each next job is the first one that recomputes
+    the fewest entries still being filled on another slot, then reuses the most
+    (see _CacheModel). `cached` holds entries already on disk (cached_keys())."""
+    groups = {}
+    for j in jobs: groups.setdefault(worker_key(j), []).append(j)
+    out, model = [], _CacheModel(k, cached)
+    for group in groups.values():
+        left = [(_cache_keys(j), j) for j in group]
+        while left:
+            best, low = 0, None
+            for n, (keys, _) in enumerate(left):
+                c = model.cost(keys)
+                if low is None or c < low: best, low = n, c
+                if c == (0, -len(keys)): break          # nothing to compute: can't do better
+            keys, job = left.pop(best)
+            model.add(keys)
+            out.append(job)
+    return out
+
+def cache_plan(jobs, k=1, cached=()):
+    """Expected cache hits when `jobs` start in this order on `k` slots:
+    {"source": [hits, jobs], "audio": [hits, jobs]}."""
+    plan, model = {"source": [0, 0], "audio": [0, 0]}, _CacheModel(k, cached)
+    for j in jobs:
+        keys = _cache_keys(j)
+        hits = model.add(keys)
+        for key in keys:
+            plan[key[0]][0] += key in hits
+            plan[key[0]][1] += 1
+    return plan
+
+# Worker status lines that tell whether a job reused a cache entry.
+CACHE_LINES = {
+    "3DMM Extraction: reusing":          ("source", True),
+    "3DMM Extraction for source image":  ("source", False),
+    "Audio features: reusing":           ("audio",  True),
+    "Audio features: extracting":        ("audio",  False),
+}
+
+def cache_report(ev, t):
+    """One log line for a run_batch() "cache" event."""
+    part = lambda kind: t["gen_cache_part"].format(hit=ev["actual"][kind][0], n=ev["actual"][kind][1],
+                                                   exp=ev["expected"][kind][0], m=ev["expected"][kind][1])
+    return t["gen_log_cache"].format(src=part("source"), aud=part("audio"))
+
+
+class BatchScheduler:
+    """Runs `jobs` on up to `k` threads. run_job(index, job, slot) returns True on
+    success, or None when a later stage has taken the job over and will call finish();
+    `slot` (0..k-1) lets each thread keep its own warm worker.
+    on_progress(fraction, done, total) gets the batch-wide progress."""
+    def __init__(self, jobs, k, run_job, on_progress=None):
+        self.jobs        = list(jobs)
+        self.k           = max(1, min(int(k), len(self.jobs) or 1))
+        self.run_job     = run_job
+        self.on_progress = on_progress or (lambda frac, done, total: None)
+        self.results     = [None] * len(self.jobs)
+        self.errors      = {}
+        self._frac       = [0.0] * len(self.jobs)
+        self._lock       = threading.Condition()
+
+    def finish(self, index, ok):
+        """Records the outcome of job `index`."""
+        with self._lock:
+            self.results[index] = bool(ok)
+            self._lock.notify_all()
+        self.progress(index, 1.0)
+
+    def progress(self, index, frac):
+        """Reports in-job progress (0..1) for job `index`."""
+        with self._lock:
+            self._frac[index] = min(max(frac, 0.0), 1.0)
+            total = sum(self._frac) / max(len(self._frac), 1)
+            done  = sum(r is not None for r in self.results)
+        self.on_progress(total, done, len(self.jobs))
+
+    def run(self):
+        """Blocks until every job has finished; returns the per-job results."""
+        pending = queue.Queue()
+        for i in range(len(self.jobs)): pending.put(i)
+
+        def loop(slot):
+            while True:
+                try:
+                    i = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    ok = self.run_job(i, self.jobs[i], slot)
+                except Exception as e:
+                    ok = False
+                    self.errors[i] = e
+                if ok is not None: self.finish(i, ok)
+
+        threads = [threading.Thread(target=loop, args=(slot,), daemon=True) for slot in range(self.k)]
+        for th in threads: th.start()
+        for th in threads: th.join()
+        with self._lock:
+            self._lock.wait_for(lambda: None not in self.results)
+        return self.results
+
+
+def run_batch(jobs, t, k, on_line=None, on_event=None, index=None, render=None, slot=0, control=None):
+    """Renders `jobs` on up to `k` parallel slots and returns the per-job results.
+    `control` (a JobControl, by default one on the saved settings) times out, kills
+    and retries jobs and lets the caller cancel them; once it is cancelled, jobs not
+    yet started are skipped without events. An exception from a render attempt (e.g.
+    an input deleted mid-batch) fails that attempt like a non-zero exit.
+    With a ResultIndex, a job identical to an earlier render returns that video
+    instead of rendering again (pass index=None to force re-renders). `render`
+    replaces run_job() (e.g. stub_render()); worker slots are numbered from `slot`.
+    With the real run_job(), face enhancement runs as a pipeline stage of its own
+    (EnhanceStage), so rendering job i+1 overlaps with enhancing job i, and each
+    distinct non-16 kHz audio is transcoded once for all its jobs (AudioNormalizer).
+
+    on_line(index, line) receives raw job output. on_event(dict) receives the
+    structured stream shared by the GUI and any headless caller:
+      {"event": "job_start", "job", "total", "name"}
+      {"event": "progress",  "job", "stage", "i", "n", "rate", "frac", "elapsed", "eta"}
+      {"event": "job_done",  "job", "ok", "result", "elapsed", "stages": {stage: seconds},
+                             "peak_rss_mb", "peak_gpu_mb", "error": None | "cancelled" | "timeout"
+                             | "stalled" | exception text, "cancelled"?: True}
+      {"event": "batch",     "frac", "done", "total", "elapsed", "eta"}
+      {"event": "cache",     "expected": {"source" | "audio": [hits, jobs]}, "actual": {...}}
+    The last one closes a run_job() batch: cache hits cache_plan() expected for the
+    jobs that rendered, against the ones their workers reported (CACHE_LINES)."""
+    on_line  = on_line  or (lambda i, line: None)
+    on_event = on_event or (lambda ev: None)
+    render   = render or run_job
+    control  = control or JobControl()
+    t0 = time.monotonic()
+
+    def batch_progress(frac, done, total):
+        el = time.monotonic() - t0
+        on_event({"event": "batch", "frac": frac, "done": done, "total": total, "elapsed": el,
+                  "eta": el * (1 - frac) / frac if frac > 0.01 else None})
+
+    def killed_msg(job, killed):
+        if killed == "timeout": return t["gen_log_timeout"].format(time=fmt_duration(control.limit(job)))
+        if killed == "stalled": return t["gen_log_stalled"].format(sec=int(control.stall_s))
+        return t["gen_log_cancelled"]
+
+    def complete(i, job, tracker, key, ok, result, peaks, killed=None):
+        if ok and result and key and os.path.exists(result): index.put(key, result)
+        done = {"event": "job_done", "job": i, "ok": ok, "result": result, "elapsed": time.monotonic() - tracker.t0,
+                "stages": tracker.finish(), "peak_rss_mb": peaks[0], "peak_gpu_mb": peaks[1], "error": killed}
+        if killed == "cancelled": done["cancelled"] = True
+        record_metrics(job, {"time": time.time(), "image": Path(job["source_image"]).name,
+                             "audio": Path(job["driven_audio"]).name, "audio_s": audio_seconds(job["driven_audio"]),
+                             "settings": {k: job[k] for k in RESULT_SETTINGS}, "k": sched.k,
+                             **{k: done[k] for k in ("ok", "elapsed", "stages", "peak_rss_mb", "peak_gpu_mb")}})
+        on_event(done)
+        return ok
+
+    def enhanced(item, ok, result, peaks, killed):
+        try:
+            if killed: item["on_line"](killed_msg(item["job"], killed))
+            peaks = tuple(max(filter(None, pair), default=None) for pair in zip(item["peaks"], peaks))
+            complete(item["i"], item["job"], item["tracker"], item["key"], ok, result, peaks, killed)
+        finally:
+            sched.finish(item["i"], ok)
+
+    stage = (EnhanceStage(t, enhanced, control)
+             if render is run_job and any(j["enhancer"] != "none" for j in jobs) else None)
+    norm  = AudioNormalizer(t, on_line) if render is run_job else None
+    fresh = [j for j in jobs if not (index and index.get(result_key(j)))] if render is run_job else []
+    plan  = cache_plan(fresh, min(max(1, int(k)), len(fresh) or 1), cached_keys(fresh)) if fresh else None
+    seen  = {}                  # (job, "source" | "audio") -> hit, from its last attempt
+
+    def run(i, job, n):
+        if control.cancelled: return False
+        name = Path(job["source_image"]).name
+        if job.get("segment"): name += f" [{job['segment']['i'] + 1}/{job['segment']['n']}]"
+        on_event({"event": "job_start", "job": i, "total": len(jobs), "name": name})
+        tracker = ProgressTracker(job, i, lambda ev: (on_event(ev), sched.progress(i, ev["frac"])))
+        def line(l):
+            on_line(i, l)
+            tracker.feed(l)
+            control.touch(i)
+            hit = next((v for p, v in CACHE_LINES.items() if l.startswith(p)), None)
+            if hit: seen[i, hit[0]] = hit[1]
+        try:
+            key = result_key(job) if index else None
+        except OSError:         # input gone or unreadable: the render attempt reports it
+            key = None
+        hit = index.get(key) if key else None
+        if hit:
+            result = reuse_result(hit, job["result_dir"])
+            on_line(i, t["gen_log_cached"].format(name=Path(hit).name))
+            on_event({"event": "job_done", "job": i, "ok": True, "result": result, "cached": True,
+                      "elapsed": time.monotonic() - tracker.t0, "stages": {}})
+            return True
+        if norm: job = norm(i, job)
+        handoff = stage is not None and job["enhancer"] != "none"
+        ident   = threading.get_ident()
+        for attempt in range(control.retries + 1):
+            if attempt:
+                delay = RETRY_BACKOFF_S * 2 ** (attempt - 1)
+                line(t["gen_log_retry"].format(sec=delay, n=attempt + 1, m=control.retries + 1))
+                if not control.wait(delay):
+                    killed = "cancelled"
+                    break
+            _sampler.watch(ident)
+            control.begin(i, job)
+            error = None
+            try:
+                ok, result = (False, None) if job_killed() else \
+                             render({**job, "enhancer": "none"} if handoff else job, line, t, slot + n)
+            except Exception as e:
+                ok, result, error = False, None, str(e)
+            finally:
+                killed = control.end(i)
+                peaks  = _sampler.release(ident)
+            if error and not killed: line(t["gen_log_job_error"].format(e=error))
+            if killed:
+                ok = False
+                line(killed_msg(job, killed))
+            if ok or killed == "cancelled": break
+        if ok and result and handoff:
+            tracker.enter("queued")
+            stage.put({"i": i, "job": job, "video": result, "on_line": line, "tracker": tracker,
+                       "key": key, "peaks": peaks})
+            return None
+        return complete(i, job, tracker, key, ok, result, peaks, killed or error)
+
+    sched = BatchScheduler(jobs, k, run, batch_progress)
+    try:
+        results = sched.run()
+    finally:
+        if stage: stage.close()
+    if plan and seen:           # one-shot renders report nothing to compare
+        actual = {kind: [sum(hit for (_, kd), hit in seen.items() if kd == kind),
+                         sum(kd == kind for _, kd in seen)] for kind in plan}
+        on_event({"event": "cache", "expected": plan, "actual": actual})
+    return results
+
+
+# ── Auto profile ──────────────────────────────────────────────────────────────
+# With profile "auto" the size, enhancer, parallelism and CPU threads per job come
+# from the hardware instead of Settings. Predicted render speed starts from the
+# built-in rates below and moves towards what metrics.jsonl measured on this machine.
+RAM_PER_JOB_MB = 3000       # resident size of one render worker
+RAM_HEADROOM_MB = 2048      # left for the OS and the GUI
+AUTO_512_VRAM_MB = 7500     # 6 GB cards fit 512 px + enhancer only just — keep them on 256
+PRIOR_RATE = {              # wall seconds per second of audio: GTX 1060 / 8-core CPU
+    ("cuda", "256", False): 1.5,  ("cuda", "256", True): 4.0,
+    ("cuda", "512", False): 4.0,  ("cuda", "512", True): 9.0,
+    ("cpu",  "256", False): 25.0, ("cpu",  "256", True): 60.0,
+    ("cpu",  "512", False): 70.0, ("cpu",  "512", True): 150.0,
+}
+PRIOR_WEIGHT = 3            # measured runs it takes to outweigh the built-in rate
+RATE_WINDOW  = 20           # most recent matching runs that count
+CPU_THREADS_PER_JOB = 8     # unmeasured CPUs: torch gains little from more threads per job
+SCALING_SLACK = 0.95        # take the fewest CPU workers within 5% of the best measured throughput
+
+def system_memory():
+    """(total_mb, available_mb) of RAM, or None when it cannot be read."""
+    try:
+        import psutil
+        vm = psutil.virtual_memory()
+        return vm.total / 2**20, vm.available / 2**20
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        class _MemStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong)] + \
+                       [(f, ctypes.c_ulonglong) for f in ("total", "avail", "total_pf", "avail_pf",
+                                                          "total_virt", "avail_virt", "avail_ext")]
+        st = _MemStatus()
+        st.dwLength = ctypes.sizeof(st)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(st)): return None
+        return st.total / 2**20, st.avail / 2**20
+    try:
+        with open("/proc/meminfo") as f:
+            info = {k: int(v.split()[0]) for k, _, v in (line.partition(":") for line in f)}
+        return info["MemTotal"] / 1024, info.get("MemAvailable", info["MemFree"]) / 1024
+    except (OSError, KeyError, ValueError, IndexError):
+        return None
+
+def load_cpu_scaling():
+    """{parallel jobs: audio seconds rendered per wall second} from the last
+    `benchmark.py --cpu-scaling` on this machine, or {} if it has not run (or the
+    usable CPUs changed since)."""
+    try:
+        with open(CPU_SCALING_FILE) as f:
+            data = json.load(f)
+        if data["cpus"] != len(usable_cpus()): return {}
+        return {int(k): float(v) for k, v in data["throughput"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+def cpu_workers(cores, scaling=None):
+    """Parallel jobs for a CPU-only machine: the fewest that reach SCALING_SLACK of
+    the best throughput measured by load_cpu_scaling(), else one per
+    CPU_THREADS_PER_JOB cores."""
+    scaling = load_cpu_scaling() if scaling is None else scaling
+    scaling = {k: v for k, v in scaling.items() if 1 <= k <= cores}
+    if scaling:
+        best = max(scaling.values())
+        return min(k for k, v in scaling.items() if v >= SCALING_SLACK * best)
+    return max(1, cores // CPU_THREADS_PER_JOB)
+
+def auto_profile(gpu_info, mem=None, cores=None):
+    """Size, enhancer, parallel jobs and CPU threads per job this machine carries: by
+    VRAM on CUDA machines, by cores (and measured scaling) on CPU-only ones, and
+    never more jobs than free RAM holds. CPU-only machines also get cpu_split, one
+    disjoint block of cores per job. `mem` is system_memory()'s (total, available)
+    if already known."""
+    cores = cores or len(usable_cpus())
+    mem   = mem or system_memory()
+    if gpu_info:
+        vram = gpu_info[2] - 512
+        if   gpu_info[2] >= AUTO_512_VRAM_MB:                   size, enhancer = "512", "gfpgan"
+        elif vram >= VRAM_PER_JOB_MB["256"] + ENHANCER_VRAM_MB: size, enhancer = "256", "gfpgan"
+        else:                                                   size, enhancer = "256", "none"
+    else:
+        size, enhancer = "256", "none"      # on CPU the enhancer costs more than the render
+    k = auto_concurrency({"size": size, "enhancer": enhancer}, gpu_info) if gpu_info else \
+        max(1, min(cpu_workers(cores), MAX_CONCURRENCY))
+    if mem: k = max(1, min(k, int((mem[1] - RAM_HEADROOM_MB) // RAM_PER_JOB_MB)))
+    return {"size": size, "enhancer": enhancer, "concurrency": k, "threads": max(1, cores // k),
+            "cpu_split": 0 if gpu_info else k}
+
+def apply_profile(s, gpu_info):
+    """Settings with the auto profile's picks laid over them when profile is "auto"."""
+    return {**s, **auto_profile(gpu_info)} if s.get("profile") == "auto" else s
+
+def predict_rate(s, gpu_info, k=1, recs=None):
+    """Predicted wall seconds per second of audio for one job with settings `s` while
+    `k` run side by side: the built-in rate for this kind of machine, pulled towards
+    the median of recent measured runs in `recs` (default: the results folder's
+    metrics.jsonl). Returns (rate, number of measured runs it used)."""
+    enh   = s["enhancer"] != "none"
+    prior = PRIOR_RATE[("cuda" if gpu_info else "cpu", str(s["size"]), enh)]
+    if recs is None: recs = load_metrics(RESULTS_DIR / METRICS_NAME)
+    rates = [r["elapsed"] / r["audio_s"] for r in recs
+             if r.get("ok") and not r.get("cached") and r.get("audio_s") and r.get("k", 1) == k
+             and str(r["settings"].get("size")) == str(s["size"])
+             and (r["settings"].get("enhancer", "none") != "none") == enh][-RATE_WINDOW:]
+    if not rates: return prior, 0
+    n = len(rates)
+    return (n * sorted(rates)[n // 2] + PRIOR_WEIGHT * prior) / (n + PRIOR_WEIGHT), n
+
+def predict_batch(jobs, s, gpu_info, k):
+    """(predicted wall seconds for `jobs` on `k` slots, seconds per second of audio),
+    or None if no audio length is known."""
+    secs = [audio_seconds(j["driven_audio"]) for j in jobs]
+    if not any(secs): return None
+    k    = max(1, min(k, len(jobs)))
+    rate = predict_rate(s, gpu_info, k)[0]
+    return rate * sum(x or 0 for x in secs) / k, rate
+
+
+# ── Persistent job queue ──────────────────────────────────────────────────────
+class JobQueue:
+    """Crash-safe record of batch jobs in SQLite: inputs and settings snapshot
+    (the job dict), state, output path and timings. States go pending → running →
+    done | failed; a job still "running" when the app starts again was interrupted.
+    Anything not done (and not cancelled) is picked up again by run_queued()."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS batches (
+            id      INTEGER PRIMARY KEY,
+            source  TEXT NOT NULL,
+            created REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS jobs (
+            id       INTEGER PRIMARY KEY,
+            batch    INTEGER NOT NULL REFERENCES batches(id),
+            seq      INTEGER NOT NULL,
+            job      TEXT NOT NULL,
+            state    TEXT NOT NULL DEFAULT 'pending',
+            result   TEXT,
+            error    TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            stages   TEXT,
+            started  REAL,
+            finished REAL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_batch_state ON jobs(batch, state);
+    """
+
+    def __init__(self, path=JOBS_DB):
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+
+    def _run(self, sql, args=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, args).fetchall()
+
+    def add_batch(self, jobs, source="gui"):
+        """Stores `jobs` as a new batch and returns its id."""
+        with self._lock, self._db:
+            bid = self._db.execute("INSERT INTO batches(source, created) VALUES (?, ?)",
+                                   (source, time.time())).lastrowid
+            self._db.executemany("INSERT INTO jobs(batch, seq, job) VALUES (?, ?, ?)",
+                                 [(bid, n, json.dumps(j)) for n, j in enumerate(jobs)])
+        return bid
+
+    def latest_batch(self, source):
+        rows = self._run("SELECT id FROM batches WHERE source = ? ORDER BY id DESC LIMIT 1", (source,))
+        return rows[0][0] if rows else None
+
+    def pending(self, batch_ids):
+        """[(job id, job)] still to render in `batch_ids`, in order. A "done" job whose
+        video has since been deleted counts as pending again."""
+        marks = ",".join("?" * len(batch_ids))
+        rows  = self._run(f"SELECT id, job, state, result FROM jobs WHERE batch IN ({marks}) "
+                          f"AND state != 'cancelled' ORDER BY batch, seq", tuple(batch_ids))
+        return [(jid, json.loads(job)) for jid, job, state, result in rows
+                if state != "done" or not (result and os.path.exists(result))]
+
+    def counts(self, batch_ids):
+        marks = ",".join("?" * len(batch_ids))
+        return dict(self._run(f"SELECT state, COUNT(*) FROM jobs WHERE batch IN ({marks}) GROUP BY state",
+                              tuple(batch_ids)))
+
+    def jobs(self, batch_id):
+        """The jobs of one batch as dicts (job, state, result, error, timings), in order."""
+        cols = ("id", "seq", "job", "state", "result", "error", "attempts", "stages", "started", "finished")
+        rows = self._run(f"SELECT {', '.join(cols)} FROM jobs WHERE batch = ? ORDER BY seq", (batch_id,))
+        out  = [dict(zip(cols, r)) for r in rows]
+        for r in out:
+            r["job"]    = json.loads(r["job"])
+            r["stages"] = json.loads(r["stages"]) if r["stages"] else {}
+        return out
+
+    def unfinished(self, source="gui"):
+        """[(batch id, jobs left)] of `source` batches a previous session did not finish."""
+        return self._run("SELECT batch, COUNT(*) FROM jobs JOIN batches ON batches.id = jobs.batch "
+                         "WHERE source = ? AND state IN ('pending', 'running', 'failed') "
+                         "GROUP BY batch ORDER BY batch", (source,))
+
+    def start(self, job_id):
+        self._run("UPDATE jobs SET state = 'running', attempts = attempts + 1, started = ?, finished = NULL "
+                  "WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id, ok, result=None, stages=None, error=None):
+        state = "done" if ok else "cancelled" if error == "cancelled" else "failed"
+        self._run("UPDATE jobs SET state = ?, result = ?, error = ?, stages = ?, finished = ? WHERE id = ?",
+                  (state, result, error, json.dumps(stages or {}), time.time(), job_id))
+
+    def set_result(self, job_ids, path):
+        marks = ",".join("?" * len(job_ids))
+        self._run(f"UPDATE jobs SET result = ? WHERE id IN ({marks})", (str(path), *job_ids))
+
+    def cancel(self, batch_ids):
+        marks = ",".join("?" * len(batch_ids))
+        self._run(f"UPDATE jobs SET state = 'cancelled' WHERE batch IN ({marks}) AND state != 'done'",
+                  tuple(batch_ids))
+
+
+def run_queued(jobq, batch_ids, t, k, on_line=None, on_event=None, index=None, render=None, slot=0,
+               control=None):
+    """run_batch() over whatever is still unfinished in `batch_ids`, recording each
+    job's state, output and stage timings in `jobq` as it goes, then stitches split
+    long-audio jobs (see split_long_audio()). Returns the results of the jobs it ran
+    (finished ones from an earlier session are skipped), one per split job rather
+    than per segment. When `control` is cancelled, the rest of the batch is marked
+    cancelled instead — or left unfinished, to resume, after control.shutdown()."""
+    todo = jobq.pending(batch_ids)
+    ids  = [jid for jid, _ in todo]
+
+    def event(ev):
+        if ev["event"] == "job_start":
+            jobq.start(ids[ev["job"]])
+        elif ev["event"] == "job_done" and not (control.closing and ev.get("cancelled")):
+            jobq.finish(ids[ev["job"]], ev["ok"], ev["result"], ev["stages"], ev.get("error"))
+        if on_event: on_event(ev)
+
+    control = control or JobControl()
+    results = run_batch([job for _, job in todo], t, k, on_line, event, index, render, slot, control) if todo else []
+    if control.cancelled:
+        if not control.closing: jobq.cancel(batch_ids)
+        return results
+    stitched = stitch_ready(jobq, batch_ids, index, on_event)
+    if not stitched: return results
+    out, seen = [], set()
+    for (_, job), ok in zip(todo, results):
+        group = job.get("segment", {}).get("group")
+        if group is None:
+            out.append(ok)
+        elif group not in seen:
+            seen.add(group)
+            out.append(stitched.get(group, False))
+    return out
+
+
+# ── Model checks ──────────────────────────────────────────────────────────────
+# Files that passed are kept in MODELS_INDEX by (size, mtime), so a check only
+# stats them; anything new or touched since is checked again. One check or fetch
+# runs at a time — server slots and the GUI share the files.
+_models_lock = threading.Lock()
+
+def verify_model(m, verified, remote_size=None):
+    """Why weight file `m` is unusable — "missing", "size" or "sha256" — or None.
+    A file without a pinned size is measured against remote_size(url) (the
+    server's Content-Length); when that is unknown too (offline) it is used as it
+    is but not entered. Updates `verified` ({name: {"size", "mtime_ns", "sha256"}})
+    with each file that passed."""
+    try:
+        st = model_path(m).stat()
+    except OSError:
+        return "missing"
+    seen = verified.get(m["name"])
+    if seen and (seen["size"], seen["mtime_ns"]) == (st.st_size, st.st_mtime_ns) and \
+            m["sha256"] in (None, seen["sha256"]):
+        return None
+    want = m["size"] or (remote_size(m["url"]) if remote_size else None)
+    if not st.st_size or want not in (None, st.st_size): return "size"     # e.g. a half-finished download
+    if want is None and m["sha256"] is None: return None
+    digest = file_digest(model_path(m))
+    if m["sha256"] not in (None, digest): return "sha256"
+    verified[m["name"]] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    return None
+
+def _check_models(models, remote_size=None):
+    try:
+        with open(MODELS_INDEX) as f:
+            verified = json.load(f)
+    except (OSError, ValueError):
+        verified = {}
+    before = dict(verified)
+    bad = [(m, why) for m in models for why in [verify_model(m, verified, remote_size)] if why]
+    if verified != before:
+        try:
+            with open(MODELS_INDEX, "w") as f:
+                json.dump(verified, f, indent=2)
+        except OSError:
+            pass
+    return bad
+
+def download_log(t, log):
+    """A Downloader on_event that reports through `log` in the Setup tab's words."""
+    mb = 1024 * 1024
+    def on_event(kind, item, done=0, total=None, rate=0.0, error=None, **_):
+        f = item["name"]
+        if kind == "exists":
+            log(t["setup_mdl_exists"].format(f=f))
+        elif kind == "start":
+            log(t["setup_mdl_resume"].format(f=f, mb=done/mb) if done else t["setup_mdl_dl"].format(f=f))
+        elif kind == "progress":
+            pct = int(100 * done / total) if total else 0
+            log(t["setup_mdl_prog"].format(f=f, pct=pct, mb=done/mb, total=(total or 0)/mb, rate=rate/mb))
+        elif kind == "done":
+            log(t["setup_mdl_ok"].format(f=f, rate=rate/mb))
+        elif kind == "error":
+            log(t["setup_mdl_err"].format(f=f, e=error))
+            log(t["setup_mdl_link"].format(url=item["url"]))
+    return on_event
+
+def ensure_models(settings, t, log=print):
+    """Downloads the files `settings` (settings dicts or jobs) need that are missing
+    or fail their check, then checks them again. Returns the names still unusable —
+    empty once every job can start."""
+    dl, fetched = Downloader(DOWNLOAD_WORKERS), {}         # url -> bytes a download just checked
+    remote = lambda url: fetched.get(url) or dl.remote_size(url)
+    with _models_lock:
+        bad = _check_models(required_models(settings), remote)
+        if not bad: return []
+        log(t["gen_log_models"].format(n=len(bad), files=", ".join(m["name"] for m, _ in bad)))
+        for m, why in bad:
+            if why == "sha256": model_path(m).unlink()     # right size, wrong bytes — would pass as "exists"
+        for d in MODEL_DIRS.values(): d.mkdir(parents=True, exist_ok=True)
+        report, lock = download_log(t, log), threading.Lock()
+
+        def on_event(kind, item, **info):
+            if kind == "done":          # the download already sized and hashed it — don't ask or read again
+                st = os.stat(item["dest"])
+                _digests[(os.path.abspath(item["dest"]), st.st_size, st.st_mtime_ns)] = info["sha256"]
+                fetched[item["url"]] = st.st_size
+            with lock: report(kind, item, **info)       # one file's lines at a time
+
+        dl.on_event = on_event
+        dl.fetch_all(
+            [{"url": m["url"], "dest": model_path(m), "name": m["name"], "size": m["size"], "sha256": m["sha256"]}
+             for m, _ in bad])
+        return [m["name"] for m, _ in _check_models([m for m, _ in bad], remote)]
+
+
+# ── Headless runner ───────────────────────────────────────────────────────────
+def load_manifest(path, s):
+    """Expands a manifest into jobs. Accepts {"settings": {...}, "result_dir": ..., "jobs": [...],
+    "matrix": {"images": [...], "audio": [...]}} or a bare job list. Each job is
+    {"image", "audio", "settings"?}; the matrix renders every image with every audio,
+    each entry a path or {"image" | "audio", "settings"} whose settings apply to its
+    whole row / column. Paths are relative to the manifest and settings layer over `s`."""
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list): data = {"jobs": data}
+    base = {**s, **data.get("settings", {})}
+    out  = Path(path.parent, data["result_dir"]).resolve() if data.get("result_dir") else RESULTS_DIR
+    full = lambda p: str(Path(path.parent, p).resolve())
+    jobs = [build_job(full(j["image"]), full(j["audio"]), {**base, **j.get("settings", {})})
+            for j in data.get("jobs", [])]
+    if data.get("matrix"):
+        side = lambda entries, field: [(full(e), {}) if isinstance(e, str) else (full(e[field]), e.get("settings", {}))
+                                       for e in entries]
+        jobs += matrix_jobs(side(data["matrix"]["images"], "image"), side(data["matrix"]["audio"], "audio"), base)
+    for job in jobs: job["result_dir"] = str(out)
+    return jobs, base
+
+def headless_main(argv):
+    """Entry point of `sadtalker_app.py --headless`: renders a manifest with the GUI's scheduler."""
+    import argparse
+    ap = argparse.ArgumentParser(prog="sadtalker_app.py --headless",
+                                 description="Render a manifest of image/audio jobs without the GUI.")
+    ap.add_argument("manifest")
+    ap.add_argument("-j", "--concurrency", type=int, default=0, help="parallel jobs (default: settings, then auto)")
+    ap.add_argument("--events", action="store_true", help="print structured events as JSON lines")
+    ap.add_argument("--fresh",  action="store_true", help="re-render every job instead of resuming the last run")
+    ap.add_argument("--force",  action="store_true", help="render even when an identical video already exists")
+    a = ap.parse_args(argv)
+    s = load_settings()
+    s = apply_profile(s, detect_gpu() if s["profile"] == "auto" else None)
+    t = LANG[s.get("lang", "en")]
+    jobs, base = load_manifest(a.manifest, s)
+    if a.concurrency: base["concurrency"] = a.concurrency
+    k = batch_concurrency(base, None if int(base.get("concurrency", 0)) else detect_gpu())
+    # The same manifest (path + contents) resumes where its last run stopped.
+    jobq   = JobQueue()
+    source = f"manifest:{Path(a.manifest).resolve()}:{file_digest(a.manifest)[:16]}"
+    index  = None if a.force else ResultIndex()
+    bid    = None if a.fresh else jobq.latest_batch(source)
+    dropped = 0
+    if bid is None:
+        ok, problems = preflight(jobs, t)
+        for level, name, msg in problems:
+            print(t["gen_log_pre_err" if level == "error" else "gen_log_pre_warn"].format(name=name, msg=msg),
+                  file=sys.stderr)
+        if not ok:
+            print(t["gen_pre_none"], file=sys.stderr)
+            return 1
+        dropped, jobs = len(jobs) - len(ok), ok
+        split = lambda line: None if a.events else print(line)
+        jobs  = split_long_audio(jobs, int(base.get("segment_s", 0)), t, split, index)
+        bid   = jobq.add_batch(order_jobs(jobs, k, cached_keys(jobs)), source)
+    skipped = sum(jobq.counts([bid]).values()) - len(jobq.pending([bid]))
+    if skipped and not a.events: print(t["gen_log_skipped"].format(n=skipped))
+    for j in jobs: Path(j["result_dir"]).mkdir(parents=True, exist_ok=True)
+    # Only what this manifest's settings load is fetched; the log goes to stderr, off the --events stream.
+    missing = ensure_models([job for _, job in jobq.pending([bid])], t, lambda line: print(line, file=sys.stderr))
+    if missing:
+        print(t["gen_log_models_bad"].format(files=", ".join(missing)), file=sys.stderr)
+        return 2
+
+    lock = threading.Lock()
+    def out(text):
+        with lock: print(text, flush=True)
+
+    def on_line(i, line):
+        out(json.dumps({"event": "log", "job": i, "line": line}) if a.events else f"[{i+1}] {line}")
+
+    def on_event(ev):
+        if a.events:
+            out(json.dumps(ev))
+        elif ev["event"] == "job_start":
+            out(t["gen_log_batch"].format(i=ev["job"]+1, n=ev["total"], name=ev["name"]))
+        elif ev["event"] == "job_done":
+            out(f"[{ev['job']+1}] " + (t["gen_ok"] if ev["ok"] else t["gen_err"].format(code=1)))
+        elif ev["event"] == "stitched":
+            out(t["gen_log_stitched"].format(name=ev["name"], n=ev["segments"], path=ev["result"]) if ev["ok"]
+                else t["gen_log_stitch_fail"].format(name=ev["name"]))
+        elif ev["event"] == "cache":
+            out(cache_report(ev, t))
+
+    control = JobControl(base, detect_gpu(), k)
+    try:
+        results = run_queued(jobq, [bid], t, k, on_line, on_event, index, control=control)
+    except KeyboardInterrupt:
+        control.shutdown()      # kill the renders (their own process group: Ctrl+C does not reach them), keep them resumable
+        raise
+    finally:
+        shutdown_workers()
+        stop_telemetry()
+    if not a.events:
+        print(t["gen_done"].format(n=sum(results)))
+    return 0 if all(results) and not dropped else 1
+
+
+# ── HTTP job server ───────────────────────────────────────────────────────────
+SERVER_PORT      = 7861
+SERVER_MAX_QUEUE = 16
+MAX_UPLOAD_MB    = 200
+LIVE_KEEP        = 256          # finished jobs whose event history stays in memory
+
+class QueueFull(Exception):
+    pass
+
+
+class JobServer:
+    """Runs jobs submitted over HTTP through JobQueue/run_queued on `k` slots, one
+    dispatcher thread (and warm worker) per slot. Every submission is a single-job
+    batch with source "http"; its batch id is the job id clients see. At most
+    `max_queue` jobs may wait — submit() raises QueueFull beyond that. `gpu_info`
+    sets the time limits (see JobControl)."""
+    def __init__(self, jobq, t, k, max_queue=SERVER_MAX_QUEUE, index=None, render=None, gpu_info=None):
+        self.jobq      = jobq
+        self.t         = t
+        self.k         = max(1, int(k))
+        self.gpu_info  = gpu_info
+        self.max_queue = max_queue
+        self.index     = index
+        self.render    = render
+        self.running   = set()
+        self._controls = {}         # running job id -> its JobControl
+        self._waiting  = deque()
+        self._force    = set()
+        self._live     = {}         # job id -> {"seq", "events", "progress", "final"}
+        self._cond     = threading.Condition()
+        self._stop     = False
+
+    def start(self):
+        """Re-queues http jobs an earlier server left unfinished, then starts the dispatchers."""
+        with self._cond:
+            for bid, _ in self.jobq.unfinished("http"):
+                self._waiting.append(bid)
+                self._live[bid] = self._record()
+        for slot in range(self.k):
+            threading.Thread(target=self._dispatch, args=(slot,), daemon=True).start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+    @staticmethod
+    def _record():
+        return {"seq": 0, "events": deque(maxlen=500), "progress": None, "final": False}
+
+    def submit(self, job, force=False):
+        """Queues `job` and returns its id; raises QueueFull when `max_queue` jobs already wait."""
+        with self._cond:
+            if len(self._waiting) >= self.max_queue: raise QueueFull()
+            bid = self.jobq.add_batch([job], "http")
+            if force: self._force.add(bid)
+            self._live[bid] = self._record()
+            self._waiting.append(bid)
+            self._forget()
+            self._cond.notify_all()
+        return bid
+
+    def cancel(self, jid):
+        """Drops a waiting job, or kills a running one. Returns False if it is finished or unknown."""
+        with self._cond:
+            control = self._controls.get(jid)
+            if control is None and jid not in self._waiting: return False
+            if control is None: self._waiting.remove(jid)
+        if control:
+            control.cancel()            # its dispatcher publishes job_done
+            return True
+        self.jobq.cancel([jid])
+        self._publish(jid, {"event": "job_done", "ok": False, "result": None, "cancelled": True})
+        return True
+
+    def _forget(self):
+        done = [jid for jid, rec in self._live.items() if rec["final"]]
+        for jid in done[:max(0, len(done) - LIVE_KEEP)]: del self._live[jid]
+
+    def _publish(self, jid, ev):
+        with self._cond:
+            rec = self._live.setdefault(jid, self._record())
+            rec["seq"] += 1
+            rec["events"].append((rec["seq"], {**ev, "id": jid}))
+            if ev["event"] == "progress": rec["progress"] = ev
+            if ev["event"] == "job_done": rec["final"] = True
+            self._cond.notify_all()
+
+    def _dispatch(self, slot):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._waiting or self._stop)
+                if self._stop: return
+                jid = self._waiting.popleft()
+                self.running.add(jid)
+                index   = None if jid in self._force else self.index
+                control = self._controls[jid] = JobControl(gpu_info=self.gpu_info, k=self.k)
+            try:
+                def on_event(ev):
+                    if ev["event"] != "batch": self._publish(jid, ev)
+                log = lambda line: self._publish(jid, {"event": "log", "line": line})
+                if self.render is None and not self._models_ok(jid, log): continue
+                run_queued(self.jobq, [jid], self.t, 1, lambda i, line: log(line),
+                           on_event, index, self.render, slot, control)
+            finally:
+                with self._cond:
+                    self.running.discard(jid)
+                    self._controls.pop(jid, None)
+                    self._force.discard(jid)
+                    rec = self._live.get(jid)
+                    if rec and not rec["final"]:      # crashed before job_done
+                        rec["final"] = True
+                        self._cond.notify_all()
+
+    def _models_ok(self, jid, log):
+        """Fetches the models job `jid` needs; fails the job if some stay unusable."""
+        todo    = self.jobq.pending([jid])
+        missing = ensure_models([job for _, job in todo], self.t, log)
+        if not missing: return True
+        error = self.t["gen_log_models_bad"].format(files=", ".join(missing))
+        for job_id, _ in todo: self.jobq.finish(job_id, False, error=error)
+        self._publish(jid, {"event": "job_done", "ok": False, "result": None, "error": error})
+        return False
+
+    def status(self, jid):
+        """The job's state, output and live progress as a dict, or None if unknown."""
+        rows = self.jobq.jobs(jid)
+        if not rows: return None
+        row = rows[0]
+        with self._cond:
+            rec      = self._live.get(jid)
+            progress = rec and rec["progress"]
+            ahead    = list(self._waiting).index(jid) if jid in self._waiting else None
+        state = row["state"]
+        if state == "pending" and jid in self.running: state = "running"
+        st = {"id": jid, "state": state, "queued_ahead": ahead, "result": row["result"], "error": row["error"],
+              "attempts": row["attempts"], "stages": row["stages"], "started": row["started"],
+              "finished": row["finished"], "image": Path(row["job"]["source_image"]).name,
+              "audio": Path(row["job"]["driven_audio"]).name}
+        if state == "running" and progress:
+            st.update({k: progress[k] for k in ("stage", "frac", "elapsed", "eta")})
+        return st
+
+    def events(self, jid, after, timeout):
+        """Blocks up to `timeout` for events newer than `after`.
+        Returns ([(seq, event)], finished)."""
+        with self._cond:
+            rec = self._live.get(jid)
+            if rec is None: return [], True           # finished in an earlier session
+            self._cond.wait_for(lambda: rec["seq"] > after or rec["final"], timeout)
+            return [(n, ev) for n, ev in rec["events"] if n > after], rec["final"]
+
+    def overview(self):
+        with self._cond:
+            return {"queued": len(self._waiting), "running": len(self.running),
+                    "max_queue": self.max_queue, "slots": self.k, "gpu": gpu_telemetry().latest()}
+
+
+def _multipart(ctype, body):
+    """{field: (filename or None, bytes)} from a multipart/form-data body."""
+    from email.parser import BytesParser
+    from email.policy import HTTP
+    msg = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + ctype.encode() + b"\r\n\r\n" + body)
+    if not msg.is_multipart(): raise ValueError("malformed multipart body")
+    return {part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+            for part in msg.iter_parts()}
+
+
+class _JobHandler(BaseHTTPRequestHandler):
+    """Routes for JobServer (self.server.jobs):
+      POST   /jobs               JSON {"image", "audio", "settings"?, "force"?} with local paths,
+                                 or multipart/form-data with image/audio files (+ settings JSON)
+      GET    /jobs/<id>          status and live progress
+      GET    /jobs/<id>/events   server-sent events: progress, log, job_done
+      GET    /jobs/<id>/result   the finished video
+      DELETE /jobs/<id>          drop a waiting job, or kill a running one
+      GET    /status             queue length, slots and the latest GPU telemetry sample"""
+    protocol_version = "HTTP/1.1"
+    server_version   = "SadTalkerDesktop"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose: super().log_message(fmt, *args)
+
+    def _json(self, code, obj, headers=()):
+        data = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers: self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        url  = urlsplit(self.path)
+        token = self.server.token
+        if token:
+            given = self.headers.get("Authorization", "").replace("Bearer ", "", 1) or \
+                    parse_qs(url.query).get("token", [""])[0]           # EventSource cannot set headers
+            if not hmac.compare_digest(given, token):
+                self._json(401, {"error": "missing or wrong token"}); return None
+        parts = [p for p in url.path.split("/") if p]
+        if parts[:1] == ["jobs"] and len(parts) >= 2:
+            if not parts[1].isdigit():
+                self._json(404, {"error": "no such job"}); return None
+            parts[1] = int(parts[1])
+        return parts
+
+    def do_GET(self):
+        parts = self._route()
+        if parts is None: return
+        jobs = self.server.jobs
+        if parts == ["status"]:
+            return self._json(200, jobs.overview())
+        if parts[:1] != ["jobs"] or len(parts) not in (2, 3):
+            return self._json(404, {"error": "not found"})
+        st = jobs.status(parts[1])
+        if st is None:
+            return self._json(404, {"error": "no such job"})
+        if len(parts) == 2:
+            return self._json(200, st)
+        if parts[2] == "events":
+            return self._events(parts[1])
+        if parts[2] == "result":
+            if st["state"] != "done" or not (st["result"] and os.path.exists(st["result"])):
+                return self._json(409, {"error": f"job is {st['state']}", "state": st["state"]})
+            return self._file(st["result"])
+        self._json(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        parts = self._route()
+        if parts is None: return
+        if parts[:1] != ["jobs"] or len(parts) != 2:
+            return self._json(404, {"error": "not found"})
+        if self.server.jobs.cancel(parts[1]):
+            return self._json(200, {"id": parts[1], "state": "cancelled"})
+        self._json(409, {"error": "job is finished or unknown"})
+
+    def do_POST(self):
+        parts = self._route()
+        if parts is None: return
+        if parts != ["jobs"]:
+            return self._json(404, {"error": "not found"})
+        size = int(self.headers.get("Content-Length") or 0)
+        if size > MAX_UPLOAD_MB * 1024 * 1024:
+            self.close_connection = True
+            return self._json(413, {"error": f"upload larger than {MAX_UPLOAD_MB} MB"})
+        body = self.rfile.read(size)
+        try:
+            job, force = self._parse_job(self.headers.get("Content-Type", ""), body)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._json(400, {"error": str(e) or type(e).__name__})
+        if self.server.preflight:
+            ok, problems = preflight([job], self.server.jobs.t)
+            if not ok:
+                return self._json(422, {"error": "input check failed",
+                                        "problems": [{"level": lv, "file": f, "message": m} for lv, f, m in problems]})
+        try:
+            jid = self.server.jobs.submit(job, force)
+        except QueueFull:
+            return self._json(429, {"error": "queue is full, try again later"}, [("Retry-After", "10")])
+        self._json(202, {"id": jid, "status_url": f"/jobs/{jid}", "events_url": f"/jobs/{jid}/events",
+                         "result_url": f"/jobs/{jid}/result"}, [("Location", f"/jobs/{jid}")])
+
+    def _parse_job(self, ctype, body):
+        if ctype.startswith("multipart/form-data"):
+            fields = _multipart(ctype, body)
+            opts   = json.loads(fields["settings"][1] or b"{}") if "settings" in fields else {}
+            force  = fields.get("force", (None, b""))[1].strip().lower() in (b"1", b"true", b"yes")
+            upload = UPLOADS_DIR / uuid.uuid4().hex
+            paths  = {}
+            for name in ("image", "audio"):
+                filename, data = fields[name]
+                if filename is None:                 # plain text field: a path
+                    paths[name] = data.decode().strip()
+                    continue
+                upload.mkdir(parents=True, exist_ok=True)
+                dest = upload / (Path(filename).name or name)
+                dest.write_bytes(data)
+                paths[name] = str(dest)
+        else:
+            data  = json.loads(body or b"{}")
+            paths = {"image": data["image"], "audio": data["audio"]}
+            opts  = data.get("settings", {})
+            force = bool(data.get("force"))
+        for name, path in paths.items():
+            if not os.path.isfile(path): raise ValueError(f"{name} not found: {path}")
+        if not isinstance(opts, dict): raise ValueError("settings must be an object")
+        s = {**self.server.settings, **check_settings(opts)}
+        return build_job(str(Path(paths["image"]).resolve()), str(Path(paths["audio"]).resolve()), s), force
+
+    def _file(self, path):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{Path(path).name}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def _events(self, jid):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        seq = int(self.headers.get("Last-Event-ID") or 0)
+        try:
+            while True:
+                evs, final = self.server.jobs.events(jid, seq, timeout=15)
+                if not evs and not final: self.wfile.write(b": ping\n\n")
+                for seq, ev in evs:
+                    self.wfile.write(f"id: {seq}\nevent: {ev['event']}\ndata: {json.dumps(ev)}\n\n".encode())
+                if final:
+                    if not evs:         # nothing buffered (e.g. finished before a restart): say so once
+                        st = self.server.jobs.status(jid)
+                        ev = {"event": "job_done", "id": jid, "ok": st["state"] == "done", "result": st["result"]}
+                        self.wfile.write(f"event: job_done\ndata: {json.dumps(ev)}\n\n".encode())
+                    self.wfile.flush()
+                    return
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve_main(argv):
+    """Entry point of `sadtalker_app.py --serve`: a local HTTP API over the job queue."""
+    import argparse
+    ap = argparse.ArgumentParser(prog="sadtalker_app.py --serve",
+                                 description="Accept render jobs over HTTP.")
+    ap.add_argument("--host", default="127.0.0.1", help="interface to bind (0.0.0.0 for the whole LAN)")
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("-j", "--concurrency", type=int, default=0, help="parallel jobs (default: settings, then auto)")
+    ap.add_argument("--max-queue", type=int, default=SERVER_MAX_QUEUE, help="waiting jobs before answering 429")
+    ap.add_argument("--token", default=os.environ.get("SADTALKER_TOKEN"), help="require this bearer token")
+    ap.add_argument("--db", default=str(JOBS_DB), help="job database (default: jobs.db)")
+    ap.add_argument("--stub", type=float, metavar="SECONDS",
+                    help="fake renders of about SECONDS each — no models needed (for testing)")
+    ap.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    a = ap.parse_args(argv)
+    s = load_settings()
+    s = apply_profile(s, detect_gpu() if s["profile"] == "auto" and a.stub is None else None)
+    t = LANG[s.get("lang", "en")]
+    missing = ensure_models([s], t) if a.stub is None else []      # jobs with other settings fetch theirs when they start
+    if missing:
+        print(t["gen_log_models_bad"].format(files=", ".join(missing)), file=sys.stderr)
+        return 2
+    if a.concurrency: s["concurrency"] = a.concurrency
+    k = batch_concurrency(s, None if a.stub is not None or int(s.get("concurrency", 0)) else detect_gpu())
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    if a.stub is not None: use_telemetry(FakeTelemetry())
+    jobs = JobServer(JobQueue(a.db), t, k, a.max_queue,
+                     index=None if a.stub is not None else ResultIndex(a.db),
+                     render=stub_render(a.stub) if a.stub is not None else None,
+                     gpu_info=None if a.stub is not None else detect_gpu())
+    httpd = ThreadingHTTPServer((a.host, a.port), _JobHandler)
+    httpd.daemon_threads = True
+    httpd.jobs, httpd.settings, httpd.token, httpd.verbose = jobs, s, a.token, a.verbose
+    httpd.preflight = a.stub is None
+    jobs.start()
+    print(t["serve_listening"].format(host=a.host, port=httpd.server_address[1], k=k), flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jobs.stop()
+        httpd.server_close()
+        shutdown_workers()
+        stop_telemetry()
+    return 0
+
+
+def main(argv):
+    if "--worker" in argv:
+        return worker_main(argv[argv.index("--worker")+1:])
+    if "--headless" in argv:
+        return headless_main(argv[argv.index("--headless")+1:])
+    if "--serve" in argv:
+        return serve_main(argv[argv.index("--serve")+1:])
+    print("usage: sadtalker_app.py [--headless manifest.json | --serve]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
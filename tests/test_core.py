@@ -0,0 +1,237 @@
+"""
+Offline tests for sadtalker_core: the batch scheduler (stub renders and the fake
+inference.py in benchmark.py), resumable downloads against a local server, and
+the HTTP job server in stub mode. No models, GPU or network needed.
+
+Run: python -m pytest tests
+"""
+
+import sys, json, time, hashlib, threading, urllib.request, urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import sadtalker_core as core
+
+T = core.LANG["en"]
+
+
+def _job(tmp_path, name="face.png", **over):
+    tmp_path.joinpath(name).write_bytes(b"png")
+    tmp_path.joinpath("voice.wav").write_bytes(b"wav")
+    job = core.build_job(str(tmp_path / name), str(tmp_path / "voice.wav"), {**core.DEFAULT_SETTINGS, **over})
+    job["result_dir"] = str(tmp_path / "results")
+    return job
+
+def _serve(handler):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+# ── Batch scheduler ───────────────────────────────────────────────────────────
+def test_run_batch_runs_k_jobs_at_once(tmp_path):
+    stub, lock = core.stub_render(0.2), threading.Lock()
+    live, peak = [0], [0]
+    def render(job, on_line, t, slot=0):
+        with lock:
+            live[0] += 1
+            peak[0] = max(peak[0], live[0])
+        try:
+            return stub(job, on_line, t, slot)
+        finally:
+            with lock: live[0] -= 1
+    events = []
+    results = core.run_batch([_job(tmp_path, enhancer="none")] * 6, T, 3, on_event=events.append,
+                             render=render, control=core.JobControl(core.DEFAULT_SETTINGS))
+    assert results == [True] * 6
+    assert peak[0] == 3
+    done = [ev for ev in events if ev["event"] == "job_done"]
+    assert sorted(ev["job"] for ev in done) == list(range(6))
+    assert all(ev["ok"] and Path(ev["result"]).exists() for ev in done)
+
+def test_run_batch_aggregates_progress(tmp_path):
+    events = []
+    core.run_batch([_job(tmp_path, enhancer="none")] * 4, T, 2, on_event=events.append,
+                   render=core.stub_render(0.1), control=core.JobControl(core.DEFAULT_SETTINGS))
+    batch = [ev for ev in events if ev["event"] == "batch"]
+    fracs = [ev["frac"] for ev in batch]
+    assert fracs == sorted(fracs)           # the batch bar never moves back
+    assert fracs[-1] == pytest.approx(1.0)
+    assert batch[-1]["done"] == batch[-1]["total"] == 4
+    assert any(0 < f < 0.25 for f in fracs)     # in-job progress counts before the first job ends
+
+def test_run_batch_over_fake_inference(tmp_path, monkeypatch):
+    monkeypatch.setenv("BENCH_STARTUP", "0")
+    monkeypatch.setenv("BENCH_FRAMES", "5")
+    monkeypatch.setenv("BENCH_RATE", "0")
+    def render(job, on_line, t, slot=0):
+        return core.run_oneshot(job, on_line, script=ROOT / "benchmark.py") == 0, None
+    jobs   = [_job(tmp_path, f"face{i}.png", enhancer="none") for i in range(3)]
+    events = []
+    assert core.run_batch(jobs, T, 2, on_event=events.append, render=render,
+                          control=core.JobControl(core.DEFAULT_SETTINGS)) == [True] * 3
+    stages = {ev["stage"] for ev in events if ev["event"] == "progress"}
+    assert {"preprocess", "audio2coeff", "render"} <= stages
+    assert len(list(Path(jobs[0]["result_dir"]).glob("*.mp4"))) == 3
+
+def test_run_batch_turns_exceptions_into_failed_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "RETRY_BACKOFF_S", 0.01)
+    tries = []
+    def render(job, on_line, t, slot=0):
+        tries.append(job)
+        raise PermissionError("input is locked")
+    events = []
+    control = core.JobControl({**core.DEFAULT_SETTINGS, "retries": 1})
+    assert core.run_batch([_job(tmp_path)], T, 1, on_event=events.append, render=render,
+                          control=control) == [False]
+    assert len(tries) == 2
+    done = [ev for ev in events if ev["event"] == "job_done"]
+    assert len(done) == 1 and not done[0]["ok"] and done[0]["error"] == "input is locked"
+
+
+# ── Downloads ─────────────────────────────────────────────────────────────────
+BLOB = bytes(range(256)) * 4096            # 1 MiB
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """Serves BLOB at every path, honouring "Range: bytes=N-" unless server.ranges is off."""
+    def log_message(self, fmt, *args): pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BLOB)))
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.seen.append(self.headers.get("Range"))
+        rng = self.headers.get("Range")
+        start = int(rng.split("=")[1].rstrip("-")) if rng and self.server.ranges else 0
+        if start >= len(BLOB):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(BLOB)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = BLOB[start:]
+        self.send_response(206 if start else 200)
+        if start: self.send_header("Content-Range", f"bytes {start}-{len(BLOB) - 1}/{len(BLOB)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def blob_server():
+    httpd = _serve(_RangeHandler)
+    httpd.seen, httpd.ranges = [], True
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def _item(server, dest, **over):
+    return {"url": f"http://127.0.0.1:{server.server_address[1]}/blob.bin", "dest": dest,
+            "name": "blob.bin", **over}
+
+def test_download_checks_sha(blob_server, tmp_path):
+    dest = tmp_path / "blob.bin"
+    res  = core.Downloader().fetch_all([_item(blob_server, dest, sha256=hashlib.sha256(BLOB).hexdigest())])
+    assert res == {str(dest): None}
+    assert dest.read_bytes() == BLOB
+    assert not dest.with_name("blob.bin.part").exists()
+
+def test_download_resumes_part(blob_server, tmp_path):
+    dest = tmp_path / "blob.bin"
+    dest.with_name("blob.bin.part").write_bytes(BLOB[:300000])
+    core.Downloader().fetch(_item(blob_server, dest, size=len(BLOB)))
+    assert blob_server.seen == ["bytes=300000-"]
+    assert dest.read_bytes() == BLOB
+
+def test_download_restarts_when_range_is_ignored(blob_server, tmp_path):
+    blob_server.ranges = False
+    dest = tmp_path / "blob.bin"
+    dest.with_name("blob.bin.part").write_bytes(b"x" * 1000)
+    core.Downloader().fetch(_item(blob_server, dest, sha256=hashlib.sha256(BLOB).hexdigest()))
+    assert dest.read_bytes() == BLOB
+
+def test_download_complete_part_gets_416(blob_server, tmp_path):
+    dest = tmp_path / "blob.bin"
+    dest.with_name("blob.bin.part").write_bytes(BLOB)
+    core.Downloader().fetch(_item(blob_server, dest))
+    assert dest.read_bytes() == BLOB
+
+def test_download_sha_mismatch(blob_server, tmp_path):
+    dest, events = tmp_path / "blob.bin", []
+    dl  = core.Downloader(on_event=lambda kind, item, **info: events.append(kind))
+    res = dl.fetch_all([_item(blob_server, dest, sha256="0" * 64)])
+    assert isinstance(res[str(dest)], core.DownloadError)
+    assert "sha256 mismatch" in str(res[str(dest)])
+    assert not dest.exists() and not dest.with_name("blob.bin.part").exists()
+    assert events[-1] == "error"
+
+
+# ── HTTP job server ───────────────────────────────────────────────────────────
+@pytest.fixture
+def job_server(tmp_path, monkeypatch):
+    """A stub-mode server (like `--serve --stub 2`), dispatchers not started yet."""
+    monkeypatch.setattr(core, "RESULTS_DIR", tmp_path / "results")
+    jobs  = core.JobServer(core.JobQueue(tmp_path / "jobs.db"), T, 1, max_queue=1, render=core.stub_render(2))
+    httpd = _serve(core._JobHandler)
+    httpd.jobs, httpd.settings, httpd.token = jobs, core.DEFAULT_SETTINGS.copy(), None
+    httpd.verbose, httpd.preflight = False, False
+    tmp_path.joinpath("face.png").write_bytes(b"png")
+    tmp_path.joinpath("voice.wav").write_bytes(b"wav")
+    httpd.body = {"image": str(tmp_path / "face.png"), "audio": str(tmp_path / "voice.wav")}
+    yield httpd
+    jobs.stop()
+    httpd.shutdown()
+    httpd.server_close()
+
+def _call(server, method, path, body=None):
+    req = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}{path}", method=method,
+                                 data=None if body is None else json.dumps(body).encode(),
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as r:
+            return r.status, json.loads(r.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_server_queue_limit(job_server):
+    code, first = _call(job_server, "POST", "/jobs", job_server.body)
+    assert code == 202 and first["status_url"] == f"/jobs/{first['id']}"
+    code, _ = _call(job_server, "POST", "/jobs", job_server.body)
+    assert code == 429
+    assert _call(job_server, "GET", f"/jobs/{first['id']}")[1]["state"] == "pending"
+
+def test_server_rejects_bad_jobs(job_server):
+    assert _call(job_server, "POST", "/jobs", {**job_server.body, "settings": {"size": "1024"}})[0] == 400
+    assert _call(job_server, "POST", "/jobs", {**job_server.body, "image": "/nonexistent.png"})[0] == 400
+    assert _call(job_server, "POST", "/jobs", {"image": job_server.body["image"]})[0] == 400
+
+def test_server_deletes_waiting_job(job_server):
+    jid = _call(job_server, "POST", "/jobs", job_server.body)[1]["id"]
+    assert _call(job_server, "DELETE", f"/jobs/{jid}") == (200, {"id": jid, "state": "cancelled"})
+    assert _call(job_server, "GET", f"/jobs/{jid}")[1]["state"] == "cancelled"
+    assert _call(job_server, "DELETE", f"/jobs/{jid}")[0] == 409
+    assert _call(job_server, "DELETE", "/jobs/999")[0] == 409
+
+def test_server_runs_and_cancels(job_server):
+    job_server.jobs.start()
+    jid = _call(job_server, "POST", "/jobs", job_server.body)[1]["id"]
+    deadline = time.monotonic() + 10
+    while _call(job_server, "GET", f"/jobs/{jid}")[1]["state"] != "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert _call(job_server, "DELETE", f"/jobs/{jid}")[0] == 200
+    seen, final = [], False
+    while not final:
+        assert time.monotonic() < deadline
+        evs, final = job_server.jobs.events(jid, seen[-1][0] if seen else 0, timeout=1)
+        seen += evs
+    assert seen[-1][1]["event"] == "job_done" and seen[-1][1].get("cancelled")
+    assert _call(job_server, "GET", f"/jobs/{jid}")[1]["state"] == "cancelled"